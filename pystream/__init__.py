@@ -1,2 +1,23 @@
-from pystream.sequential_stream import SequentialStream
-from pystream.parallel_stream import ParallelStream
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pystream.sequential_stream import SequentialStream
+    from pystream.parallel_stream import ParallelStream
+
+__all__ = ["SequentialStream", "ParallelStream"]
+
+# Streams are imported on first access, so that importing pystream does not import multiprocessing
+_EXPORTS = {
+    "SequentialStream": "pystream.sequential_stream",
+    "ParallelStream": "pystream.parallel_stream",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,426 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from functools import partial
+from types import BuiltinFunctionType, CodeType, FunctionType, MethodType, ModuleType
+from multiprocessing.util import Finalize
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+_AT = TypeVar("_AT")
+_RT = TypeVar("_RT")
+
+# Pinned so that keys stay stable between interpreter versions with different default protocols
+_PICKLE_PROTOCOL = 4
+_EVICTION_BATCH = 64
+
+# Lookups after which hit and miss counts and access times of a process are written to the database
+_FLUSH_INTERVAL = 256
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('size', 0)",
+)
+
+
+class _Pending:
+    """
+    Hit and miss counts and access times recorded by this process and not yet written to one database.
+    """
+
+    __slots__ = ("hits", "misses", "accessed")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.accessed: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return self.hits + self.misses
+
+
+_pending: Dict[str, _Pending] = {}
+_pending_pid: Optional[int] = None
+_pending_lock = threading.Lock()
+
+
+def _pending_for(path: str, timeout: float) -> _Pending:
+    global _pending_pid
+    if _pending_pid != os.getpid():
+        # Inherited from the parent by fork, the parent writes them itself
+        _pending.clear()
+        _pending_pid = os.getpid()
+    pending = _pending.get(path)
+    if pending is None:
+        pending = _pending[path] = _Pending()
+        # Pool workers run finalizers when they exit, the main process at interpreter exit
+        Finalize(None, _flush_pending, args=(path, timeout), exitpriority=10)
+    return pending
+
+
+def _write_pending(connection: sqlite3.Connection, path: str) -> None:
+    with _pending_lock:
+        pending = _pending.get(path)
+        if pending is None or _pending_pid != os.getpid() or len(pending) == 0:
+            return
+        _pending[path] = _Pending()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("UPDATE counters SET value = value + ? WHERE name = 'hits'", (pending.hits,))
+        connection.execute("UPDATE counters SET value = value + ? WHERE name = 'misses'", (pending.misses,))
+        connection.executemany(
+            "UPDATE entries SET accessed = MAX(accessed, ?) WHERE key = ?",
+            [(accessed, key) for key, accessed in pending.accessed.items()],
+        )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def _flush_pending(path: str, timeout: float) -> None:
+    pending = _pending.get(path)
+    if _pending_pid != os.getpid() or pending is None or len(pending) == 0 or not os.path.exists(path):
+        return
+    try:
+        connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        try:
+            _write_pending(connection, path)
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        logger.warning("Could not write cache statistics to %s", path, exc_info=True)
+
+
+def _digest_value(value: Any, digest: "hashlib._Hash") -> None:
+    if isinstance(value, CodeType):
+        _digest_code(value, digest)
+    elif isinstance(value, (FunctionType, MethodType, partial)):
+        digest.update(_function_identity(value).encode())
+    elif isinstance(value, ModuleType):
+        digest.update(f"module:{value.__name__}".encode())
+    elif isinstance(value, (tuple, list)):
+        digest.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            _digest_value(item, digest)
+    elif isinstance(value, (set, frozenset, dict)):
+        # Iteration order of sets of strings differs between processes, order the digests of the items instead
+        items = value.items() if isinstance(value, dict) else value
+        item_digests = []
+        for item in items:
+            item_hash = hashlib.sha256()
+            _digest_value(item, item_hash)
+            item_digests.append(item_hash.digest())
+        digest.update(f"{type(value).__name__}:{len(item_digests)}".encode())
+        for item_digest in sorted(item_digests):
+            digest.update(item_digest)
+    else:
+        try:
+            digest.update(pickle.dumps(value, protocol=_PICKLE_PROTOCOL))
+        except Exception as e:
+            raise TypeError(
+                f"Cannot derive a cache key from {type(value).__qualname__} object referenced by the function, "
+                f"pass an explicit version instead"
+            ) from e
+
+
+def _digest_code(code: CodeType, digest: "hashlib._Hash") -> None:
+    digest.update(code.co_code)
+    digest.update(repr((code.co_names, code.co_varnames, code.co_freevars, code.co_argcount)).encode())
+    _digest_value(code.co_consts, digest)
+
+
+def _function_identity(function: Callable[..., Any]) -> str:
+    """
+    Qualified name of the function and a digest of everything its result depends on, as far as it can be
+    inspected: bytecode, constants and names of the code and of nested code objects, default arguments,
+    closure variables, partial arguments and the instance of bound methods. Callables without code, like
+    operator.itemgetter or instances of classes defining __call__, are covered by the state they pickle.
+    Globals read by the function are covered by their names only.
+
+    :raises TypeError: The function references values which cannot be digested
+    """
+    if isinstance(function, partial):
+        digest = hashlib.sha256()
+        _digest_value((function.args, function.keywords), digest)
+        return f"partial({_function_identity(function.func)})#{digest.hexdigest()[:16]}"
+    if isinstance(function, MethodType):
+        digest = hashlib.sha256()
+        _digest_value(function.__self__, digest)
+        return f"method({_function_identity(function.__func__)})#{digest.hexdigest()[:16]}"
+    module = getattr(function, "__module__", None) or type(function).__module__
+    qualname = getattr(function, "__qualname__", None) or type(function).__qualname__
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return f"{module}.{qualname}#{_state_digest(function)}"
+    digest = hashlib.sha256()
+    _digest_code(code, digest)
+    _digest_value(getattr(function, "__defaults__", None), digest)
+    _digest_value(getattr(function, "__kwdefaults__", None), digest)
+    for cell in getattr(function, "__closure__", None) or ():
+        try:
+            contents = cell.cell_contents
+        except ValueError:
+            digest.update(b"empty cell")
+            continue
+        if contents is function:
+            digest.update(b"recursive cell")
+        else:
+            _digest_value(contents, digest)
+    return f"{module}.{qualname}#{digest.hexdigest()[:16]}"
+
+
+def _state_digest(function: Callable[..., Any]) -> str:
+    digest = hashlib.sha256()
+    if isinstance(function, BuiltinFunctionType):
+        # The module of a builtin function, or the object a builtin method is bound to
+        _digest_value(getattr(function, "__self__", None), digest)
+        return digest.hexdigest()[:16]
+    call = getattr(type(function), "__call__", None)
+    if isinstance(call, FunctionType):
+        digest.update(_function_identity(call).encode())
+    try:
+        state = function.__reduce_ex__(_PICKLE_PROTOCOL)
+    except Exception as e:
+        raise TypeError(
+            f"Cannot derive a cache key from {type(function).__qualname__} object, pass an explicit version instead"
+        ) from e
+    _digest_value(state, digest)
+    return digest.hexdigest()[:16]
+
+
+class DiskCache:
+    """
+    Persistent key-value store for memoized stage results, backed by a local SQLite database.
+    Entries are evicted in least-recently-used order once their total size exceeds ``max_size``.
+    Safe to share between processes: lookups only read, every write happens in its own immediate transaction,
+    and a connection is opened lazily in each process the cache is pickled or forked into and each thread using it.
+
+    :param path: Path of the database file. Created if missing.
+    :param max_size: Maximal total size of stored values in bytes.
+    :param timeout: Seconds to wait for a lock held by a concurrent writer.
+    """
+
+    __path: str
+    __max_size: int
+    __timeout: float
+    # Connection of the current thread and the process it was opened in, sqlite3 connections are bound to a thread
+    __local: threading.local
+
+    def __init__(self, path: str, max_size: int = 2 ** 30, timeout: float = 60.0):
+        self.__path = os.path.abspath(os.fspath(path))
+        self.__max_size = max_size
+        self.__timeout = timeout
+        self.__local = threading.local()
+
+    def __getstate__(self) -> Tuple[str, int, float]:
+        return self.__path, self.__max_size, self.__timeout
+
+    def __setstate__(self, state: Tuple[str, int, float]) -> None:
+        self.__path, self.__max_size, self.__timeout = state
+        self.__local = threading.local()
+
+    def __connect(self) -> sqlite3.Connection:
+        local = self.__local
+        if getattr(local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.__path, timeout=self.__timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            local.connection = connection
+            local.pid = os.getpid()
+        return cast(sqlite3.Connection, local.connection)
+
+    def __counter(self, name: str) -> int:
+        connection = self.__connect()
+        _write_pending(connection, self.__path)
+        row = connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return int(row[0])
+
+    @property
+    def hits(self) -> int:
+        """
+        Number of lookups answered from the cache, summed over all processes.
+        Lookups of other processes are included once they flushed their counts,
+        which happens every few hundred lookups and when the process exits.
+        """
+        return self.__counter("hits")
+
+    @property
+    def misses(self) -> int:
+        """Number of lookups not found in the cache, summed over all processes, see hits."""
+        return self.__counter("misses")
+
+    @property
+    def volume(self) -> int:
+        """Total size of stored values in bytes."""
+        return self.__counter("size")
+
+    def flush(self) -> None:
+        """Writes hit and miss counts and access times recorded by this process to the database."""
+        _write_pending(self.__connect(), self.__path)
+
+    def __len__(self) -> int:
+        return int(self.__connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Looks up the key and records a hit or a miss. Only reads the database,
+        the counts and the access time are written in batches, see flush.
+
+        :param key: Key of the entry
+        :return: Pair of a flag telling whether the key was found and the stored value (None if missing)
+        """
+        connection = self.__connect()
+        row = connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        with _pending_lock:
+            pending = _pending_for(self.__path, self.__timeout)
+            if row is None:
+                pending.misses += 1
+            else:
+                pending.hits += 1
+                pending.accessed[key] = time.time()
+            full = len(pending) >= _FLUSH_INTERVAL
+        if full:
+            _write_pending(connection, self.__path)
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Stores the value under the key and evicts least recently used entries if the cache grew too large.
+
+        :param key: Key of the entry
+        :param value: Picklable value
+        """
+        blob = pickle.dumps(value, protocol=_PICKLE_PROTOCOL)
+        connection = self.__connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            previous = connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            delta = len(blob) - (previous[0] if previous is not None else 0)
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            connection.execute("UPDATE counters SET value = value + ? WHERE name = 'size'", (delta,))
+            self.__evict(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def __evict(self, connection: sqlite3.Connection) -> None:
+        size = connection.execute("SELECT value FROM counters WHERE name = 'size'").fetchone()[0]
+        while size > self.__max_size:
+            victims = connection.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT ?", (_EVICTION_BATCH,)
+            ).fetchall()
+            if len(victims) == 0:
+                break
+            for key, victim_size in victims:
+                if size <= self.__max_size:
+                    break
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                connection.execute("UPDATE counters SET value = value - ? WHERE name = 'size'", (victim_size,))
+                size -= victim_size
+
+    def clear(self) -> None:
+        """Removes all entries and resets hit and miss counters."""
+        connection = self.__connect()
+        with _pending_lock:
+            _pending.pop(self.__path, None)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM entries")
+            connection.execute("UPDATE counters SET value = 0")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        """
+        Flushes the counts of the current process and closes the connection of the current thread.
+        Connections of other threads are closed when their thread exits. The cache reconnects on next use.
+        """
+        local = self.__local
+        if getattr(local, "pid", None) == os.getpid():
+            _write_pending(local.connection, self.__path)
+            local.connection.close()
+        local.__dict__.clear()
+
+    def memoize(self, function: Callable[[_AT], _RT], version: str = "") -> "Memoized[_AT, _RT]":
+        """
+        Wraps the function so that its results are looked up in and stored to this cache.
+
+        :param function: Pure picklable function of one argument
+        :param version: Bump to invalidate results stored by a previous version of the function
+        :return: Memoized function
+        :raises TypeError: The function references values which cannot be digested and no version is given
+        """
+        return Memoized(function, self, version)
+
+
+class Memoized(Generic[_AT, _RT]):
+    """
+    Picklable memoized function. Results are keyed on a digest of the function identity
+    (qualified name, code, constants, defaults and closure), the version and the pickled argument,
+    so the argument must pickle deterministically (e.g. no sets of strings).
+    Functions referencing values which cannot be digested require an explicit version.
+
+    :param function: Pure picklable function of one argument
+    :param cache: Cache to store results in
+    :param version: Bump to invalidate results stored by a previous version of the function
+    """
+
+    __function: Callable[[_AT], _RT]
+    __cache: DiskCache
+    __identity: bytes
+
+    def __init__(self, function: Callable[[_AT], _RT], cache: DiskCache, version: str = ""):
+        self.__function = function
+        self.__cache = cache
+        try:
+            identity = _function_identity(function)
+        except TypeError:
+            if version == "":
+                raise
+            module = getattr(function, "__module__", None) or type(function).__module__
+            qualname = getattr(function, "__qualname__", None) or type(function).__qualname__
+            identity = f"{module}.{qualname}"
+        self.__identity = f"{identity}@{version}".encode()
+
+    @property
+    def cache(self) -> DiskCache:
+        return self.__cache
+
+    def key(self, x: _AT) -> str:
+        digest = hashlib.sha256(self.__identity)
+        digest.update(b"\0")
+        digest.update(pickle.dumps(x, protocol=_PICKLE_PROTOCOL))
+        return digest.hexdigest()
+
+    def __call__(self, x: _AT) -> _RT:
+        key = self.key(x)
+        found, value = self.__cache.get(key)
+        if found:
+            return value  # type: ignore[no-any-return]
+        result = self.__function(x)
+        self.__cache.put(key, result)
+        return result
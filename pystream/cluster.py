@@ -0,0 +1,488 @@
+import argparse
+import multiprocessing.synchronize
+import os
+import pickle
+import socket
+import struct
+import threading
+from collections import deque
+from time import monotonic
+from typing import (
+    Any,
+    Callable,
+    Counter,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+from types import TracebackType
+
+import pystream.streaming as streaming
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+Address = Tuple[str, int]
+Event = Union[threading.Event, multiprocessing.synchronize.Event]
+
+# Length prefix of every message, messages are pickled tuples whose first item is their kind
+_HEADER = struct.Struct(">Q")
+_READ_SIZE = 1 << 20
+_CONNECT_TIMEOUT = 10.0
+# Seconds between checks whether a worker was stopped
+_POLL_INTERVAL = 0.1
+_SPLIT_SIZE = 64 << 20
+
+
+class FileSplit(NamedTuple):
+    """
+    Byte range [start, end) of a text file, see file_splits and read_split.
+    Tasks of partitions starting with a split are preferably run by workers on one of its hosts.
+    """
+
+    path: str
+    start: int
+    end: int
+    hosts: Tuple[str, ...] = ()
+
+
+def file_splits(
+        paths: Iterable[str],
+        split_size: int = _SPLIT_SIZE,
+        hosts: Optional[Mapping[str, Sequence[str]]] = None
+) -> List[FileSplit]:
+    """
+    Splits text files into byte ranges of split_size bytes, to be read in parallel by read_split.
+
+    :param paths: Paths of the files, as seen by the workers
+    :param split_size: Number of bytes of a split
+    :param hosts: Localities of the workers storing each file locally, by path
+    """
+    if split_size < 1:
+        raise ValueError(f"Split size must be positive, got {split_size}")
+    splits = []
+    for path in paths:
+        size = os.path.getsize(path)
+        path_hosts = tuple(hosts.get(path, ())) if hosts is not None else ()
+        for start in range(0, max(size, 1), split_size):
+            splits.append(FileSplit(path, start, min(start + split_size, size), path_hosts))
+    return splits
+
+
+def read_split(split: FileSplit, encoding: str = "utf-8") -> List[str]:
+    """
+    Reads the lines starting within the split, without line terminators. A line crossing the end of the split
+    belongs to it, so the splits of a file together yield each of its lines exactly once.
+    """
+    lines = []
+    with open(split.path, "rb") as file:
+        if split.start > 0:
+            # The line in progress at the start belongs to the previous split
+            file.seek(split.start - 1)
+            file.readline()
+        while file.tell() < split.end:
+            line = file.readline()
+            if len(line) == 0:
+                break
+            lines.append(line.rstrip(b"\r\n").decode(encoding))
+    return lines
+
+
+def task_locality(task: Any) -> Tuple[str, ...]:
+    """
+    :return: Hosts preferred for a task of a ParallelStream, the hosts of its first element when it is a FileSplit
+    """
+    if isinstance(task, tuple) and len(task) == 2 and isinstance(task[1], list):
+        # Partitions of sinks are numbered
+        task = task[1]
+    if isinstance(task, list) and len(task) > 0 and isinstance(task[0], FileSplit):
+        return task[0].hosts
+    return ()
+
+
+def _send(connection: socket.socket, data: bytes) -> None:
+    connection.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _receive(connection: socket.socket) -> bytes:
+    size, = _HEADER.unpack(_receive_exactly(connection, _HEADER.size))
+    return _receive_exactly(connection, size)
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = connection.recv(min(size - len(buffer), _READ_SIZE))
+        if len(chunk) == 0:
+            raise EOFError("Connection closed by the peer")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _dumps(message: Tuple[Any, ...]) -> bytes:
+    return pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+
+
+def _connect(address: Address, timeout: Optional[float]) -> socket.socket:
+    connection = socket.create_connection(address, timeout=_CONNECT_TIMEOUT)
+    connection.settimeout(timeout)
+    connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    return connection
+
+
+def _handshake(connection: socket.socket) -> str:
+    _send(connection, _dumps(("hello",)))
+    _, locality = pickle.loads(_receive(connection))
+    return str(locality)
+
+
+def _serve_connection(connection: socket.socket, locality: str) -> None:
+    with connection:
+        while True:
+            try:
+                data = _receive(connection)
+            except (EOFError, OSError):
+                return
+            try:
+                message = pickle.loads(data)
+                if message[0] == "hello":
+                    reply = _dumps(("hello", locality))
+                else:
+                    _, function, task = message
+                    reply = _dumps(("result", function(task)))
+            except Exception as e:
+                try:
+                    reply = _dumps(("error", e))
+                except Exception:
+                    error = RuntimeError(f"Task failed with an exception which can not be pickled: {e!r}")
+                    reply = _dumps(("error", error))
+            try:
+                _send(connection, reply)
+            except OSError:
+                return
+
+
+def serve(
+        address: Address,
+        locality: Optional[str] = None,
+        ready: Optional[Event] = None,
+        stop: Optional[Event] = None,
+        poll_interval: float = _POLL_INTERVAL
+) -> None:
+    """
+    Runs a worker executing tasks of ClusterPool coordinators connecting to address, until stop is set.
+    Every connection is served by a thread, tasks of one connection run one at a time.
+    Tasks are pickled functions, which must be importable by the worker, and pickled data:
+    only expose workers to trusted networks.
+
+    :param address: Host and port to listen on, port 0 picks a free port
+    :param locality: Name matched against the hosts of file splits, defaults to the host name
+    :param ready: Event set once the worker is listening
+    :param stop: Event stopping the worker
+    :param poll_interval: Seconds between checks of stop
+    """
+    locality = socket.gethostname() if locality is None else locality
+    with socket.create_server(address) as server:
+        server.settimeout(poll_interval)
+        if ready is not None:
+            ready.set()
+        while stop is None or not stop.is_set():
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            threading.Thread(target=_serve_connection, args=(connection, locality), daemon=True).start()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Entry point of the pystream-worker command."""
+    parser = argparse.ArgumentParser(prog="pystream-worker", description="Executes tasks of pystream coordinators.")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=7077, help="Port to listen on")
+    parser.add_argument(
+        "--locality", default=None, help="Name matched against the hosts of file splits, the host name by default"
+    )
+    arguments = parser.parse_args(argv)
+    stop = threading.Event()
+    streaming.stop_on_signals(stop)
+    serve((arguments.host, arguments.port), arguments.locality, stop=stop)
+
+
+class _Task(NamedTuple):
+    number: int
+    task: Any
+    hosts: Tuple[str, ...]
+    queued: float
+    attempts: int
+
+
+class _Run:
+    """Execution of one imap call: a feeder thread queues the tasks, a thread per worker runs them remotely."""
+
+    __function: Callable[[Any], Any]
+    __workers: Dict[Address, str]
+    __max_retries: int
+    __task_timeout: Optional[float]
+    __locality_wait: float
+    __locality_of: Callable[[Any], Sequence[str]]
+    __condition: threading.Condition
+    __pending: Deque[_Task]
+    __n_tasks: int
+    __exhausted: bool
+    __in_flight: int
+    __results: Dict[int, Any]
+    __error: Optional[BaseException]
+    __alive: Counter[str]
+    __connections: List[socket.socket]
+    __cancelled: bool
+
+    def __init__(
+            self,
+            function: Callable[[Any], Any],
+            workers: Dict[Address, str],
+            max_retries: int,
+            task_timeout: Optional[float],
+            locality_wait: float,
+            locality_of: Callable[[Any], Sequence[str]]
+    ):
+        self.__function = function
+        self.__workers = workers
+        self.__max_retries = max_retries
+        self.__task_timeout = task_timeout
+        self.__locality_wait = locality_wait
+        self.__locality_of = locality_of
+        self.__condition = threading.Condition()
+        self.__pending = deque()
+        self.__n_tasks = 0
+        self.__exhausted = False
+        self.__in_flight = 0
+        self.__results = {}
+        self.__error = None
+        self.__alive = Counter(workers.values())
+        self.__connections = []
+        self.__cancelled = False
+
+    def start(self, tasks: Iterable[Any]) -> None:
+        threading.Thread(target=self.__feed, args=(tasks,), daemon=True).start()
+        for address, locality in self.__workers.items():
+            threading.Thread(target=self.__work, args=(address, locality), daemon=True).start()
+
+    def __fail(self, error: BaseException) -> None:
+        if self.__error is None:
+            self.__error = error
+        self.__condition.notify_all()
+
+    def __feed(self, tasks: Iterable[Any]) -> None:
+        try:
+            for number, task in enumerate(tasks):
+                hosts = tuple(self.__locality_of(task))
+                with self.__condition:
+                    if self.__cancelled or self.__error is not None:
+                        return
+                    self.__pending.append(_Task(number, task, hosts, monotonic(), 0))
+                    self.__n_tasks += 1
+                    self.__condition.notify_all()
+        except Exception as e:
+            with self.__condition:
+                self.__fail(e)
+        finally:
+            with self.__condition:
+                self.__exhausted = True
+                self.__condition.notify_all()
+
+    def __take(self, locality: str) -> Optional[_Task]:
+        # Delay scheduling: a task preferring other live workers waits locality_wait for them before it is stolen
+        with self.__condition:
+            while True:
+                if self.__cancelled or self.__error is not None:
+                    return None
+                # Tasks in flight may still be lost and queued again
+                if self.__exhausted and len(self.__pending) == 0 and self.__in_flight == 0:
+                    return None
+                now = monotonic()
+                wait: Optional[float] = None
+                for position, task in enumerate(self.__pending):
+                    local = locality in task.hosts
+                    unclaimed = all(self.__alive[host] == 0 for host in task.hosts)
+                    if local or unclaimed or now - task.queued >= self.__locality_wait:
+                        del self.__pending[position]
+                        self.__in_flight += 1
+                        return task
+                    remaining = task.queued + self.__locality_wait - now
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.__condition.wait(wait)
+
+    def __lose(self, locality: str, task: Optional[_Task], error: BaseException) -> None:
+        with self.__condition:
+            self.__alive[locality] -= 1
+            if task is not None:
+                self.__in_flight -= 1
+                if task.attempts >= self.__max_retries:
+                    self.__fail(ConnectionError(
+                        f"Task {task.number} was lost with its worker {task.attempts + 1} times, last by: {error!r}"
+                    ))
+                else:
+                    self.__pending.appendleft(task._replace(attempts=task.attempts + 1))
+            remaining = len(self.__pending) > 0 or not self.__exhausted
+            if sum(self.__alive.values()) == 0 and remaining and not self.__cancelled:
+                self.__fail(ConnectionError(f"All workers of the cluster were lost, last by: {error!r}"))
+            self.__condition.notify_all()
+
+    def __work(self, address: Address, locality: str) -> None:
+        try:
+            connection = _connect(address, self.__task_timeout)
+        except OSError as e:
+            self.__lose(locality, None, e)
+            return
+        with connection:
+            with self.__condition:
+                self.__connections.append(connection)
+            while True:
+                task = self.__take(locality)
+                if task is None:
+                    return
+                try:
+                    data = _dumps(("task", self.__function, task.task))
+                except Exception as e:
+                    with self.__condition:
+                        self.__fail(e)
+                    return
+                try:
+                    _send(connection, data)
+                    kind, value = pickle.loads(_receive(connection))
+                except (EOFError, OSError) as e:
+                    self.__lose(locality, task, e)
+                    return
+                with self.__condition:
+                    self.__in_flight -= 1
+                    if kind == "error":
+                        self.__fail(value)
+                    else:
+                        self.__results[task.number] = value
+                        self.__condition.notify_all()
+
+    def cancel(self) -> None:
+        with self.__condition:
+            self.__cancelled = True
+            self.__condition.notify_all()
+            connections = list(self.__connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def results(self) -> Iterator[Any]:
+        index = 0
+        try:
+            while True:
+                with self.__condition:
+                    while index not in self.__results:
+                        if self.__error is not None:
+                            raise self.__error
+                        if self.__exhausted and index >= self.__n_tasks:
+                            return
+                        self.__condition.wait()
+                    result = self.__results.pop(index)
+                index += 1
+                yield result
+        finally:
+            self.cancel()
+
+
+class ClusterPool:
+    """
+    Stand-in for multiprocessing Pool which executes tasks on worker processes of several hosts over TCP,
+    started by the pystream-worker command or serve. Results are returned in order.
+    Tasks of a lost worker are retried on the remaining workers. Tasks over file splits are preferably run
+    by workers on the hosts of their split, see file_splits and task_locality.
+    Functions and data are pickled, functions must be importable by the workers.
+
+    :param addresses: Host and port of each worker
+    :param max_retries: Number of times a task is retried after the worker running it was lost
+    :param task_timeout: Seconds after which a worker which did not return the result of a task is considered lost
+    :param locality_wait: Seconds a task waits for an idle worker on one of its hosts before any worker runs it
+    :param locality_of: Function returning the hosts preferred for a task
+    :raises ConnectionError: No worker can be reached
+    """
+
+    __workers: Dict[Address, str]
+    __max_retries: int
+    __task_timeout: Optional[float]
+    __locality_wait: float
+    __locality_of: Callable[[Any], Sequence[str]]
+    __runs: List[_Run]
+
+    def __init__(
+            self,
+            addresses: Sequence[Address],
+            max_retries: int = 3,
+            task_timeout: Optional[float] = None,
+            locality_wait: float = 0.5,
+            locality_of: Callable[[Any], Sequence[str]] = task_locality
+    ):
+        if max_retries < 0:
+            raise ValueError(f"Number of retries must not be negative, got {max_retries}")
+        self.__workers = {}
+        for address in addresses:
+            try:
+                with _connect(address, _CONNECT_TIMEOUT) as connection:
+                    self.__workers[(address[0], address[1])] = _handshake(connection)
+            except (EOFError, OSError):
+                continue
+        if len(self.__workers) == 0:
+            raise ConnectionError(f"No worker of the cluster can be reached: {list(addresses)}")
+        self.__max_retries = max_retries
+        self.__task_timeout = task_timeout
+        self.__locality_wait = locality_wait
+        self.__locality_of = locality_of
+        self.__runs = []
+
+    @property
+    def localities(self) -> Dict[Address, str]:
+        """Locality of each reachable worker, by address."""
+        return dict(self.__workers)
+
+    def __enter__(self) -> "ClusterPool":
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_val: Optional[BaseException],
+            exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.terminate()
+
+    def imap(self, func: Callable[[_T], _R], iterable: Iterable[_T], chunksize: int = 1) -> Iterator[_R]:
+        run = _Run(func, self.__workers, self.__max_retries, self.__task_timeout, self.__locality_wait,
+                   self.__locality_of)
+        self.__runs.append(run)
+        run.start(iterable)
+        return run.results()
+
+    def map(self, func: Callable[[_T], _R], iterable: Iterable[_T], chunksize: Optional[int] = None) -> List[_R]:
+        return list(self.imap(func, iterable))
+
+    def close(self) -> None:
+        pass
+
+    def join(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        for run in self.__runs:
+            run.cancel()
+        self.__runs.clear()
@@ -1,8 +1,12 @@
-from typing import Callable, Iterable, Hashable, Dict, Generic, List, TypeVar
+import math
+from functools import partial
+from typing import Any, Callable, Iterable, Hashable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
 import pystream.sequential_stream as seq
+import pystream.sketches as sketches
 
 _T = TypeVar("_T")
 _R = TypeVar("_R")
+_A = TypeVar("_A")
 _H = TypeVar("_H", bound=Hashable)
 
 
@@ -17,6 +21,171 @@ class Collector(Generic[_T, _R]):
         return self._collector_func(stream)
 
 
+def _collect_mergeable(
+    stream: "seq.SequentialStream[_T]",
+    /,
+    supplier: Callable[[], _A],
+    accumulator: Callable[[_A, _T], _A],
+    finisher: Callable[[_A], _R],
+) -> _R:
+    container = supplier()
+    for element in iter(stream):
+        container = accumulator(container, element)
+    return finisher(container)
+
+
+def _identity(x: _A) -> _A:
+    return x
+
+
+class MergeableCollector(Collector[_T, _R], Generic[_T, _A, _R]):
+    """
+    Collector folding elements into an intermediate container which can be merged with other containers.
+    Parallel streams accumulate a container per partition in workers and only merge containers in the parent.
+    All functions must be picklable to be used by parallel streams.
+
+    :param supplier: Creates an empty container
+    :param accumulator: Adds an element to a container and returns the container
+    :param combiner: Merges two containers and returns the result
+    :param finisher: Transforms the final container into the result
+    """
+
+    _supplier: Callable[[], _A]
+    _accumulator: Callable[[_A, _T], _A]
+    _combiner: Callable[[_A, _A], _A]
+    _finisher: Callable[[_A], _R]
+
+    def __init__(
+        self,
+        supplier: Callable[[], _A],
+        accumulator: Callable[[_A, _T], _A],
+        combiner: Callable[[_A, _A], _A],
+        finisher: Callable[[_A], _R] = _identity,  # type: ignore[assignment]
+    ):
+        super().__init__(
+            partial(_collect_mergeable, supplier=supplier, accumulator=accumulator, finisher=finisher)
+        )
+        self._supplier = supplier
+        self._accumulator = accumulator
+        self._combiner = combiner
+        self._finisher = finisher
+
+    @property
+    def supplier(self) -> Callable[[], _A]:
+        return self._supplier
+
+    @property
+    def accumulator(self) -> Callable[[_A, _T], _A]:
+        return self._accumulator
+
+    @property
+    def combiner(self) -> Callable[[_A, _A], _A]:
+        return self._combiner
+
+    @property
+    def finisher(self) -> Callable[[_A], _R]:
+        return self._finisher
+
+
+class SummaryStatistics:
+    """
+    Count, sum, mean, variance, min and max of numbers, computed in one pass with constant memory.
+    Variance is accumulated with Welford's algorithm, partial statistics are merged with the
+    pairwise formula of Chan et al.
+    """
+
+    count: int
+    sum: Any
+    min: Optional[Any]
+    max: Optional[Any]
+    _mean: float
+    _m2: float
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def accept(self, x: Any) -> "SummaryStatistics":
+        """
+        Adds a number to the statistics.
+
+        :param x: The number
+        :return: self
+        """
+        self.count += 1
+        self.sum += x
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        return self
+
+    def combine(self, other: "SummaryStatistics") -> "SummaryStatistics":
+        """
+        Merges statistics of other numbers into these statistics.
+
+        :param other: Statistics to merge
+        :return: self
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.sum, self.min, self.max = other.count, other.sum, other.min, other.max
+            self._mean, self._m2 = other._mean, other._m2
+            return self
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    @property
+    def mean(self) -> float:
+        """Arithmetic mean, 0.0 if no numbers were accepted."""
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Population variance, 0.0 if no numbers were accepted."""
+        return self._m2 / self.count if self.count > 0 else 0.0
+
+    @property
+    def sample_variance(self) -> float:
+        """Unbiased sample variance, 0.0 if less than two numbers were accepted."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        """Population standard deviation."""
+        return math.sqrt(self.variance)
+
+    def __repr__(self) -> str:
+        return "SummaryStatistics(count={}, sum={}, mean={}, variance={}, min={}, max={})".format(
+            self.count, self.sum, self.mean, self.variance, self.min, self.max
+        )
+
+
+def _accept_statistics(statistics: SummaryStatistics, x: Any) -> SummaryStatistics:
+    return statistics.accept(x)
+
+
+def _combine_statistics(left: SummaryStatistics, right: SummaryStatistics) -> SummaryStatistics:
+    return left.combine(right)
+
+
 def to_collection(collection: Callable[[Iterable[_T]], _R]) -> Collector[_T, _R]:
     return Collector(collection)
 
@@ -29,3 +198,79 @@ def grouping_by(key_getter: Callable[[_T], _H]) -> Collector[_T, Dict[_H, List[_
         return d
 
     return Collector(collector_func)
+
+
+def summary_statistics() -> MergeableCollector[Any, SummaryStatistics, SummaryStatistics]:
+    return MergeableCollector(SummaryStatistics, _accept_statistics, _combine_statistics)
+
+
+def _add_to_sketch(sketch: Any, x: Any) -> Any:
+    return sketch.add(x)
+
+
+def _merge_sketches(left: Any, right: Any) -> Any:
+    return left.merge(right)
+
+
+def _estimate_distinct(sketch: "sketches.HyperLogLog") -> int:
+    return sketch.estimate()
+
+
+def _quantiles_of(sketch: "sketches.KLLSketch[_T]", /, fractions: Tuple[float, ...]) -> List[Optional[_T]]:
+    return sketch.quantiles(fractions)
+
+
+def _top_of(sketch: "sketches.SpaceSaving[_H]", /, k: int) -> List[Tuple[_H, int]]:
+    return sketch.top(k)
+
+
+def approx_count_distinct(
+    relative_error: float = 0.01,
+) -> MergeableCollector[Any, "sketches.HyperLogLog", int]:
+    """
+    Estimates the number of distinct elements with a HyperLogLog sketch of fixed size.
+
+    :param relative_error: Relative standard error of the estimate, determines the sketch size
+    """
+    return MergeableCollector(
+        partial(sketches.HyperLogLog, precision=sketches.HyperLogLog.precision_for(relative_error)),
+        _add_to_sketch,
+        _merge_sketches,
+        _estimate_distinct,
+    )
+
+
+def approx_quantiles(
+    fractions: Sequence[float], k: int = 200
+) -> MergeableCollector[_T, "sketches.KLLSketch[_T]", List[Optional[_T]]]:
+    """
+    Estimates quantiles of comparable elements with a KLL sketch holding O(k) elements.
+
+    :param fractions: Quantile fractions between 0 and 1, e.g. (0.5, 0.99)
+    :param k: Accuracy parameter, the rank error is roughly 1.7 / k
+    """
+    return MergeableCollector(
+        partial(sketches.KLLSketch, k=k),
+        _add_to_sketch,
+        _merge_sketches,
+        partial(_quantiles_of, fractions=tuple(fractions)),
+    )
+
+
+def heavy_hitters(
+    k: int, error: Optional[float] = None
+) -> MergeableCollector[_H, "sketches.SpaceSaving[_H]", List[Tuple[_H, int]]]:
+    """
+    Finds the k most frequent elements with a Space-Saving sketch of fixed size.
+
+    :param k: Number of elements to return
+    :param error: Bound of the count overestimation as a fraction of the stream length, defaults to 1 / (10 * k)
+    :return: Collector of up to k pairs of element and estimated count, most frequent first
+    """
+    capacity = max(k, math.ceil(1 / error) if error is not None else 10 * k)
+    return MergeableCollector(
+        partial(sketches.SpaceSaving, capacity=capacity),
+        _add_to_sketch,
+        _merge_sketches,
+        partial(_top_of, k=k),
+    )
@@ -0,0 +1,188 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import monotonic
+from typing import Any, Callable, Deque, Generator, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar, cast
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# Seconds between checks whether the reader was closed while blocked on a full buffer
+_POLL_INTERVAL = 0.1
+
+
+class _Raised:
+    __slots__ = ("exception",)
+
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+_END: Any = object()
+
+
+class BackgroundReader(Generic[_T]):
+    """
+    Reads an iterable on a daemon thread into a bounded buffer.
+    Exceptions raised by the iterable are re-raised by get, close stops the thread
+    even while it waits for free space in the buffer.
+
+    :param iterable: Source iterable
+    :param buffer_size: Maximal number of elements read ahead
+    """
+
+    __queue: "queue.Queue[Any]"
+    __stopped: threading.Event
+    __thread: threading.Thread
+    __exhausted: bool
+
+    def __init__(self, iterable: Iterable[_T], buffer_size: int):
+        self.__queue = queue.Queue(maxsize=max(buffer_size, 1))
+        self.__stopped = threading.Event()
+        self.__exhausted = False
+        self.__thread = threading.Thread(target=self.__read, args=(iter(iterable),), daemon=True)
+        self.__thread.start()
+
+    def __put(self, item: Any) -> bool:
+        while not self.__stopped.is_set():
+            try:
+                self.__queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __read(self, iterator: Iterator[_T]) -> None:
+        try:
+            for element in iterator:
+                if not self.__put(element):
+                    return
+        except BaseException as e:
+            self.__put(_Raised(e))
+            return
+        self.__put(_END)
+
+    def get(self, timeout: Optional[float] = None) -> Tuple[bool, Optional[_T]]:
+        """
+        Takes the next element from the buffer.
+
+        :param timeout: Seconds to wait for an element, waits indefinitely when None
+        :return: Pair of False and None if the iterable is exhausted, otherwise True and the element
+        :raises queue.Empty: No element arrived in time
+        """
+        if self.__exhausted:
+            return False, None
+        item = self.__queue.get(timeout=timeout)
+        if item is _END:
+            self.__exhausted = True
+            return False, None
+        if isinstance(item, _Raised):
+            self.__exhausted = True
+            raise item.exception
+        return True, item
+
+    def close(self) -> None:
+        """Stops reading and discards buffered elements."""
+        self.__stopped.set()
+        while True:
+            try:
+                self.__queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def __iter__(self) -> Generator[_T, None, None]:
+        try:
+            while True:
+                more, element = self.get()
+                if not more:
+                    return
+                yield element  # type: ignore[misc]
+        finally:
+            self.close()
+
+
+def timed_partition_generator(
+        iterable: Iterable[_T],
+        partition_length: int,
+        max_wait: float,
+        stopped: Optional[threading.Event] = None
+) -> Generator[List[_T], None, None]:
+    """
+    Like partition_generator, but emits a partition not yet full once max_wait seconds passed since its first element
+    arrived, so slow or unbounded sources do not hold back elements already read.
+    Ends when stopped is set while waiting for the first element of a partition.
+    """
+    reader = BackgroundReader(iterable, partition_length)
+
+    def first() -> Tuple[bool, Optional[_T]]:
+        while True:
+            try:
+                return reader.get(timeout=None if stopped is None else _POLL_INTERVAL)
+            except queue.Empty:
+                if stopped is not None and stopped.is_set():
+                    return False, None
+
+    try:
+        while True:
+            more, element = first()
+            if not more:
+                return
+            partition: List[_T] = [element]  # type: ignore[list-item]
+            deadline = monotonic() + max_wait
+            while len(partition) < partition_length:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    more, element = reader.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if not more:
+                    yield partition
+                    return
+                partition.append(element)  # type: ignore[arg-type]
+            yield partition
+    finally:
+        reader.close()
+
+
+def prefetch_generator(iterable: Iterable[_T], buffer_size: int) -> Generator[_T, None, None]:
+    """
+    Reads the iterable on a background thread from the first request on, at most buffer_size elements ahead.
+    """
+    yield from BackgroundReader(iterable, buffer_size)
+
+
+def ordered_thread_map(
+        function: Callable[[_T], _R],
+        iterable: Iterable[_T],
+        buffer_size: int,
+        workers: int
+) -> Generator[_R, None, None]:
+    """
+    Applies the function on worker threads to at most buffer_size elements ahead of the consumer,
+    results are yielded in the order of the elements. The iterable is read on its own background thread.
+    """
+    reader = BackgroundReader(iterable, buffer_size)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pystream-prefetch")
+    pending: Deque["Future[_R]"] = deque()
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max(buffer_size, 1):
+                # Only block for the source when there is no result to wait for instead
+                try:
+                    more, element = reader.get(timeout=0 if len(pending) > 0 else None)
+                    if more:
+                        pending.append(executor.submit(function, cast(_T, element)))
+                    else:
+                        exhausted = True
+                except queue.Empty:
+                    break
+            if len(pending) == 0:
+                return
+            yield pending.popleft().result()
+    finally:
+        reader.close()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,113 @@
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from collections import deque
+from heapq import merge
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, Iterator, Set, Tuple, TypeVar
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+_JOB_FILE = "job.json"
+_PARTITION_FILE = "partition-{:010d}.pickle"
+_PARTITION_PATTERN = re.compile(r"partition-(\d{10})\.pickle")
+
+
+def _index(pair: Tuple[int, Any]) -> int:
+    return pair[0]
+
+
+class Checkpoint:
+    """
+    Directory recording the partial result of every completed input partition of a job, so that a restarted job
+    only computes the remaining partitions. Partial results are pickled and written atomically.
+    The job description is recorded with the checkpoint and must match when the job is resumed.
+
+    :param directory: Directory of the checkpoint, created if missing
+    :param job: Description of the operation and partitioning, must be JSON serializable
+    :raises ValueError: The directory holds the checkpoint of a different job
+    """
+
+    __directory: str
+    __completed: Set[int]
+
+    def __init__(self, directory: str, job: Dict[str, Any]):
+        self.__directory = directory
+        os.makedirs(directory, exist_ok=True)
+        job_path = os.path.join(directory, _JOB_FILE)
+        if os.path.exists(job_path):
+            with open(job_path) as file:
+                recorded = json.load(file)
+            if recorded != job:
+                raise ValueError(f"Checkpoint {directory} belongs to a different job: {recorded}, not {job}")
+        else:
+            self.__write(_JOB_FILE, json.dumps(job).encode())
+        self.__completed = {
+            int(match.group(1))
+            for match in map(_PARTITION_PATTERN.fullmatch, os.listdir(directory))
+            if match is not None
+        }
+
+    @property
+    def completed(self) -> Set[int]:
+        """Indices of the partitions whose partial results are recorded."""
+        return set(self.__completed)
+
+    def __write(self, name: str, data: bytes) -> None:
+        file, temporary_path = tempfile.mkstemp(dir=self.__directory, prefix=".tmp-")
+        try:
+            with os.fdopen(file, "wb") as writer:
+                writer.write(data)
+                writer.flush()
+                os.fsync(writer.fileno())
+            os.replace(temporary_path, os.path.join(self.__directory, name))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def save(self, index: int, result: Any) -> None:
+        self.__write(_PARTITION_FILE.format(index), pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        self.__completed.add(index)
+
+    def load(self, index: int) -> Any:
+        with open(os.path.join(self.__directory, _PARTITION_FILE.format(index)), "rb") as file:
+            return pickle.load(file)
+
+    def remove(self) -> None:
+        """Deletes the checkpoint directory."""
+        shutil.rmtree(self.__directory, ignore_errors=True)
+
+    def resume(
+            self,
+            partitions: Iterable[_T],
+            compute: Callable[[Iterable[_T]], Iterator[_R]]
+    ) -> Generator[_R, None, None]:
+        """
+        Yields the partial result of every partition in order. Recorded results are loaded, the remaining partitions
+        are still read from the source but only they are passed to compute, and their results are recorded.
+
+        :param partitions: Partitions of the job, in the same order in every run
+        :param compute: Maps partitions to their results in order, e.g. imap of a pool
+        """
+        completed = self.__completed.copy()
+        indices: Deque[int] = deque()
+
+        def remaining() -> Generator[_T, None, None]:
+            for index, partition in enumerate(partitions):
+                if index not in completed:
+                    # Appended before the partition is submitted, so results and indices are matched in order
+                    indices.append(index)
+                    yield partition
+
+        def computed() -> Generator[Tuple[int, _R], None, None]:
+            for result in compute(remaining()):
+                index = indices.popleft()
+                self.save(index, result)
+                yield index, result
+
+        recorded = ((index, self.load(index)) for index in sorted(completed))
+        for _, result in merge(recorded, computed(), key=_index):
+            yield result
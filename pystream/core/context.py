@@ -0,0 +1,63 @@
+import os
+import threading
+import uuid
+from multiprocessing import util
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+_T = TypeVar("_T")
+
+# Resources created in the current thread, by context token
+_local = threading.local()
+# Resources created in the process owning the context, released by the stream instead of at interpreter exit
+_owned: Dict[str, List[Tuple[Callable[[Any], Any], Any]]] = {}
+_owned_lock = threading.Lock()
+
+# Run teardown before the exit handlers of multiprocessing itself (priority 0)
+_TEARDOWN_PRIORITY = 10
+
+
+class WorkerContext(Generic[_T]):
+    """
+    Picklable handle of a resource created lazily once per process and thread which uses it.
+    In worker processes the teardown runs when the pool shuts down, in the process which created
+    the handle it runs on release.
+
+    :param initializer: Creates the resource
+    :param teardown: Releases the resource
+    """
+
+    __initializer: Callable[[], _T]
+    __teardown: Optional[Callable[[_T], Any]]
+    __token: str
+    __owner: int
+
+    def __init__(self, initializer: Callable[[], _T], teardown: Optional[Callable[[_T], Any]] = None):
+        self.__initializer = initializer
+        self.__teardown = teardown
+        self.__token = uuid.uuid4().hex
+        self.__owner = os.getpid()
+
+    def get(self) -> _T:
+        resources: Dict[str, Any] = _local.__dict__.setdefault("resources", {})
+        if self.__token not in resources:
+            resource = self.__initializer()
+            resources[self.__token] = resource
+            if self.__teardown is not None:
+                if os.getpid() == self.__owner:
+                    with _owned_lock:
+                        _owned.setdefault(self.__token, []).append((self.__teardown, resource))
+                else:
+                    util.Finalize(None, self.__teardown, args=(resource,), exitpriority=_TEARDOWN_PRIORITY)
+        return resources[self.__token]  # type: ignore[no-any-return]
+
+    def release(self) -> None:
+        """Tears down resources created by this process, forgets the one of the calling thread."""
+        _local.__dict__.get("resources", {}).pop(self.__token, None)
+        with _owned_lock:
+            owned = _owned.pop(self.__token, [])
+        for teardown, resource in owned:
+            teardown(resource)
+
+
+def call_with_context(x: Any, /, context: WorkerContext[_T], mapper: Callable[[_T, Any], Any]) -> Any:
+    return mapper(context.get(), x)
@@ -0,0 +1,94 @@
+from functools import partial
+from itertools import chain
+from typing import Any, Callable, Generator, Iterable, Optional, Set, TypeVar
+
+from typing_extensions import Literal
+
+import pystream.core.utils as utils
+import pystream.sketches as sketches
+
+_T = TypeVar("_T")
+
+DistinctMode = Literal["exact", "bloom"]
+
+_SPILL_PARTITIONS = 32
+# Keys colliding at every level can not be split further, such partitions are deduplicated in memory
+_MAX_SPILL_LEVEL = 4
+
+_END: Any = object()
+
+
+def check_mode(mode: DistinctMode) -> None:
+    if mode not in ("exact", "bloom"):
+        raise ValueError(f"Unknown distinct mode: {mode!r}")
+
+
+def _key_of(x: Any, key: Optional[Callable[[Any], Any]]) -> Any:
+    return x if key is None else key(x)
+
+
+def _spill_partition(key_value: Any, /, level: int) -> int:
+    return hash((level, key_value)) % _SPILL_PARTITIONS
+
+
+def _element_partition(x: Any, /, key: Optional[Callable[[Any], Any]], level: int) -> int:
+    return _spill_partition(_key_of(x, key), level=level)
+
+
+def exact_distinct(
+        iterable: Iterable[_T],
+        key: Optional[Callable[[_T], Any]],
+        max_keys_in_memory: int,
+        level: int = 0,
+        seen: Optional[Set[Any]] = None
+) -> Generator[_T, None, None]:
+    """
+    Yields the first element of every key. Keys are kept in a hash set, once it holds max_keys_in_memory keys
+    the set and the remaining elements are hash-partitioned into temporary files and every partition
+    is deduplicated on its own, recursively when it is still too large.
+    Elements are yielded in order until the first spill, then partition by partition.
+
+    :param seen: Keys of elements already yielded
+    """
+    if max_keys_in_memory < 1:
+        raise ValueError(f"Memory budget must be positive, got {max_keys_in_memory}")
+    seen = set() if seen is None else seen
+    iterator = iter(iterable)
+    overflow: Any = _END
+    for x in iterator:
+        key_value = _key_of(x, key)
+        if key_value in seen:
+            continue
+        if len(seen) >= max_keys_in_memory and level < _MAX_SPILL_LEVEL:
+            overflow = x
+            break
+        seen.add(key_value)
+        yield x
+    if overflow is _END:
+        return
+    key_files = utils.spill(seen, partial(_spill_partition, level=level), _SPILL_PARTITIONS)
+    del seen
+    element_files = utils.spill(
+        chain([overflow], iterator), partial(_element_partition, key=key, level=level), _SPILL_PARTITIONS
+    )
+    for key_file, element_file in zip(key_files, element_files):
+        yield from exact_distinct(
+            utils.unspill(element_file), key, max_keys_in_memory, level + 1, set(utils.unspill(key_file))
+        )
+
+
+def bloom_distinct(
+        iterable: Iterable[_T],
+        key: Optional[Callable[[_T], Any]],
+        capacity: int,
+        error_rate: float
+) -> Generator[_T, None, None]:
+    """
+    Yields the elements whose key was not seen before according to a Bloom filter, in order.
+    Never yields a key twice, but drops elements of unseen keys with probability up to error_rate.
+    Keys must have a stable hash, see core.utils.stable_hash.
+    """
+    seen = sketches.BloomFilter(capacity, error_rate)
+    for x in iterable:
+        if seen.add(_key_of(x, key)):
+            yield x
@@ -0,0 +1,167 @@
+from functools import partial
+from itertools import chain
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from typing_extensions import Literal
+
+import pystream.core.utils as utils
+
+_LT = TypeVar("_LT")
+_RT = TypeVar("_RT")
+_T = TypeVar("_T")
+
+JoinHow = Literal["inner", "left", "right", "outer"]
+
+_SPILL_PARTITIONS = 32
+
+_END: Any = object()
+
+
+def preserved_sides(how: JoinHow) -> Tuple[bool, bool]:
+    """
+    :return: Whether unmatched left and unmatched right elements are emitted by the join
+    """
+    if how not in ("inner", "left", "right", "outer"):
+        raise ValueError(f"Unknown join type: {how!r}")
+    return how in ("left", "outer"), how in ("right", "outer")
+
+
+def _in_memory_join(
+        left: Iterable[_LT],
+        right: Iterable[_RT],
+        left_key: Callable[[_LT], Any],
+        right_key: Callable[[_RT], Any],
+        how: JoinHow,
+        build_left: bool
+) -> Generator[Tuple[Optional[_LT], Optional[_RT]], None, None]:
+    keep_left, keep_right = preserved_sides(how)
+    # Sides swap depending on build_left, so their element types are not known statically
+    build: Iterable[Any]
+    probe: Iterable[Any]
+    build_key: Callable[[Any], Any]
+    probe_key: Callable[[Any], Any]
+    row: Any
+    if build_left:
+        build, probe, build_key, probe_key, keep_build, keep_probe = left, right, left_key, right_key, keep_left, keep_right
+    else:
+        build, probe, build_key, probe_key, keep_build, keep_probe = right, left, right_key, left_key, keep_right, keep_left
+    table: Dict[Any, List[Any]] = {}
+    for row in build:
+        table.setdefault(build_key(row), []).append(row)
+    matched: Set[Any] = set()
+    for row in probe:
+        key = probe_key(row)
+        rows = table.get(key)
+        if rows is not None:
+            if keep_build:
+                matched.add(key)
+            for build_row in rows:
+                yield (build_row, row) if build_left else (row, build_row)
+        elif keep_probe and build_left:
+            yield None, row
+        elif keep_probe:
+            yield row, None
+    if keep_build:
+        for key, rows in table.items():
+            if key not in matched:
+                for build_row in rows:
+                    if build_left:
+                        yield build_row, None
+                    else:
+                        yield None, build_row
+
+
+def _spill_partition(row: Any, /, key_getter: Callable[[Any], Any]) -> int:
+    return hash(key_getter(row)) % _SPILL_PARTITIONS
+
+
+def hash_join(
+        left: Iterable[_LT],
+        right: Iterable[_RT],
+        left_key: Callable[[_LT], Any],
+        right_key: Callable[[_RT], Any],
+        how: JoinHow = "inner",
+        max_build_size: Optional[int] = None
+) -> Generator[Tuple[Optional[_LT], Optional[_RT]], None, None]:
+    """
+    Build/probe hash join. Both inputs are read in lock-step until one of them is exhausted,
+    the exhausted (smaller) side becomes the build side. When both sides outgrow max_build_size
+    they are hash-partitioned into temporary files and the partitions are joined one by one (grace hash join).
+    Pairs are emitted in probe order, followed by unmatched build elements for outer joins.
+    """
+    preserved_sides(how)
+    left_iterator, right_iterator = iter(left), iter(right)
+    left_rows: List[_LT] = []
+    right_rows: List[_RT] = []
+    while max_build_size is None or len(left_rows) < max_build_size:
+        left_row = next(left_iterator, _END)
+        if left_row is _END:
+            yield from _in_memory_join(left_rows, chain(right_rows, right_iterator), left_key, right_key, how, True)
+            return
+        left_rows.append(left_row)
+        right_row = next(right_iterator, _END)
+        if right_row is _END:
+            yield from _in_memory_join(chain(left_rows, left_iterator), right_rows, left_key, right_key, how, False)
+            return
+        right_rows.append(right_row)
+    left_files = utils.spill(
+        chain(left_rows, left_iterator), partial(_spill_partition, key_getter=left_key), _SPILL_PARTITIONS
+    )
+    right_files = utils.spill(
+        chain(right_rows, right_iterator), partial(_spill_partition, key_getter=right_key), _SPILL_PARTITIONS
+    )
+    del left_rows, right_rows
+    for left_file, right_file in zip(left_files, right_files):
+        yield from _in_memory_join(
+            utils.unspill(left_file), utils.unspill(right_file), left_key, right_key, how, False
+        )
+
+
+def merge_join(
+        left: Iterable[_LT],
+        right: Iterable[_RT],
+        left_key: Callable[[_LT], Any],
+        right_key: Callable[[_RT], Any],
+        how: JoinHow = "inner"
+) -> Generator[Tuple[Optional[_LT], Optional[_RT]], None, None]:
+    """
+    Sort-merge join of inputs sorted ascending by their keys. Holds only the run of right elements
+    sharing the current key in memory.
+    """
+    keep_left, keep_right = preserved_sides(how)
+    right_iterator = iter(right)
+    right_row = next(right_iterator, _END)
+    right_row_key = None if right_row is _END else right_key(right_row)
+    group: List[_RT] = []
+    group_key: Any = _END
+    group_matched = False
+    for left_row in left:
+        key = left_key(left_row)
+        if group_key is _END or group_key != key:
+            if keep_right and not group_matched:
+                for row in group:
+                    yield None, row
+            while right_row is not _END and right_row_key < key:
+                if keep_right:
+                    yield None, right_row
+                right_row = next(right_iterator, _END)
+                right_row_key = None if right_row is _END else right_key(right_row)
+            group = []
+            while right_row is not _END and not key < right_row_key:
+                group.append(right_row)
+                right_row = next(right_iterator, _END)
+                right_row_key = None if right_row is _END else right_key(right_row)
+            group_key, group_matched = key, False
+        if len(group) > 0:
+            group_matched = True
+            for row in group:
+                yield left_row, row
+        elif keep_left:
+            yield left_row, None
+    if keep_right:
+        if not group_matched:
+            for row in group:
+                yield None, row
+        while right_row is not _END:
+            yield None, right_row
+            right_row = next(right_iterator, _END)
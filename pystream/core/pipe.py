@@ -1,8 +1,9 @@
-from ast import Call
 from functools import reduce, partial
+from types import FrameType
 from typing import (
     Callable,
     Iterator,
+    Optional,
     List,
     Iterable,
     Any,
@@ -57,6 +58,34 @@ def filter_out_empty(iterable: Iterable[Union[_AT, Type[_Empty]]]) -> Iterator[_
     return filter(_is_not_empty, iterable)
 
 
+def _function_name(function: Any) -> str:
+    if isinstance(function, partial):
+        return _function_name(function.func)
+    return str(getattr(function, "__qualname__", type(function).__qualname__))
+
+
+def stage_name(frame: FrameType) -> Optional[str]:
+    """
+    Name of the stage applied by a frame, e.g. "map(parse)", or None if the frame does not apply a stage.
+    """
+    if frame.f_code is _map.__code__:
+        return f"map({_function_name(frame.f_locals['mapper'])})"
+    if frame.f_code is _filter.__code__:
+        return f"filter({_function_name(frame.f_locals['predicate'])})"
+    return None
+
+
+def chains_stages(frame: FrameType) -> bool:
+    """
+    Whether a frame only passes the result of a stage to the next one.
+    """
+    return frame.f_code is _apply_chain_operations.__code__
+
+
+def apply_to_partition(partition: Iterable[Any], /, operation: Callable[[Any], Union[_RT, Type[_Empty]]]) -> List[_RT]:
+    return list(filter_out_empty(map(operation, partition)))
+
+
 class Pipe(Generic[_RT]):
     __operation: Callable[[Any], _RT]
     __has_identity: bool
@@ -90,3 +119,6 @@ class Pipe(Generic[_RT]):
 
     def get_operation(self) -> Callable[[Any], _RT]:
         return self.__operation
+
+    def is_identity(self) -> bool:
+        return self.__operation is _identity
@@ -0,0 +1,135 @@
+import logging
+import math
+import pickle
+import threading
+from time import perf_counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough costs of the multiprocessing machinery, in seconds
+POOL_STARTUP_COST = 0.01
+TASK_OVERHEAD = 50e-6
+# Share of a task spent on per-task overhead the chunk size is chosen for
+_TASK_OVERHEAD_SHARE = 0.1
+# Chunks per process kept available for load balancing when the input length is known
+_CHUNKS_PER_PROCESS = 4
+
+
+class ExecutionPlan(NamedTuple):
+    """
+    Decision of ParallelStream.auto_parallel, with the measurements it is based on.
+    """
+
+    parallel: bool
+    n_processes: int
+    chunk_size: int
+    element_cost: float
+    transfer_cost: float
+    transfer_size: float
+    sample_size: int
+
+
+class Precomputed:
+    """
+    Result of the pipeline computed while sampling, passed through instead of being computed again.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def precomputed_or_apply(x: Any, /, operation: Callable[[Any], Any]) -> Any:
+    return x.value if isinstance(x, Precomputed) else operation(x)
+
+
+_cache: Dict[bytes, ExecutionPlan] = {}
+_cache_lock = threading.Lock()
+
+
+def cache_key(operation: Callable[[Any], Any], max_processes: int) -> Optional[bytes]:
+    try:
+        return pickle.dumps((operation, max_processes))
+    except Exception:
+        return None
+
+
+def cached_plan(key: Optional[bytes]) -> Optional[ExecutionPlan]:
+    if key is None:
+        return None
+    with _cache_lock:
+        return _cache.get(key)
+
+
+def clear_cache() -> None:
+    """Forgets all cached execution plans."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def measure(operation: Callable[[Any], Any], sample: List[Any]) -> Tuple[List[Any], float, float, float]:
+    """
+    Applies the operation to the sample in this process.
+
+    :return: Results, mean seconds per element, mean seconds to pickle an element and its result, mean pickled bytes
+    """
+    results: List[Any] = []
+    compute_time = transfer_time = transfer_size = 0.0
+    for x in sample:
+        start = perf_counter()
+        y = operation(x)
+        computed = perf_counter()
+        transfer_size += len(pickle.dumps(x)) + len(pickle.dumps(y))
+        transfer_time += perf_counter() - computed
+        compute_time += computed - start
+        results.append(y)
+    n = max(len(sample), 1)
+    return results, compute_time / n, transfer_time / n, transfer_size / n
+
+
+def make_plan(
+    element_cost: float,
+    transfer_cost: float,
+    transfer_size: float,
+    sample_size: int,
+    n_remaining: Optional[int],
+    max_processes: int,
+) -> ExecutionPlan:
+    """
+    Chooses the number of processes and the chunk size minimizing the estimated run time.
+    The parent serializes every element and result (pickling plus unpickling, roughly twice the pickling cost),
+    which bounds the parallel throughput. Unknown input length is treated as unbounded.
+    """
+    ipc_cost = 2 * transfer_cost
+    chunk_size = max(1, math.ceil(TASK_OVERHEAD / (_TASK_OVERHEAD_SHARE * max(element_cost, 1e-9))))
+
+    def estimate(n: int) -> float:
+        if n == 1:
+            return element_cost
+        per_element = max(element_cost / n, ipc_cost) + TASK_OVERHEAD / (n * chunk_size)
+        if n_remaining is None:
+            return per_element
+        return per_element + n * POOL_STARTUP_COST / max(n_remaining, 1)
+
+    n_processes = min(range(1, max(max_processes, 1) + 1), key=lambda n: (estimate(n), n))
+    if n_remaining is not None and n_processes > 1:
+        chunk_size = max(1, min(chunk_size, n_remaining // (_CHUNKS_PER_PROCESS * n_processes)))
+    plan = ExecutionPlan(
+        parallel=n_processes > 1,
+        n_processes=n_processes,
+        chunk_size=chunk_size if n_processes > 1 else 1,
+        element_cost=element_cost,
+        transfer_cost=transfer_cost,
+        transfer_size=transfer_size,
+        sample_size=sample_size,
+    )
+    logger.info("Execution plan: %s", plan)
+    return plan
+
+
+def remember(key: Optional[bytes], plan: ExecutionPlan) -> None:
+    if key is not None:
+        with _cache_lock:
+            _cache[key] = plan
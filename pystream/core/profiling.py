@@ -0,0 +1,217 @@
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, cast
+
+import pystream.core.pipe as core_pipe
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# Statistics of cProfile.Profile by (file, line, function), see pstats.Stats.stats
+StatsData = Dict[Tuple[str, int, str], Tuple[Any, ...]]
+
+
+class _Statistics:
+    """Statistics received from a worker, in the form pstats.Stats loads from a profiler."""
+
+    def __init__(self, stats: StatsData):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def _frame_name(frame: FrameType) -> str:
+    stage = core_pipe.stage_name(frame)
+    if stage is not None:
+        return stage
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapsed_stack(frame: FrameType) -> str:
+    """
+    Stack of frame below the profiled task in collapsed form: frame names from the outermost, separated by ";".
+    Frames applying a stage are named by the stage, see core.pipe.stage_name, and frames chaining stages are omitted.
+    """
+    names: List[str] = []
+    current: Optional[FrameType] = frame
+    while current is not None and current.f_code is not profiled.__code__:
+        # Frames of this module are the profiler starting or stopping to track the task
+        if not core_pipe.chains_stages(current) and current.f_globals.get("__name__") != __name__:
+            names.append(_frame_name(current))
+        current = current.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """
+    Thread counting the collapsed stacks of the tracked thread every interval seconds. Nothing is sampled
+    while no thread is tracked, so one sampler serves all tasks of a process.
+
+    :param interval: Seconds between samples
+    """
+
+    __interval: float
+    __tracked: Optional[int]
+    __stacks: Dict[str, int]
+    __lock: threading.Lock
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.__interval = interval
+        self.__tracked = None
+        self.__stacks = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def interval(self) -> float:
+        return self.__interval
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.__interval)
+            tracked = self.__tracked
+            frame = None if tracked is None else sys._current_frames().get(tracked)
+            if frame is None:
+                continue
+            stack = collapsed_stack(frame)
+            with self.__lock:
+                if stack != "" and self.__tracked == tracked:
+                    self.__stacks[stack] = self.__stacks.get(stack, 0) + 1
+
+    def track(self, thread_id: Optional[int]) -> None:
+        """
+        Samples the thread of thread_id from now on, none if None.
+        """
+        with self.__lock:
+            self.__tracked = thread_id
+
+    def take(self) -> Dict[str, int]:
+        """
+        :return: Number of samples of each collapsed stack since the last call
+        """
+        with self.__lock:
+            stacks, self.__stacks = self.__stacks, {}
+        return stacks
+
+
+_sampler: Optional[StackSampler] = None
+
+
+def _running_sampler(interval: float) -> StackSampler:
+    global _sampler
+    # Threads do not survive fork, a sampler inherited by a worker is not alive
+    if _sampler is None or not _sampler.is_alive() or _sampler.interval != interval:
+        if _sampler is not None:
+            _sampler.track(None)
+        _sampler = StackSampler(interval)
+        _sampler.start()
+    return _sampler
+
+
+def profiled(
+        task: _T, /, function: Callable[[_T], _R], interval: Optional[float]
+) -> Tuple[_R, StatsData, Dict[str, int]]:
+    """
+    Applies function to task under cProfile and, if interval is given, the StackSampler of the process.
+
+    :return: The result, the statistics of cProfile and the number of samples of each collapsed stack
+    """
+    sampler = None if interval is None else _running_sampler(interval)
+    profiler = cProfile.Profile()
+    if sampler is not None:
+        sampler.track(threading.get_ident())
+    profiler.enable()
+    try:
+        result = function(task)
+    finally:
+        profiler.disable()
+        if sampler is not None:
+            sampler.track(None)
+    profiler.create_stats()
+    stats: StatsData = profiler.stats
+    return result, stats, {} if sampler is None else sampler.take()
+
+
+class Profile:
+    """
+    Profile of the tasks of a stream merged in the calling process, see ParallelStream.profile.
+
+    :param collapsed_stacks_path: File the sampled stacks are written to, or None to not sample stacks
+    :param interval: Seconds between samples of the stack
+    """
+
+    __collapsed_stacks_path: Optional[str]
+    __interval: float
+    __stats: pstats.Stats
+    __stacks: Dict[str, int]
+    __lock: threading.Lock
+
+    def __init__(self, collapsed_stacks_path: Optional[str] = None, interval: float = 0.005):
+        if interval <= 0:
+            raise ValueError(f"Sampling interval must be positive, got {interval}")
+        self.__collapsed_stacks_path = collapsed_stacks_path
+        self.__interval = interval
+        self.__stats = pstats.Stats()
+        self.__stacks = {}
+        self.__lock = threading.Lock()
+
+    def task_function(self, function: Callable[[_T], _R]) -> Callable[[_T], Tuple[_R, StatsData, Dict[str, int]]]:
+        """
+        :return: Picklable function profiling function in the worker, its results are passed to add
+        """
+        interval = None if self.__collapsed_stacks_path is None else self.__interval
+        return partial(profiled, function=function, interval=interval)
+
+    def add(self, profiled_result: Tuple[_R, StatsData, Dict[str, int]]) -> _R:
+        """
+        Merges the profile of a task.
+
+        :return: The result of the task
+        """
+        result, stats, stacks = profiled_result
+        with self.__lock:
+            # Stats loads objects other than Stats like profilers
+            self.__stats.add(cast(pstats.Stats, _Statistics(stats)))
+            for stack, samples in stacks.items():
+                self.__stacks[stack] = self.__stacks.get(stack, 0) + samples
+        return result
+
+    @property
+    def stats(self) -> pstats.Stats:
+        return self.__stats
+
+    @property
+    def stacks(self) -> Dict[str, int]:
+        """
+        Number of samples of each collapsed stack.
+        """
+        with self.__lock:
+            return dict(self.__stacks)
+
+    def write(self) -> None:
+        """
+        Writes the sampled stacks to the collapsed stacks file, one "stack samples" line per stack,
+        which is read by flamegraph.pl and speedscope. Replaces the file atomically.
+        """
+        if self.__collapsed_stacks_path is None:
+            return
+        directory = os.path.dirname(self.__collapsed_stacks_path)
+        file, temporary_path = tempfile.mkstemp(dir=directory or None, prefix=".tmp-")
+        try:
+            with os.fdopen(file, "w", encoding="utf-8") as writer:
+                for stack, samples in sorted(self.stacks.items()):
+                    writer.write(f"{stack} {samples}\n")
+            os.replace(temporary_path, self.__collapsed_stacks_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
@@ -0,0 +1,110 @@
+import math
+import os
+import posixpath
+from functools import lru_cache
+from typing import Generator, List, Optional
+
+N_PROCESSES_VARIABLE = "PYSTREAM_N_PROCESSES"
+
+
+def default_n_processes() -> int:
+    """
+    Number of processes of a parallel stream which is not given one: the PYSTREAM_N_PROCESSES environment variable
+    if set, otherwise available_cpus(). Resolved whenever a stream is created, not when pystream is imported.
+
+    :raises ValueError: The environment variable is not a positive integer
+    """
+    value = os.environ.get(N_PROCESSES_VARIABLE, "").strip()
+    if value == "":
+        return available_cpus()
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{N_PROCESSES_VARIABLE} must be a positive integer, got {value!r}")
+    return int(value)
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs the process can use: the CPUs of its affinity mask, bounded by the CPU quota of its cgroup.
+    Unlike os.cpu_count(), a container limited to 2 CPUs on a 96 core host gets 2.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cached_cgroup_cpu_limit()
+    return max(1, cpus if limit is None else min(cpus, limit))
+
+
+@lru_cache(maxsize=None)
+def _cached_cgroup_cpu_limit() -> Optional[int]:
+    return cgroup_cpu_limit()
+
+
+def cgroup_cpu_limit(proc_cgroup: str = "/proc/self/cgroup", root: str = "/sys/fs/cgroup") -> Optional[int]:
+    """
+    Reads the CPU quota of the cgroup of the process, or of an ancestor when that is lower, from cpu.max of
+    cgroup v2 or cpu.cfs_quota_us and cpu.cfs_period_us of cgroup v1.
+
+    :param proc_cgroup: File listing the cgroups of the process
+    :param root: Mount point of the cgroup file systems
+    :return: The quota in CPUs rounded up, None if unlimited or unknown
+    """
+    try:
+        with open(proc_cgroup, encoding="ascii") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return None
+    limits: List[int] = []
+    for line in lines:
+        fields = line.split(":", 2)
+        if len(fields) != 3:
+            continue
+        hierarchy, controllers, path = fields
+        if hierarchy == "0" and controllers == "":
+            # Hybrid hierarchies mount cgroup v2 under unified
+            unified = os.path.join(root, "unified")
+            mount = unified if os.path.isdir(unified) else root
+            for directory in _directories(mount, path):
+                limits.extend(_cpu_max(directory))
+        elif "cpu" in controllers.split(","):
+            mount = os.path.join(root, controllers)
+            for directory in _directories(mount if os.path.isdir(mount) else os.path.join(root, "cpu"), path):
+                limits.extend(_cfs_quota(directory))
+    return min(limits, default=None)
+
+
+def _directories(mount: str, path: str) -> Generator[str, None, None]:
+    """
+    Directories of the cgroup at path and of its ancestors. Inside a container the path is often the one
+    of the host, which is not mounted, so the walk ends at the mount point, the cgroup of the container.
+    """
+    path = posixpath.normpath("/" + path.lstrip("/"))
+    while True:
+        yield os.path.join(mount, path.lstrip("/"))
+        if path == "/":
+            return
+        path = posixpath.dirname(path)
+
+
+def _cpu_max(directory: str) -> List[int]:
+    try:
+        with open(os.path.join(directory, "cpu.max"), encoding="ascii") as file:
+            quota, period = file.read().split()[:2]
+    except (OSError, ValueError):
+        return []
+    if quota == "max" or not quota.isdigit() or not period.isdigit() or int(period) == 0:
+        return []
+    return [math.ceil(int(quota) / int(period))]
+
+
+def _cfs_quota(directory: str) -> List[int]:
+    try:
+        with open(os.path.join(directory, "cpu.cfs_quota_us"), encoding="ascii") as file:
+            quota = int(file.read())
+        with open(os.path.join(directory, "cpu.cfs_period_us"), encoding="ascii") as file:
+            period = int(file.read())
+    except (OSError, ValueError):
+        return []
+    if quota <= 0 or period <= 0:
+        return []
+    return [math.ceil(quota / period)]
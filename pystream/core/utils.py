@@ -1,8 +1,25 @@
+import dataclasses
+import datetime
+import enum
+import hashlib
+import numbers
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
 from itertools import islice, chain
-from multiprocessing.pool import Pool
-from typing import Generator, Sequence, TypeVar, Tuple, Iterator, Iterable, List, Generic, Callable, Union, cast
+from types import TracebackType
+from typing import IO, TYPE_CHECKING, Any, Generator, Optional, Sequence, TypeVar, Tuple, Iterator, Iterable, List, Generic, Callable, Type, Union, cast
+
+if TYPE_CHECKING:
+    from multiprocessing.pool import Pool
+
+    import pystream.cluster
 
 _T = TypeVar("_T")
+_R = TypeVar("_R")
+
+_MASK64 = (1 << 64) - 1
 
 
 def partition_generator(iterable: Iterable[_T], partition_length: int) -> Generator[list[_T], None, None]:
@@ -15,6 +32,68 @@ def partition_generator(iterable: Iterable[_T], partition_length: int) -> Genera
             break
 
 
+def spill(iterable: Iterable[_T], partition_of: Callable[[_T], int], n_partitions: int = 32) -> List[IO[bytes]]:
+    """
+    Writes the elements pickled into n_partitions temporary files.
+
+    :param partition_of: Function returning the index of the file of an element
+    :return: Files positioned at their start, read them with unspill
+    """
+    files: List[IO[bytes]] = [tempfile.TemporaryFile() for _ in range(n_partitions)]
+    try:
+        for element in iterable:
+            pickle.dump(element, files[partition_of(element)], pickle.HIGHEST_PROTOCOL)
+        for file in files:
+            file.seek(0)
+    except BaseException:
+        for file in files:
+            file.close()
+        raise
+    return files
+
+
+def spill_to_file(elements: Iterable[Any], directory: str, prefix: str = "spill-") -> str:
+    """
+    Writes the elements pickled into a new file in directory.
+
+    :return: Path of the file, read it with unspill
+    """
+    file, path = tempfile.mkstemp(dir=directory, prefix=prefix)
+    with os.fdopen(file, "wb") as writer:
+        for element in elements:
+            pickle.dump(element, writer, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def unspill(file: IO[bytes]) -> Generator[Any, None, None]:
+    """Reads the elements written by spill and closes the file."""
+    with file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+def guided_partition_generator(
+        iterable: Iterable[_T],
+        length: int,
+        n_processes: int,
+        min_partition_length: int
+) -> Generator[list[_T], None, None]:
+    """
+    Partitions of remaining / n_processes elements, shrinking towards min_partition_length (OpenMP guided schedule).
+    """
+    iterator = iter(iterable)
+    remaining = length
+    while True:
+        partition: list[_T] = list(islice(iterator, max(min_partition_length, -(-remaining // n_processes))))
+        if len(partition) == 0:
+            break
+        remaining -= len(partition)
+        yield partition
+
+
 def reduction_pairs_generator(iterable: Iterable[_T]) -> Generator[Union[tuple[_T, _T], tuple[_T]], None, None]:
     it = iter(iterable)
     while True:
@@ -24,11 +103,62 @@ def reduction_pairs_generator(iterable: Iterable[_T]) -> Generator[Union[tuple[_
         yield cast(Union[tuple[_T, _T], tuple[_T]], pair)
 
 
+class SerialPool:
+    """
+    Stand-in for multiprocessing Pool which executes tasks in the calling thread
+    """
+
+    def __enter__(self) -> "SerialPool":
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_val: Optional[BaseException],
+            exc_tb: Optional[TracebackType]
+    ) -> None:
+        pass
+
+    def imap(self, func: Callable[[_T], _R], iterable: Iterable[_T], chunksize: int = 1) -> Iterator[_R]:
+        return map(func, iterable)
+
+    def map(self, func: Callable[[_T], _R], iterable: Iterable[_T], chunksize: Optional[int] = None) -> List[_R]:
+        return list(map(func, iterable))
+
+    def close(self) -> None:
+        pass
+
+    def join(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+
+PoolLike = Union["Pool", SerialPool, "pystream.cluster.ClusterPool"]
+
+
+@contextmanager
+def pool_scope(pool: PoolLike) -> Generator[PoolLike, None, None]:
+    """
+    Unlike the context manager of Pool, shuts workers down gracefully when the block completes,
+    so exit handlers of the workers run. The pool is terminated if the block raises or the consumer stops early.
+    """
+    try:
+        yield pool
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+        pool.join()
+
+
 def fold(
         iterable: Iterable[_T],
         /,
         reducer: Callable[[Union[tuple[_T, _T], tuple[_T]]], _T],
-        pool: Pool,
+        pool: PoolLike,
         chunk_size: int = 1
 ) -> _T:
     """
@@ -43,3 +173,77 @@ def fold(
         first_pair = tuple(islice(iterable, 2))
         if len(first_pair) == 1: return first_pair[0]
         iterable = chain(first_pair, iterable)
+
+
+def stable_hash(x: object) -> int:
+    """
+    Hash which agrees for equal keys in all processes. Built-in hash of str and bytes is salted per
+    interpreter, and so is the hash of everything hashing them (enums, dates, dataclasses, tuples, ...),
+    so workers started with the spawn method would disagree about it.
+    Supports None, numbers, str, bytes, enums, date and time values, frozen dataclasses,
+    tuples and frozensets of them.
+
+    :raises TypeError: Type of the key has no hash stable between processes
+    """
+    if x is None:
+        return 0x9E3779B9
+    if isinstance(x, str):
+        x = x.encode("utf-8", "surrogatepass")
+    if isinstance(x, (bytes, bytearray)):
+        return int.from_bytes(hashlib.blake2b(x, digest_size=8).digest(), "little")
+    if isinstance(x, numbers.Number):
+        # Numeric hashes are not salted and agree for equal numbers of different types
+        return hash(x) & _MASK64
+    if isinstance(x, tuple):
+        h = 0x345678
+        for item in x:
+            h = ((h * 1000003) ^ stable_hash(item)) & _MASK64
+        return h ^ len(x)
+    if isinstance(x, frozenset):
+        h = len(x)
+        for item in x:
+            h ^= stable_hash(item)
+        return h
+    if isinstance(x, enum.Enum):
+        return stable_hash((type(x).__module__, type(x).__qualname__, x.name))
+    if isinstance(x, datetime.datetime):
+        offset = x.utcoffset()
+        if offset is not None:
+            x = x.replace(tzinfo=None, fold=0) - offset
+            return stable_hash(("datetime", x.timetuple()[:6], x.microsecond, "UTC"))
+        return stable_hash(("datetime", x.timetuple()[:6], x.microsecond))
+    if isinstance(x, datetime.date):
+        return stable_hash(("date", x.toordinal()))
+    if isinstance(x, datetime.time):
+        if x.utcoffset() is not None:
+            raise TypeError("Aware time values have no stable hash, use aware datetime values as keys")
+        return stable_hash(("time", x.hour, x.minute, x.second, x.microsecond))
+    if isinstance(x, datetime.timedelta):
+        return stable_hash(("timedelta", x.days, x.seconds, x.microseconds))
+    if dataclasses.is_dataclass(x) and not isinstance(x, type):
+        return stable_hash((type(x).__module__, type(x).__qualname__) + tuple(
+            getattr(x, field.name) for field in dataclasses.fields(x) if field.compare
+        ))
+    raise TypeError(
+        f"Keys of type {type(x).__qualname__} have no hash stable between processes, "
+        f"map them to str, bytes, numbers or tuples of them first"
+    )
+
+
+def bisect_right(
+        sequence: Sequence[_T],
+        value: Any,
+        key: Optional[Callable[[_T], Any]] = None,
+        lo: int = 0
+) -> int:
+    """
+    bisect.bisect_right with key support on Python older than 3.10
+    """
+    hi = len(sequence)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if value < (sequence[mid] if key is None else key(sequence[mid])):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
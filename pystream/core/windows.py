@@ -0,0 +1,214 @@
+import math
+from bisect import bisect_right
+from collections import deque
+from functools import reduce
+from typing import Any, Callable, Deque, Dict, Generator, Generic, Iterable, List, NamedTuple, Optional, Tuple, TypeVar
+
+import pystream.core.utils as utils
+
+_T = TypeVar("_T")
+
+
+class Window(NamedTuple):
+    """
+    Event-time window emitted by tumbling_window and session_window.
+    Value is the list of elements of the window in arrival order, or their aggregate when a combiner is given.
+    """
+
+    start: float
+    end: float
+    value: Any
+
+
+class TwoStackAggregator(Generic[_T]):
+    """
+    FIFO queue which keeps the aggregate of its elements under an associative combiner, with amortized O(1)
+    push, pop and query (two-stack sliding window aggregation). The combiner needs no inverse.
+    """
+
+    __combiner: Callable[[_T, _T], _T]
+    __front: List[Tuple[_T, _T]]
+    __back: List[_T]
+    __back_aggregate: Optional[Tuple[_T]]
+
+    def __init__(self, combiner: Callable[[_T, _T], _T]):
+        self.__combiner = combiner
+        # Oldest element on top, paired with the aggregate of itself and all newer elements of the front stack
+        self.__front = []
+        self.__back = []
+        self.__back_aggregate = None
+
+    def __len__(self) -> int:
+        return len(self.__front) + len(self.__back)
+
+    def push(self, x: _T) -> None:
+        self.__back.append(x)
+        self.__back_aggregate = (x,) if self.__back_aggregate is None else (
+            self.__combiner(self.__back_aggregate[0], x),
+        )
+
+    def pop(self) -> _T:
+        if len(self.__front) == 0:
+            while len(self.__back) > 0:
+                x = self.__back.pop()
+                aggregate = x if len(self.__front) == 0 else self.__combiner(x, self.__front[-1][1])
+                self.__front.append((x, aggregate))
+            self.__back_aggregate = None
+        return self.__front.pop()[0]
+
+    def query(self) -> _T:
+        """
+        :return: Aggregate of all elements from the oldest to the newest
+        :raises IndexError: The queue is empty
+        """
+        if len(self.__front) == 0:
+            if self.__back_aggregate is None:
+                raise IndexError("Aggregate of an empty queue")
+            return self.__back_aggregate[0]
+        if self.__back_aggregate is None:
+            return self.__front[-1][1]
+        return self.__combiner(self.__front[-1][1], self.__back_aggregate[0])
+
+
+def tumbling_count_windows(
+        iterable: Iterable[_T],
+        size: int,
+        combiner: Optional[Callable[[_T, _T], _T]]
+) -> Generator[Any, None, None]:
+    if size < 1:
+        raise ValueError(f"Window size must be positive, got {size}")
+    for window in utils.partition_generator(iterable, size):
+        if combiner is None:
+            yield window
+        else:
+            yield reduce(combiner, window)
+
+
+def sliding_count_windows(
+        iterable: Iterable[_T],
+        size: int,
+        step: int,
+        combiner: Optional[Callable[[_T, _T], _T]]
+) -> Generator[Any, None, None]:
+    if size < 1 or step < 1:
+        raise ValueError(f"Window size and step must be positive, got {size} and {step}")
+    if combiner is None:
+        elements: Deque[_T] = deque(maxlen=size)
+        for count, x in enumerate(iterable, 1):
+            elements.append(x)
+            if count >= size and (count - size) % step == 0:
+                yield list(elements)
+        return
+    aggregator = TwoStackAggregator(combiner)
+    for count, x in enumerate(iterable, 1):
+        aggregator.push(x)
+        if len(aggregator) > size:
+            aggregator.pop()
+        if count >= size and (count - size) % step == 0:
+            yield aggregator.query()
+
+
+class _OpenWindow:
+    __slots__ = ("start", "end", "value")
+
+    def __init__(self, start: float, end: float, value: Any):
+        self.start = start
+        self.end = end
+        self.value = value
+
+
+def _end(window: _OpenWindow) -> float:
+    return window.end
+
+
+def _add(window: _OpenWindow, x: Any, combiner: Optional[Callable[[Any, Any], Any]]) -> None:
+    if combiner is None:
+        window.value.append(x)
+    else:
+        window.value = combiner(window.value, x)
+
+
+def _merge(left: _OpenWindow, right: _OpenWindow, combiner: Optional[Callable[[Any, Any], Any]]) -> _OpenWindow:
+    return _OpenWindow(
+        min(left.start, right.start),
+        max(left.end, right.end),
+        left.value + right.value if combiner is None else combiner(left.value, right.value),
+    )
+
+
+def _initial(x: Any, combiner: Optional[Callable[[Any, Any], Any]]) -> Any:
+    return [x] if combiner is None else x
+
+
+def tumbling_time_windows(
+        iterable: Iterable[_T],
+        duration: float,
+        time_fn: Callable[[_T], float],
+        allowed_lateness: float,
+        combiner: Optional[Callable[[_T, _T], _T]],
+        on_late: Optional[Callable[[_T], Any]]
+) -> Generator[Window, None, None]:
+    if duration <= 0 or allowed_lateness < 0:
+        raise ValueError(f"Duration must be positive and lateness not negative, got {duration} and {allowed_lateness}")
+    windows: Dict[float, _OpenWindow] = {}
+    starts: List[float] = []
+    watermark = -math.inf
+    for x in iterable:
+        t = time_fn(x)
+        start = math.floor(t / duration) * duration
+        if start + duration <= watermark:
+            if on_late is not None:
+                on_late(x)
+            continue
+        window = windows.get(start)
+        if window is None:
+            windows[start] = _OpenWindow(start, start + duration, _initial(x, combiner))
+            starts.insert(bisect_right(starts, start), start)
+        else:
+            _add(window, x, combiner)
+        watermark = max(watermark, t - allowed_lateness)
+        while len(starts) > 0 and starts[0] + duration <= watermark:
+            closed = windows.pop(starts.pop(0))
+            yield Window(closed.start, closed.end, closed.value)
+    for start in starts:
+        closed = windows[start]
+        yield Window(closed.start, closed.end, closed.value)
+
+
+def session_windows(
+        iterable: Iterable[_T],
+        gap: float,
+        time_fn: Callable[[_T], float],
+        allowed_lateness: float,
+        combiner: Optional[Callable[[_T, _T], _T]],
+        on_late: Optional[Callable[[_T], Any]]
+) -> Generator[Window, None, None]:
+    if gap <= 0 or allowed_lateness < 0:
+        raise ValueError(f"Gap must be positive and lateness not negative, got {gap} and {allowed_lateness}")
+    # Open sessions ordered by start, their [start, end) ranges never overlap
+    sessions: List[_OpenWindow] = []
+    watermark = -math.inf
+    for x in iterable:
+        t = time_fn(x)
+        first = utils.bisect_right(sessions, t, key=_end)
+        last = first
+        while last < len(sessions) and sessions[last].start < t + gap:
+            last += 1
+        if first == last and t + gap <= watermark:
+            if on_late is not None:
+                on_late(x)
+            continue
+        session = _OpenWindow(t, t + gap, _initial(x, combiner))
+        for overlapping in sessions[first:last]:
+            if overlapping.start <= t:
+                # Keep the arrival order of elements which arrived in order
+                session = _merge(overlapping, session, combiner)
+            else:
+                session = _merge(session, overlapping, combiner)
+        sessions[first:last] = [session]
+        watermark = max(watermark, t - allowed_lateness)
+        while len(sessions) > 0 and sessions[0].end <= watermark:
+            closed = sessions.pop(0)
+            yield Window(closed.start, closed.end, closed.value)
+    for closed in sessions:
+        yield Window(closed.start, closed.end, closed.value)
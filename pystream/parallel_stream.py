@@ -1,9 +1,22 @@
-from functools import partial
-from itertools import chain
+from collections import deque
+from contextlib import contextmanager
+from functools import partial, reduce
+from heapq import merge
+from itertools import chain, islice
 from multiprocessing.pool import Pool
-from multiprocessing import cpu_count
+import threading
+import math
+import os
+import pstats
+import shutil
+import tempfile
+from time import perf_counter
 from typing import (
+    Deque,
+    Dict,
     Generic,
+    Hashable,
+    List,
     Iterator,
     TypeVar,
     Callable,
@@ -11,20 +24,61 @@ from typing import (
     Tuple,
     Any,
     Generator,
+    Optional,
+    Sequence,
+    Set,
+    Sized,
     cast,
 )
+from typing_extensions import Literal
 import pystream.core.utils as utils
 import pystream.sequential_stream as stream
 import pystream.core.pipe as core_pipe
+import pystream.core.join as core_join
+import pystream.core.distinct as core_distinct
+import pystream.core.checkpoint as core_checkpoint
+import pystream.core.planner as planner
+import pystream.core.background as background
+import pystream.core.context as core_context
+import pystream.core.resources as resources
+import pystream.core.profiling as core_profiling
 import pystream.collectors as collectors
+import pystream.cache as cache_module
+import pystream.streaming as streaming
+import pystream.cluster as cluster
+import pystream.sinks as sinks
 
 import pystream.types
 
+_T = TypeVar("_T")
 _AT = TypeVar("_AT")
 _RT = TypeVar("_RT")
 
+_CT = TypeVar("_CT")
+_H = TypeVar("_H", bound=Hashable)
+
 _NAT = TypeVar("_NAT", bound=pystream.types.SupportsAddAndCompare)
 
+# Lower bound on the number of elements processed by one worker task for partition-wise operations
+_MIN_PARTITION_SIZE = 256
+# Seconds between checks whether a stage feeding a bounded buffer was stopped
+_STAGE_POLL_INTERVAL = 0.1
+# Sinks write a file per partition, so partitions are larger than for tasks returning results
+_MIN_SINK_PARTITION_SIZE = 10000
+
+
+SchedulePolicy = Literal["static", "dynamic", "guided"]
+
+
+def _identity(x: _AT) -> _AT:
+    return x
+
+
+def _timed(task: _T, /, function: Callable[[_T], _RT]) -> Tuple[int, float, _RT]:
+    start = perf_counter()
+    result = function(task)
+    return os.getpid(), perf_counter() - start, result
+
 
 def _reducer(pair: Tuple[_AT, ...], /, reducer: Callable[[_AT, _AT], _AT]) -> _AT:
     return reducer(*pair) if len(pair) == 2 else pair[0]
@@ -39,30 +93,442 @@ def _with_action(x: _AT, /, action: Callable[[_AT], Any]) -> _AT:
     return x
 
 
+def _seed_with_identity(x: _AT, /, identity: _RT, accumulator: Callable[[_RT, _AT], _RT]) -> _RT:
+    return accumulator(identity, x)
+
+
+def _combine_by_key(
+    partition: List[Any],
+    /,
+    partition_operation: Callable[[List[Any]], List[Any]],
+    key_getter: Callable[[_AT], _H],
+    seed: Callable[[_AT], _RT],
+    accumulator: Callable[[_RT, _AT], _RT],
+    n_buckets: int,
+) -> List[Dict[_H, _RT]]:
+    buckets: List[Dict[_H, _RT]] = [{} for _ in range(n_buckets)]
+    for element in partition_operation(partition):
+        key = key_getter(element)
+        bucket = buckets[utils.stable_hash(key) % n_buckets]
+        bucket[key] = accumulator(bucket[key], element) if key in bucket else seed(element)
+    return buckets
+
+
+def _sorted_run(
+    partition: List[Any],
+    /,
+    partition_operation: Callable[[List[Any]], List[Any]],
+    key: Optional[Callable[[_AT], Any]],
+    n_samples: int,
+) -> Tuple[List[_AT], List[Any]]:
+    run: List[_AT] = partition_operation(partition)
+    run.sort(key=key)
+    if len(run) == 0:
+        return run, []
+    samples = [run[i * len(run) // n_samples] for i in range(n_samples)]
+    return run, samples if key is None else [key(x) for x in samples]
+
+
+def _apply_after(
+    partition: List[Any],
+    /,
+    before: Optional[Callable[[List[Any]], List[Any]]],
+    operation: Callable[[Any], Any],
+) -> List[Any]:
+    return core_pipe.apply_to_partition(partition if before is None else before(partition), operation=operation)
+
+
+def _map_batches(
+    partition: List[Any],
+    /,
+    before: Callable[[List[Any]], List[_AT]],
+    mapper: Callable[[List[_AT]], List[_RT]],
+    batch_size: int,
+) -> List[_RT]:
+    return list(chain.from_iterable(map(mapper, utils.partition_generator(before(partition), batch_size))))
+
+
+def _merge_runs(runs: List[List[_AT]], /, key: Optional[Callable[[_AT], Any]]) -> List[_AT]:
+    return list(merge(*runs, key=key))
+
+
+def _accumulate_partition(
+    partition: List[Any],
+    /,
+    partition_operation: Callable[[List[Any]], List[Any]],
+    supplier: Callable[[], _RT],
+    accumulator: Callable[[_RT, _AT], _RT],
+) -> _RT:
+    container = supplier()
+    for element in partition_operation(partition):
+        container = accumulator(container, element)
+    return container
+
+
+def _reduce_partition(
+    partition: List[Any],
+    /,
+    partition_operation: Callable[[List[Any]], List[_AT]],
+    reducer: Callable[[_AT, _AT], _AT],
+) -> List[_AT]:
+    elements = partition_operation(partition)
+    return [reduce(reducer, elements)] if len(elements) > 0 else []
+
+
+def _partition_by_key(
+    partition: List[Any],
+    /,
+    partition_operation: Callable[[List[Any]], List[Any]],
+    key_getter: Callable[[_AT], Any],
+    n_buckets: int,
+) -> List[List[_AT]]:
+    buckets: List[List[_AT]] = [[] for _ in range(n_buckets)]
+    for element in partition_operation(partition):
+        buckets[utils.stable_hash(key_getter(element)) % n_buckets].append(element)
+    return buckets
+
+
+def _join_buckets(
+    buckets: Tuple[List[_AT], List[_RT]],
+    /,
+    left_key: Callable[[_AT], Any],
+    right_key: Callable[[_RT], Any],
+    how: "core_join.JoinHow",
+) -> List[Tuple[Optional[_AT], Optional[_RT]]]:
+    pairs = core_join.hash_join(buckets[0], buckets[1], left_key, right_key, how)
+    return list(pairs)
+
+
+def _distinct_partition(
+    partition: List[Any],
+    /,
+    partition_operation: Callable[[List[Any]], List[Any]],
+    key: Optional[Callable[[Any], Any]],
+    n_buckets: int,
+    directory: str,
+) -> List[Optional[str]]:
+    """
+    Drops duplicates within the partition and writes the rest hash-partitioned by key to files in directory.
+
+    :return: Path of the file of every bucket, None for empty buckets
+    """
+    buckets: List[List[Any]] = [[] for _ in range(n_buckets)]
+    seen: Set[Any] = set()
+    for element in partition_operation(partition):
+        key_value = element if key is None else key(element)
+        if key_value not in seen:
+            seen.add(key_value)
+            buckets[utils.stable_hash(key_value) % n_buckets].append(element)
+    return [
+        None if len(bucket) == 0 else utils.spill_to_file(bucket, directory, f"bucket-{index:05d}-")
+        for index, bucket in enumerate(buckets)
+    ]
+
+
+def _unspill_files(paths: List[str]) -> Generator[Any, None, None]:
+    for path in paths:
+        yield from utils.unspill(open(path, "rb"))
+        os.unlink(path)
+
+
+def _distinct_bucket(
+    paths: List[str],
+    /,
+    key: Optional[Callable[[_AT], Any]],
+    mode: "core_distinct.DistinctMode",
+    max_keys_in_memory: int,
+    capacity: int,
+    error_rate: float,
+) -> List[_AT]:
+    elements: Iterator[_AT] = _unspill_files(paths)
+    if mode == "bloom":
+        return list(core_distinct.bloom_distinct(elements, key, capacity, error_rate))
+    return list(core_distinct.exact_distinct(elements, key, max_keys_in_memory))
+
+
+def _merge_by_key(partials: List[Dict[_H, _RT]], /, combiner: Callable[[_RT, _RT], _RT]) -> List[Tuple[_H, _RT]]:
+    merged: Dict[_H, _RT] = {}
+    for aggregates in partials:
+        for key, value in aggregates.items():
+            merged[key] = combiner(merged[key], value) if key in merged else value
+    return list(merged.items())
+
+
 class ParallelStream(Generic[_AT]):
     __n_processes: int
     __pipe: core_pipe.Pipe[_AT]
     __iterable: Iterator[_AT]
+    __length: Optional[int]
+    __auto_sample_size: Optional[int]
+    __plan: Optional[planner.ExecutionPlan]
+    __batches: Optional[Callable[[List[Any]], List[Any]]]
+    __batch_size: Optional[int]
+    __max_wait: Optional[float]
+    __contexts: List["core_context.WorkerContext[Any]"]
+    __schedule: SchedulePolicy
+    __busy_time: Dict[int, float]
+    __cluster: Optional[Callable[[], "cluster.ClusterPool"]]
+    __checkpoint_directory: Optional[str]
+    __keep_checkpoint: bool
+    __profile: Optional[core_profiling.Profile]
 
     def __init__(
         self,
         *iterables: Iterable[_AT],
-        n_processes: int = cpu_count(),
+        n_processes: Optional[int] = None,
         chunk_size: int = 1,
     ):
         self.__iterable = chain(*iterables)
-        self.__n_processes = n_processes
+        self.__length = (
+            sum(len(cast(Sized, iterable)) for iterable in iterables)
+            if all(isinstance(iterable, Sized) for iterable in iterables)
+            else None
+        )
+        self.__n_processes = resources.default_n_processes() if n_processes is None else n_processes
         self.__pipe = core_pipe.Pipe()
         self.__chunk_size = chunk_size
+        self.__auto_sample_size = None
+        self.__plan = None
+        self.__batches = None
+        self.__batch_size = None
+        self.__max_wait = None
+        self.__contexts = []
+        self.__schedule = "dynamic"
+        self.__busy_time = {}
+        self.__cluster = None
+        self.__checkpoint_directory = None
+        self.__keep_checkpoint = False
+        self.__profile = None
+
+    @contextmanager
+    def __pool(self, n_processes: Optional[int] = None) -> Generator[utils.PoolLike, None, None]:
+        if self.__auto_sample_size is not None and self.__plan is None and self.__batches is None:
+            self.__plan = self.__make_plan(self.__auto_sample_size)
+        if self.__plan is not None and not self.__plan.parallel:
+            pool: utils.PoolLike = utils.SerialPool()
+        elif self.__cluster is not None:
+            pool = self.__cluster()
+        else:
+            pool = Pool(processes=self.__n_processes if n_processes is None else n_processes)
+        try:
+            with utils.pool_scope(pool):
+                yield pool
+        finally:
+            for context in self.__contexts:
+                context.release()
+            if self.__profile is not None:
+                self.__profile.write()
 
-    def __iterator_pipe(self, pool: Pool) -> Iterator[_AT]:
-        return core_pipe.filter_out_empty(
-            pool.imap(
-                self.__pipe.get_operation(),
-                self.__iterable,
-                chunksize=self.__chunk_size,
+    def __make_plan(self, sample_size: int) -> planner.ExecutionPlan:
+        operation = self.__pipe.get_operation()
+        key = planner.cache_key(operation, self.__n_processes)
+        plan = planner.cached_plan(key)
+        if plan is None:
+            sample = list(islice(self.__iterable, sample_size))
+            results, element_cost, transfer_cost, transfer_size = planner.measure(operation, sample)
+            plan = planner.make_plan(
+                element_cost,
+                transfer_cost,
+                transfer_size,
+                len(sample),
+                None if self.__length is None else max(self.__length - len(sample), 0),
+                self.__n_processes,
             )
+            planner.remember(key, plan)
+            # Sampled elements are not computed again, so side effects of the pipeline happen once
+            precomputed_and_remaining: Iterator[Any] = chain(map(planner.Precomputed, results), self.__iterable)
+            self.__iterable = precomputed_and_remaining
+            self.__pipe = core_pipe.Pipe(partial(planner.precomputed_or_apply, operation=operation))
+        self.__n_processes = plan.n_processes
+        self.__chunk_size = plan.chunk_size
+        return plan
+
+    def schedule(self, policy: SchedulePolicy) -> "ParallelStream[_AT]":
+        """
+        Selects how elements are distributed among workers:
+
+        - dynamic: chunks of chunk_size elements are handed to workers as they become idle (default)
+        - static: the input is split into one contiguous block per process
+        - guided: chunks start at remaining / n_processes elements and shrink towards chunk_size,
+          keeping dispatch overhead low early and balancing skewed costs at the end
+
+        Static and guided scheduling require source iterables with known length.
+        Time spent by each worker is reported by worker_busy_time.
+
+        :param policy: One of "static", "dynamic", "guided"
+        :return: This stream
+        """
+        if policy not in ("static", "dynamic", "guided"):
+            raise ValueError(f"Unknown scheduling policy: {policy!r}")
+        self.__schedule = policy
+        return self
+
+    def on_cluster(
+        self,
+        addresses: Sequence["cluster.Address"],
+        max_retries: int = 3,
+        task_timeout: Optional[float] = None,
+        locality_wait: float = 0.5,
+    ) -> "ParallelStream[_AT]":
+        """
+        Executes the stream on pystream-worker processes, possibly of other hosts, instead of local processes.
+        Pipelines and data are pickled and sent over TCP, functions of the pipeline must be importable by the workers.
+        Tasks of a lost worker are retried on the remaining workers. Partitions starting with a cluster.FileSplit
+        are preferably run by workers on one of the hosts of the split, see cluster.file_splits.
+        The number of processes becomes the number of workers, which is the number of key partitions of barriers.
+
+        :param addresses: Host and port of each worker
+        :param max_retries: Number of times a task is retried after the worker running it was lost
+        :param task_timeout: Seconds after which a worker which did not return the result of a task is considered lost
+        :param locality_wait: Seconds a task waits for an idle worker on one of its hosts before any worker runs it
+        :return: This stream
+        """
+        if len(addresses) == 0:
+            raise ValueError("A cluster needs at least one worker")
+        self.__cluster = partial(
+            cluster.ClusterPool,
+            addresses,
+            max_retries=max_retries,
+            task_timeout=task_timeout,
+            locality_wait=locality_wait,
         )
+        self.__n_processes = len(addresses)
+        return self
+
+    def checkpoint(self, directory: str, keep: bool = False) -> "ParallelStream[_AT]":
+        """
+        Records the partial result of every completed input partition in directory, so that when the job fails,
+        running it again with the same directory only computes the remaining partitions. Applies to collect
+        with mergeable collectors, reduce, reduce_by_key and aggregate_by_key.
+        Partitions must be the same in every run: the source must yield the same elements in the same order,
+        e.g. file splits or a sequence, and the chunk size and scheduling must not change.
+        Partial results must be picklable.
+
+        :param directory: Directory of the checkpoint, one per job
+        :param keep: Whether the checkpoint is kept after the job completed, otherwise it is deleted
+        :return: This stream
+        """
+        self.__checkpoint_directory = directory
+        self.__keep_checkpoint = keep
+        return self
+
+    @contextmanager
+    def __partition_results(
+        self, pool: utils.PoolLike, function: Callable[[List[Any]], _RT], operation: str
+    ) -> Generator[Iterator[_RT], None, None]:
+        if self.__checkpoint_directory is None:
+            yield self.__imap(pool, function, self.__partitions())
+            return
+        if self.__max_wait is not None:
+            raise ValueError("Partitions closed by max_wait differ between runs and can not be checkpointed")
+        job = {
+            "operation": operation,
+            "chunk_size": self.__chunk_size,
+            "batch_size": self.__batch_size,
+            "schedule": self.__schedule,
+            "n_processes": None if self.__schedule == "dynamic" else self.__n_processes,
+        }
+        checkpoint = core_checkpoint.Checkpoint(self.__checkpoint_directory, job)
+        yield checkpoint.resume(self.__partitions(), partial(self.__imap, pool, function))
+        if not self.__keep_checkpoint:
+            checkpoint.remove()
+
+    def profile(self, collapsed_stacks: Optional[str] = None, interval: float = 0.005) -> "ParallelStream[_AT]":
+        """
+        Profiles the tasks of this stream in the worker processes, where the pipeline runs, while a profile of this
+        process only shows waits for results. Each task runs under cProfile and its statistics are sent back with
+        its result and merged into profile_stats.
+        When collapsed_stacks is given, a thread of each worker also samples the stack of the running task every
+        interval seconds, and all samples are written to that file, one "frame;frame;... samples" line per stack
+        as read by flamegraph.pl and speedscope.
+        Frames applying a map or filter are named by the stage and its function, e.g. map(parse), so that time is
+        attributed to stages. The file is written when the execution of the stream ends.
+
+        :param collapsed_stacks: Path of the collapsed stacks file, or None to not sample stacks
+        :param interval: Seconds between samples of the stack
+        :return: This stream
+        """
+        self.__profile = core_profiling.Profile(collapsed_stacks, interval)
+        return self
+
+    @property
+    def profile_stats(self) -> Optional[pstats.Stats]:
+        """
+        Statistics of the tasks of this stream merged from all workers, None unless profile was called.
+        """
+        return None if self.__profile is None else self.__profile.stats
+
+    @property
+    def worker_busy_time(self) -> Dict[int, float]:
+        """
+        Seconds each worker process spent executing tasks of this stream, by process id.
+        """
+        return dict(self.__busy_time)
+
+    def auto_parallel(self, sample_size: int = 32) -> "ParallelStream[_AT]":
+        """
+        Lets the stream decide at execution time whether to run in parallel, with how many processes
+        (at most the number this stream was created with) and what chunk size. The pipeline is applied to the first
+        sample_size elements in this process to measure the cost per element and the size of elements and results,
+        which are compared to estimated pool and transfer overhead. The decision is logged, cached per pipeline
+        and exposed as execution_plan. Pipelines with map_batches are not sampled and always run in parallel.
+
+        :param sample_size: Number of elements to measure
+        :return: This stream
+        """
+        self.__auto_sample_size = sample_size
+        return self
+
+    @property
+    def execution_plan(self) -> Optional[planner.ExecutionPlan]:
+        """
+        Decision taken by auto_parallel, None until the stream is executed.
+        """
+        return self.__plan
+
+    def __following(self, iterable: Iterable[_T]) -> "ParallelStream[_T]":
+        """Stream of the stage following a barrier, executed on the same processes or cluster."""
+        following = ParallelStream(iterable, n_processes=self.__n_processes, chunk_size=self.__chunk_size)
+        following.__cluster = self.__cluster
+        following.__profile = self.__profile
+        return following
+
+    def __partitions(self, min_size: int = _MIN_PARTITION_SIZE) -> Iterator[List[_AT]]:
+        size = max(self.__chunk_size, min_size)
+        if self.__batch_size is not None:
+            size = -(-size // self.__batch_size) * self.__batch_size
+        if self.__schedule != "dynamic":
+            if self.__length is None:
+                raise ValueError(f"{self.__schedule} scheduling requires sized source iterables")
+            if self.__schedule == "static":
+                size = max(size, math.ceil(self.__length / self.__n_processes))
+            else:
+                return utils.guided_partition_generator(self.__iterable, self.__length, self.__n_processes, size)
+        if self.__max_wait is not None:
+            return background.timed_partition_generator(self.__iterable, size, self.__max_wait)
+        return utils.partition_generator(self.__iterable, size)
+
+    def __partition_operation(self) -> Callable[[List[Any]], List[_AT]]:
+        return partial(_apply_after, before=self.__batches, operation=self.__pipe.get_operation())
+
+    def __is_identity(self) -> bool:
+        return self.__batches is None and self.__pipe.is_identity()
+
+    def __iterator_pipe(self, pool: utils.PoolLike) -> Iterator[_AT]:
+        return chain.from_iterable(self.__imap(pool, self.__partition_operation(), self.__partitions(min_size=1)))
+
+    def __imap(self, pool: utils.PoolLike, function: Callable[[_T], _RT], tasks: Iterable[_T]) -> Iterator[_RT]:
+        # Submitted eagerly: a lazy generator could be first advanced by the task handler thread of the pool
+        # (e.g. by fold), which would then block submitting tasks to itself
+        if self.__profile is None:
+            return map(self.__record_busy_time, pool.imap(partial(_timed, function=function), tasks))
+        profiled_results = pool.imap(partial(_timed, function=self.__profile.task_function(function)), tasks)
+        return map(self.__profile.add, map(self.__record_busy_time, profiled_results))
+
+    def __record_busy_time(self, timed_result: Tuple[int, float, _RT]) -> _RT:
+        pid, busy_time, result = timed_result
+        self.__busy_time[pid] = self.__busy_time.get(pid, 0.0) + busy_time
+        return result
 
     def iterator(self) -> Generator[_AT, None, None]:
         """
@@ -71,7 +537,10 @@ class ParallelStream(Generic[_AT]):
 
         :returns: Iterator over stream elements
         """
-        with Pool(processes=self.__n_processes) as pool:
+        if self.__is_identity():
+            yield from self.__iterable
+            return
+        with self.__pool() as pool:
             for element in self.__iterator_pipe(pool):
                 yield element
 
@@ -86,17 +555,75 @@ class ParallelStream(Generic[_AT]):
         """
         return utils.partition_generator(self.iterator(), partition_size)
 
-    def map(self, mapper: Callable[[_AT], _RT]) -> "ParallelStream[_RT]":
+    def map(
+        self,
+        mapper: Callable[[_AT], _RT],
+        cache: Optional["cache_module.DiskCache"] = None,
+    ) -> "ParallelStream[_RT]":
         """
         Returns a stream consisting of the results of applying the given function to the elements of this stream.
         This is an intermediate operation.
 
         :param mapper: Mapper function
+        :param cache: Disk cache to memoize the results of mapper in, shared by all workers. See DiskCache.memoize
         :return: Stream with mapper operation lazily applied
         """
+        if cache is not None:
+            mapper = cache.memoize(mapper)
         self.__pipe = self.__pipe.map(mapper)
         return cast("ParallelStream[_RT]", self)
 
+    def map_with_context(
+        self,
+        initializer: Callable[[], _CT],
+        mapper: Callable[[_CT, _AT], _RT],
+        teardown: Optional[Callable[[_CT], Any]] = None,
+    ) -> "ParallelStream[_RT]":
+        """
+        Returns a stream consisting of the results of applying the given function to a resource and each element.
+        The resource (a connection, a loaded model) is created by initializer once per worker on first use,
+        teardown runs when the pool shuts down.
+        This is an intermediate operation.
+
+        :param initializer: Picklable function creating the resource
+        :param mapper: Mapper function taking the resource and the element
+        :param teardown: Picklable function releasing the resource
+        :return: Stream with mapper operation lazily applied
+        """
+        context = core_context.WorkerContext(initializer, teardown)
+        self.__contexts.append(context)
+        return self.map(partial(core_context.call_with_context, context=context, mapper=mapper))
+
+    def map_batches(
+        self,
+        mapper: Callable[[List[_AT]], List[_RT]],
+        batch_size: int,
+        max_wait: Optional[float] = None,
+    ) -> "ParallelStream[_RT]":
+        """
+        Returns a stream consisting of the results of applying the given function to batches of elements of this stream.
+        Batches are formed inside workers from consecutive input elements which pass the preceding operations,
+        so a batch may hold fewer than batch_size elements. Results are flattened back into elements.
+        This is an intermediate operation.
+
+        :param mapper: Function mapping a list of elements to a list of results
+        :param batch_size: Maximal number of elements in a batch
+        :param max_wait: Seconds to wait for the source to fill a batch after its first element arrived.
+            Only the first map_batches of a stream controls how the source is read.
+        :return: Stream with mapper operation lazily applied
+        """
+        self.__batches = partial(
+            _map_batches,
+            before=self.__partition_operation(),
+            mapper=mapper,
+            batch_size=batch_size,
+        )
+        if self.__batch_size is None:
+            self.__batch_size = batch_size
+            self.__max_wait = max_wait
+        self.__pipe = core_pipe.Pipe()
+        return cast("ParallelStream[_RT]", self)
+
     def filter(self, predicate: Callable[[_AT], bool]) -> "ParallelStream[_AT]":
         """
         Returns a stream consisting of the elements of this stream that match the given predicate.
@@ -119,6 +646,101 @@ class ParallelStream(Generic[_AT]):
         """
         return self.map(mapper=partial(_with_action, action=action))
 
+    def stage(self, n_processes: Optional[int] = None, buffer_size: Optional[int] = None) -> "ParallelStream[_AT]":
+        """
+        Closes the stage formed by the operations applied since the previous stage boundary.
+        The stage runs in its own pool of n_processes and streams its results into the following stage through
+        a buffer of at most buffer_size in-flight chunks, so stages overlap and throughput is bounded
+        by the slowest stage instead of the sum of all stages.
+        This is an intermediate operation.
+
+        :param n_processes: Number of processes of the closed stage. Defaults to the number of processes of this stream.
+        :param buffer_size: Maximal number of chunks submitted to the closed stage and not yet consumed downstream.
+            Defaults to four chunks per process.
+        :return: Stream of the following stage
+        """
+        n_processes = self.__n_processes if n_processes is None else n_processes
+        if buffer_size is None:
+            buffer_size = 4 * n_processes
+        return self.__following(self.__run_stage(n_processes, buffer_size))
+
+    def __run_stage(self, n_processes: int, buffer_size: int) -> Generator[_AT, None, None]:
+        slots = threading.BoundedSemaphore(buffer_size)
+        stopped = threading.Event()
+
+        def admitted() -> Generator[List[_AT], None, None]:
+            for partition in self.__partitions(min_size=1):
+                # Pool feeds tasks from its own thread, which has to notice when the stage is torn down
+                while not slots.acquire(timeout=_STAGE_POLL_INTERVAL):
+                    if stopped.is_set():
+                        return
+                yield partition
+
+        def released(results: Iterable[List[_AT]]) -> Generator[List[_AT], None, None]:
+            for result in results:
+                slots.release()
+                yield result
+
+        with self.__pool(n_processes) as pool:
+            try:
+                yield from chain.from_iterable(
+                    released(self.__imap(pool, self.__partition_operation(), admitted()))
+                )
+            finally:
+                stopped.set()
+
+    def micro_batches(
+        self,
+        batch_size: int,
+        max_wait: float,
+        max_in_flight: Optional[int] = None,
+        metrics: Optional["streaming.StreamMetrics"] = None,
+    ) -> Generator[List[_AT], None, None]:
+        """
+        Runs the stream continuously over a possibly unbounded source, such as the sources of pystream.streaming.
+        Elements are grouped into micro-batches, which are closed once they hold batch_size elements or max_wait
+        seconds after their first element arrived. Every micro-batch is processed by one worker of a single pool kept
+        running for the whole life of the stream, results are emitted per micro-batch in order.
+        At most max_in_flight micro-batches are submitted and not yet consumed, so a slow consumer slows down reading
+        of the source instead of buffering it. Once the source ends, e.g. when the stop event of a source is set,
+        the batches in flight are drained and the pool is shut down.
+        This is terminal operation.
+
+        :param batch_size: Maximal number of source elements in a micro-batch
+        :param max_wait: Seconds after the arrival of its first element a micro-batch is closed at the latest
+        :param max_in_flight: Maximal number of micro-batches in flight. Defaults to two per process.
+        :param metrics: Records throughput and latency of the elements, see StreamMetrics
+        :return: Iterator over results of the micro-batches
+        """
+        if max_in_flight is None:
+            max_in_flight = 2 * self.__n_processes
+        slots = threading.BoundedSemaphore(max_in_flight)
+        stopped = threading.Event()
+        arrivals: Deque[List[float]] = deque()
+
+        def admitted() -> Generator[List[_AT], None, None]:
+            # Pool feeds tasks from its own thread, which has to notice when the stream is closed by the consumer
+            for batch in background.timed_partition_generator(
+                streaming.stamped(self.__iterable), batch_size, max_wait, stopped
+            ):
+                batch_arrivals, elements = streaming.split_stamps(batch)
+                while not slots.acquire(timeout=_STAGE_POLL_INTERVAL):
+                    if stopped.is_set():
+                        return
+                arrivals.append(batch_arrivals)
+                yield elements
+
+        with self.__pool() as pool:
+            try:
+                for results in self.__imap(pool, self.__partition_operation(), admitted()):
+                    batch_arrivals = arrivals.popleft()
+                    slots.release()
+                    if metrics is not None:
+                        metrics.record(batch_arrivals, len(results))
+                    yield results
+            finally:
+                stopped.set()
+
     def reduce(self, reducer: Callable[[_AT, _AT], _AT]) -> _AT:
         """
         Performs a reduction on the elements of this stream, using provided associative
@@ -127,7 +749,9 @@ class ParallelStream(Generic[_AT]):
         :param reducer: Function for combining two values
         :return: The result of the reduction
         """
-        with Pool(processes=self.__n_processes) as pool:
+        if self.__checkpoint_directory is not None:
+            return self.__reduce_partitions(reducer)
+        with self.__pool() as pool:
             return utils.fold(
                 self.__iterator_pipe(pool),
                 partial(_reducer, reducer=reducer),
@@ -135,6 +759,288 @@ class ParallelStream(Generic[_AT]):
                 self.__chunk_size,
             )
 
+    def __reduce_partitions(self, reducer: Callable[[_AT, _AT], _AT]) -> _AT:
+        with self.__pool() as pool:
+            function = partial(_reduce_partition, partition_operation=self.__partition_operation(), reducer=reducer)
+            results: Iterator[List[_AT]]
+            with self.__partition_results(pool, function, "reduce") as results:
+                return reduce(reducer, chain.from_iterable(results))
+
+    def reduce_by_key(self, key_getter: Callable[[_AT], _H], reducer: Callable[[_AT, _AT], _AT]) -> Dict[_H, _AT]:
+        """
+        Reduces elements sharing a key with the provided associative function.
+        Workers combine their partitions locally, partial results are hash-partitioned by key
+        and each partition is reduced by a worker, so only aggregates return to the caller.
+        This is terminal operation.
+
+        :param key_getter: Function extracting the key of an element
+        :param reducer: Function for combining two values with the same key
+        :return: Dictionary from key to the reduced value
+        :raises TypeError: A key has no hash stable between processes, see core.utils.stable_hash
+        """
+        return self.__aggregate_by_key(key_getter, _identity, reducer, reducer)
+
+    def aggregate_by_key(
+        self,
+        key_getter: Callable[[_AT], _H],
+        identity: _RT,
+        accumulator: Callable[[_RT, _AT], _RT],
+        combiner: Callable[[_RT, _RT], _RT],
+    ) -> Dict[_H, _RT]:
+        """
+        Aggregates elements sharing a key. Each worker folds elements of its partitions into per-key
+        aggregates starting from identity, partial aggregates are hash-partitioned by key and merged
+        with combiner in parallel. The identity is shared, so the accumulator should not mutate it.
+        This is terminal operation.
+
+        :param key_getter: Function extracting the key of an element
+        :param identity: The identity value for the accumulating function
+        :param accumulator: Function adding an element to an aggregate
+        :param combiner: Associative function for combining two aggregates
+        :return: Dictionary from key to the aggregated value
+        :raises TypeError: A key has no hash stable between processes, see core.utils.stable_hash
+        """
+        return self.__aggregate_by_key(
+            key_getter,
+            partial(_seed_with_identity, identity=identity, accumulator=accumulator),
+            accumulator,
+            combiner,
+        )
+
+    def __aggregate_by_key(
+        self,
+        key_getter: Callable[[_AT], _H],
+        seed: Callable[[_AT], _RT],
+        accumulator: Callable[[_RT, _AT], _RT],
+        combiner: Callable[[_RT, _RT], _RT],
+    ) -> Dict[_H, _RT]:
+        n_buckets = self.__n_processes
+        buckets: List[List[Dict[_H, _RT]]] = [[] for _ in range(n_buckets)]
+        with self.__pool() as pool:
+            combine = partial(
+                _combine_by_key,
+                partition_operation=self.__partition_operation(),
+                key_getter=key_getter,
+                seed=seed,
+                accumulator=accumulator,
+                n_buckets=n_buckets,
+            )
+            with self.__partition_results(pool, combine, "aggregate_by_key") as partials:
+                for partial_buckets in partials:
+                    for bucket, aggregates in zip(buckets, partial_buckets):
+                        if len(aggregates) > 0:
+                            bucket.append(aggregates)
+            result: Dict[_H, _RT] = {}
+            for key, value in chain.from_iterable(
+                self.__imap(pool, partial(_merge_by_key, combiner=combiner), buckets)
+            ):
+                # Keys are unique across buckets as long as the key hash is stable, merged anyway to never lose values
+                result[key] = combiner(result[key], value) if key in result else value
+            return result
+
+    def sorted(self, key: Optional[Callable[[_AT], Any]] = None) -> "ParallelStream[_AT]":
+        """
+        Returns a stream consisting of the elements of this stream sorted by key. The sort is stable.
+        Implemented as a parallel sample sort: workers sort their partitions and sample splitter keys,
+        runs are range-partitioned by the splitters and every range is merged by a worker.
+        Ranges are emitted in order as soon as they are merged.
+        This is a stateful intermediate operation, the sort is executed once the resulting stream is consumed.
+
+        :param key: Function extracting a comparison key from each element. The elements are compared when None.
+        :return: The new stream
+        """
+        return self.__following(self.__sample_sort(key))
+
+    def __sample_sort(self, key: Optional[Callable[[_AT], Any]]) -> Generator[_AT, None, None]:
+        n_ranges = self.__n_processes
+        with self.__pool() as pool:
+            runs: List[List[_AT]] = []
+            samples: List[Any] = []
+            run: List[_AT]
+            run_samples: List[Any]
+            for run, run_samples in self.__imap(
+                pool,
+                partial(
+                    _sorted_run,
+                    partition_operation=self.__partition_operation(),
+                    key=key,
+                    n_samples=n_ranges,
+                ),
+                self.__partitions(),
+            ):
+                if len(run) > 0:
+                    runs.append(run)
+                    samples.extend(run_samples)
+            if len(samples) == 0:
+                return
+            samples.sort()
+            splitters = [samples[i * len(samples) // n_ranges] for i in range(1, n_ranges)]
+            ranges: List[List[List[_AT]]] = [[] for _ in range(n_ranges)]
+            for run in runs:
+                lo = 0
+                for i, splitter in enumerate(splitters):
+                    hi = utils.bisect_right(run, splitter, key=key, lo=lo)
+                    ranges[i].append(run[lo:hi])
+                    lo = hi
+                ranges[-1].append(run[lo:])
+            del runs
+            for merged in self.__imap(pool, partial(_merge_runs, key=key), ranges):
+                yield from merged
+
+    def join(
+        self,
+        other: Iterable[_RT],
+        left_key: Callable[[_AT], Any],
+        right_key: Callable[[_RT], Any],
+        how: "core_join.JoinHow" = "inner",
+    ) -> "ParallelStream[Tuple[Optional[_AT], Optional[_RT]]]":
+        """
+        Returns a stream of pairs of elements of this stream and the other iterable with equal keys.
+        Workers hash-partition both sides by key, then every key partition is hash joined by a worker.
+        The order of pairs is not preserved. Missing side of a pair is None for elements kept unmatched
+        by left, right and outer joins.
+        This is a stateful intermediate operation, the join is executed once the resulting stream is consumed.
+
+        :param other: Right side of the join
+        :param left_key: Function extracting the join key from elements of this stream
+        :param right_key: Function extracting the join key from elements of other
+        :param how: One of "inner", "left", "right", "outer"
+        :return: The new stream
+        :raises TypeError: On consumption, when a key has no hash stable between processes,
+            see core.utils.stable_hash
+        """
+        core_join.preserved_sides(how)
+        pairs = self.__partitioned_join(other, left_key, right_key, how)
+        return self.__following(pairs)
+
+    def __partitioned_join(
+        self,
+        other: Iterable[_RT],
+        left_key: Callable[[_AT], Any],
+        right_key: Callable[[_RT], Any],
+        how: "core_join.JoinHow",
+    ) -> Generator[Tuple[Optional[_AT], Optional[_RT]], None, None]:
+        n_buckets = self.__n_processes
+        left_buckets: List[List[_AT]] = [[] for _ in range(n_buckets)]
+        right_buckets: List[List[_RT]] = [[] for _ in range(n_buckets)]
+        with self.__pool() as pool:
+            self.__partition_by_key(
+                pool, left_buckets, self.__partition_operation(), left_key, self.__partitions()
+            )
+            self.__partition_by_key(
+                pool,
+                right_buckets,
+                list,
+                right_key,
+                utils.partition_generator(other, max(self.__chunk_size, _MIN_PARTITION_SIZE)),
+            )
+            for pairs in self.__imap(
+                pool,
+                partial(_join_buckets, left_key=left_key, right_key=right_key, how=how),
+                zip(left_buckets, right_buckets),
+            ):
+                yield from pairs
+
+    def __partition_by_key(
+        self,
+        pool: utils.PoolLike,
+        buckets: List[List[_T]],
+        partition_operation: Callable[[List[Any]], List[_T]],
+        key_getter: Callable[[_T], Any],
+        partitions: Iterable[List[Any]],
+    ) -> None:
+        for partition_buckets in self.__imap(
+            pool,
+            partial(
+                _partition_by_key,
+                partition_operation=partition_operation,
+                key_getter=key_getter,
+                n_buckets=len(buckets),
+            ),
+            partitions,
+        ):
+            for bucket, elements in zip(buckets, partition_buckets):
+                bucket.extend(elements)
+
+    def distinct(
+        self,
+        key: Optional[Callable[[_AT], Any]] = None,
+        mode: "core_distinct.DistinctMode" = "exact",
+        max_keys_in_memory: int = 1_000_000,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.01,
+        spill_directory: Optional[str] = None,
+    ) -> "ParallelStream[_AT]":
+        """
+        Returns a stream consisting of one element of every distinct key of this stream.
+        Workers drop duplicates within their partitions and write the rest hash-partitioned by key to files,
+        then every key partition is read and deduplicated by a worker, see SequentialStream.distinct.
+        Elements are not held by this process until they are deduplicated.
+        The memory budget, or the capacity of the Bloom filter, is shared evenly between the key partitions.
+        The order of elements is not preserved.
+        This is a stateful intermediate operation, duplicates are dropped once the resulting stream is consumed.
+
+        :param key: Function extracting the key of an element. The elements are compared when None.
+        :param mode: One of "exact", "bloom"
+        :param max_keys_in_memory: Number of keys held in memory in exact mode
+        :param capacity: Number of distinct keys the Bloom filters are sized for
+        :param error_rate: False positive rate of the Bloom filters at capacity
+        :param spill_directory: Directory of the key partition files, readable by all workers, e.g. a shared
+            file system on a cluster. A temporary directory is created and removed when None.
+        :return: The new stream
+        :raises TypeError: On consumption, when a key has no hash stable between processes,
+            see core.utils.stable_hash
+        """
+        core_distinct.check_mode(mode)
+        distinct = self.__partitioned_distinct(key, mode, max_keys_in_memory, capacity, error_rate, spill_directory)
+        return self.__following(distinct)
+
+    def __partitioned_distinct(
+        self,
+        key: Optional[Callable[[_AT], Any]],
+        mode: "core_distinct.DistinctMode",
+        max_keys_in_memory: int,
+        capacity: int,
+        error_rate: float,
+        spill_directory: Optional[str],
+    ) -> Generator[_AT, None, None]:
+        n_buckets = self.__n_processes
+        directory = tempfile.mkdtemp(prefix="pystream-distinct-", dir=spill_directory)
+        buckets: List[List[str]] = [[] for _ in range(n_buckets)]
+        partition_buckets: List[Optional[str]]
+        distinct: List[_AT]
+        try:
+            with self.__pool() as pool:
+                for partition_buckets in self.__imap(
+                    pool,
+                    partial(
+                        _distinct_partition,
+                        partition_operation=self.__partition_operation(),
+                        key=key,
+                        n_buckets=n_buckets,
+                        directory=directory,
+                    ),
+                    self.__partitions(),
+                ):
+                    for bucket, path in zip(buckets, partition_buckets):
+                        if path is not None:
+                            bucket.append(path)
+                for distinct in self.__imap(
+                    pool,
+                    partial(
+                        _distinct_bucket,
+                        key=key,
+                        mode=mode,
+                        max_keys_in_memory=max(1, max_keys_in_memory // n_buckets),
+                        capacity=max(1, math.ceil(capacity / n_buckets)),
+                        error_rate=error_rate,
+                    ),
+                    buckets,
+                ):
+                    yield from distinct
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
     def for_each(self, action: Callable[[_AT], Any]) -> None:
         """
         Performs an action for each element of this stream.
@@ -145,6 +1051,103 @@ class ParallelStream(Generic[_AT]):
         for _ in self.map(action).iterator():
             pass
 
+    def to_files(
+        self,
+        pattern: str,
+        shard_by: Optional[Callable[[_AT], Any]] = None,
+        formatter: Callable[[_AT], str] = str,
+        compression: Optional["sinks.Compression"] = None,
+        encoding: str = "utf-8",
+    ) -> List["sinks.Shard"]:
+        """
+        Writes the elements of this stream as lines of text files. Every worker writes the results of its partitions
+        to its own files with large buffered writes, only the manifests of the files return to the caller.
+        Files are named by pattern with the partition number as {part} and the shard key as {shard},
+        e.g. "out/{shard}/part-{part}.txt", the extension of the compression is appended.
+        Files are written atomically and a partition written again replaces its files.
+        This is terminal operation.
+
+        :param pattern: Path of the files, must contain {part}, and {shard} when shard_by is given
+        :param shard_by: Function extracting the shard key of an element, elements of a shard go to its own files
+        :param formatter: Function formatting an element as a line, without the line terminator
+        :param compression: One of "gzip", "bz2", "xz", or None
+        :param encoding: Encoding of the files
+        :return: Path, number of rows and size in bytes of every written file, in partition order
+        """
+        encode = partial(sinks.lines_block, formatter=formatter)
+        return self.__write(pattern, encode, "", shard_by, compression, encoding)
+
+    def to_jsonl(
+        self, directory: str, compression: Optional["sinks.Compression"] = None
+    ) -> List["sinks.Shard"]:
+        """
+        Writes the elements of this stream as JSON lines to files part-{part}.jsonl in directory, see to_files.
+        This is terminal operation.
+
+        :param directory: Directory of the files, created if missing
+        :param compression: One of "gzip", "bz2", "xz", or None
+        :return: Path, number of rows and size in bytes of every written file, in partition order
+        """
+        return self.__write(
+            os.path.join(directory, "part-{part}.jsonl"), sinks.jsonl_block, "", None, compression, "utf-8"
+        )
+
+    def to_csv(
+        self,
+        directory: str,
+        header: Optional[Sequence[str]] = None,
+        dialect: str = "excel",
+        compression: Optional["sinks.Compression"] = None,
+        encoding: str = "utf-8",
+    ) -> List["sinks.Shard"]:
+        """
+        Writes the elements of this stream as CSV rows to files part-{part}.csv in directory, see to_files.
+        Elements are sequences of fields, or mappings from the names of the header to fields.
+        Every file starts with the header.
+        This is terminal operation.
+
+        :param directory: Directory of the files, created if missing
+        :param header: Names of the columns
+        :param dialect: Name of the csv dialect
+        :param compression: One of "gzip", "bz2", "xz", or None
+        :param encoding: Encoding of the files
+        :return: Path, number of rows and size in bytes of every written file, in partition order
+        """
+        return self.__write(
+            os.path.join(directory, "part-{part}.csv"),
+            partial(sinks.csv_block, header=header, dialect=dialect),
+            sinks.csv_header(header, dialect),
+            None,
+            compression,
+            encoding,
+        )
+
+    def __write(
+        self,
+        pattern: str,
+        encode: Callable[[Sequence[Any]], str],
+        header: str,
+        shard_by: Optional[Callable[[_AT], Any]],
+        compression: Optional["sinks.Compression"],
+        encoding: str,
+    ) -> List["sinks.Shard"]:
+        sinks.check_pattern(pattern, shard_by is not None, compression)
+        with self.__pool() as pool:
+            write = partial(
+                sinks.write_partition,
+                partition_operation=self.__partition_operation(),
+                pattern=pattern,
+                encode=encode,
+                header=header,
+                shard_by=shard_by,
+                compression=compression,
+                encoding=encoding,
+            )
+            shards: Iterator[List[sinks.Shard]] = self.__imap(
+                pool, write, enumerate(self.__partitions(min_size=_MIN_SINK_PARTITION_SIZE))
+            )
+            return list(chain.from_iterable(shards))
+
     def sequential(self) -> "stream.SequentialStream[_AT]":
         """
         :return: Sequential Stream. All ops applied on parallel stream still parallel.
@@ -154,16 +1157,33 @@ class ParallelStream(Generic[_AT]):
     def collect(self, collector: "collectors.Collector[_AT, _RT]") -> _RT:
         """
         Collects the stream using supplied collector.
+        Mergeable collectors accumulate partitions of the stream in workers and only merge the partial containers.
         This is terminal operation.
 
         :param collector:  Collector instance
         :return: The result of collector.collect(...)
         """
-        with Pool(processes=self.__n_processes) as pool:
+        if isinstance(collector, collectors.MergeableCollector):
+            return self.__collect_mergeable(cast("collectors.MergeableCollector[_AT, Any, _RT]", collector))
+        if self.__is_identity():
+            return collector.collect(stream.SequentialStream(self.__iterable))
+        with self.__pool() as pool:
             return collector.collect(
                 stream.SequentialStream(self.__iterator_pipe(pool))
             )
 
+    def __collect_mergeable(self, collector: "collectors.MergeableCollector[_AT, Any, _RT]") -> _RT:
+        with self.__pool() as pool:
+            accumulate = partial(
+                _accumulate_partition,
+                partition_operation=self.__partition_operation(),
+                supplier=collector.supplier,
+                accumulator=collector.accumulator,
+            )
+            with self.__partition_results(pool, accumulate, "collect") as containers:
+                container = reduce(collector.combiner, containers, collector.supplier())
+            return collector.finisher(container)
+
 
 class ParallelNumberLikeStream(ParallelStream[_NAT]):
     def max(self) -> _NAT:
@@ -183,3 +1203,13 @@ class ParallelNumberLikeStream(ParallelStream[_NAT]):
             Callable[[_NAT, _NAT], _NAT], partial(_order_reducer, selector=min)
         )
         return self.reduce(reducer)
+
+    def summary_statistics(self) -> "collectors.SummaryStatistics":
+        """
+        Computes count, sum, mean, variance, min and max of elements in one pass.
+        Each worker summarizes its partitions, the parent merges the partial statistics.
+        This is terminal operation.
+
+        :return: Summary statistics of elements in this stream
+        """
+        return self.collect(collectors.summary_statistics())
@@ -1,9 +1,10 @@
-from ast import Call
 from functools import reduce
 from itertools import chain, islice, count
-import os
 from typing import (
+    TYPE_CHECKING,
+    Dict,
     Generic,
+    Hashable,
     Sized,
     TypeVar,
     Callable,
@@ -14,20 +15,30 @@ from typing import (
     List,
     Union,
     Generator,
+    Optional,
     cast,
 )
-from multiprocessing import cpu_count
 from numbers import Number
 import operator as op
 
 import pystream.nullable as nullable
-import pystream.parallel_stream as parallel_stream
 import pystream.collectors as collectors
 import pystream.core.utils as utils
+import pystream.core.join as core_join
+import pystream.core.distinct as core_distinct
+import pystream.core.background as background
+import pystream.core.windows as core_windows
 import pystream.types
 
+if TYPE_CHECKING:
+    import pystream.cache as cache_module
+    import pystream.numeric as numeric
+    import pystream.parallel_stream as parallel_stream
+
 _AT = TypeVar("_AT")
 _RT = TypeVar("_RT")
+_CT = TypeVar("_CT")
+_H = TypeVar("_H", bound=Hashable)
 
 _NAT = TypeVar("_NAT", bound=pystream.types.SupportsAddAndCompare)
 
@@ -41,9 +52,12 @@ class SequentialStream(Generic[_AT], Iterable[_AT]):
     """
 
     __iterable: Iterator[_AT]
+    # Source and mapper when the last operation is map, so that prefetch can apply the mapper on its workers
+    __mapped: Optional[Tuple[Iterator[Any], Callable[[Any], _AT]]]
 
     def __init__(self, *iterables: Iterable[_AT]):
         self.__iterable = chain(*iterables)
+        self.__mapped = None
 
     def __iter__(self) -> Iterator[_AT]:
         return self.iterator()
@@ -68,15 +82,125 @@ class SequentialStream(Generic[_AT], Iterable[_AT]):
         """
         return utils.partition_generator(self.iterator(), partition_size)
 
-    def map(self, mapper: Callable[[_AT], _RT]) -> "SequentialStream[_RT]":
+    def map(
+        self,
+        mapper: Callable[[_AT], _RT],
+        cache: Optional["cache_module.DiskCache"] = None,
+    ) -> "SequentialStream[_RT]":
         """
         Returns a stream consisting of the results of applying the given function to the elements of this stream.
         This is an intermediate operation.
 
         :param mapper: Mapper function
+        :param cache: Disk cache to memoize the results of mapper in, see DiskCache.memoize
         :return: Stream with mapper operation lazily applied
         """
-        return SequentialStream(map(mapper, self.__iterable))
+        if cache is not None:
+            mapper = cache.memoize(mapper)
+        mapped = SequentialStream(map(mapper, self.__iterable))
+        mapped.__mapped = (self.__iterable, mapper)
+        return mapped
+
+    def map_to_int(self, mapper: Optional[Callable[[_AT], int]] = None) -> "numeric.IntStream":
+        """
+        Returns a stream of 64-bit integers stored in array blocks, see numeric.ArrayStream.
+        This is an intermediate operation.
+
+        :param mapper: Function mapping elements to integers. The elements must be integers when None.
+        :return: The new stream
+        """
+        import pystream.numeric as numeric
+
+        if mapper is None:
+            return numeric.IntStream(cast(Iterator[int], self.__iterable))
+        return numeric.IntStream(map(mapper, self.__iterable))
+
+    def map_to_float(self, mapper: Optional[Callable[[_AT], float]] = None) -> "numeric.FloatStream":
+        """
+        Returns a stream of double precision floats stored in array blocks, see numeric.ArrayStream.
+        This is an intermediate operation.
+
+        :param mapper: Function mapping elements to floats. The elements must be numbers when None.
+        :return: The new stream
+        """
+        import pystream.numeric as numeric
+
+        if mapper is None:
+            return numeric.FloatStream(cast(Iterator[float], self.__iterable))
+        return numeric.FloatStream(map(mapper, self.__iterable))
+
+    def prefetch(self, buffer_size: int, workers: int = 1) -> "SequentialStream[_AT]":
+        """
+        Returns a stream reading this stream ahead on background threads into a buffer of at most buffer_size elements,
+        so that slow sources are read while the consumer computes. Reading starts when the first element is requested,
+        exceptions are re-raised to the consumer and the threads stop once the stream is exhausted or closed.
+        When the last operation is map, its mapper is applied by worker threads concurrently, the order of elements
+        is preserved. Otherwise the stream is read by a single thread, as iterators cannot be advanced concurrently.
+        This is an intermediate operation.
+
+        :param buffer_size: Maximal number of elements read ahead
+        :param workers: Number of threads applying the last mapper
+        :return: The new stream
+        """
+        if buffer_size < 1 or workers < 1:
+            raise ValueError(f"Buffer size and workers must be positive, got {buffer_size} and {workers}")
+        if workers == 1 or self.__mapped is None:
+            return SequentialStream(background.prefetch_generator(self.__iterable, buffer_size))
+        source, mapper = self.__mapped
+        return SequentialStream(background.ordered_thread_map(mapper, source, buffer_size, workers))
+
+    def map_with_context(
+        self,
+        initializer: Callable[[], _CT],
+        mapper: Callable[[_CT, _AT], _RT],
+        teardown: Optional[Callable[[_CT], Any]] = None,
+    ) -> "SequentialStream[_RT]":
+        """
+        Returns a stream consisting of the results of applying the given function to a resource and each element.
+        The resource is created by initializer when the first element is requested and released by teardown
+        once the stream is exhausted or closed.
+        This is an intermediate operation.
+
+        :param initializer: Function creating the resource
+        :param mapper: Mapper function taking the resource and the element
+        :param teardown: Function releasing the resource
+        :return: Stream with mapper operation lazily applied
+        """
+
+        def with_context() -> Generator[_RT, None, None]:
+            resource = initializer()
+            try:
+                for element in self.__iterable:
+                    yield mapper(resource, element)
+            finally:
+                if teardown is not None:
+                    teardown(resource)
+
+        return SequentialStream(with_context())
+
+    def map_batches(
+        self,
+        mapper: Callable[[List[_AT]], List[_RT]],
+        batch_size: int,
+        max_wait: Optional[float] = None,
+    ) -> "SequentialStream[_RT]":
+        """
+        Returns a stream consisting of the results of applying the given function to batches of elements of this stream.
+        Results are flattened back into elements.
+        This is an intermediate operation.
+
+        :param mapper: Function mapping a list of elements to a list of results
+        :param batch_size: Maximal number of elements in a batch
+        :param max_wait: Seconds to wait for the source to fill a batch after its first element arrived.
+            When given, the source is read on a background thread.
+        :return: Stream with mapper operation lazily applied
+        """
+        batches = (
+            utils.partition_generator(self.__iterable, batch_size)
+            if max_wait is None
+            else background.timed_partition_generator(self.__iterable, batch_size, max_wait)
+        )
+        return SequentialStream(chain.from_iterable(map(mapper, batches)))
 
     def filter(self, predicate: Callable[[_AT], bool]) -> "SequentialStream[_AT]":
         """
@@ -99,6 +223,42 @@ class SequentialStream(Generic[_AT], Iterable[_AT]):
         """
         return reduce(accumulator, self.__iterable, identity)
 
+    def reduce_by_key(self, key_getter: Callable[[_AT], _H], reducer: Callable[[_AT, _AT], _AT]) -> Dict[_H, _AT]:
+        """
+        Reduces elements sharing a key with the provided associative function.
+        This is terminal operation.
+
+        :param key_getter: Function extracting the key of an element
+        :param reducer: Function for combining two values with the same key
+        :return: Dictionary from key to the reduced value
+        """
+        reduced: Dict[_H, _AT] = {}
+        for element in self.__iterable:
+            key = key_getter(element)
+            reduced[key] = reducer(reduced[key], element) if key in reduced else element
+        return reduced
+
+    def aggregate_by_key(
+        self,
+        key_getter: Callable[[_AT], _H],
+        identity: _RT,
+        accumulator: Callable[[_RT, _AT], _RT],
+    ) -> Dict[_H, _RT]:
+        """
+        Aggregates elements sharing a key, starting from the identity value for each key.
+        This is terminal operation.
+
+        :param key_getter: Function extracting the key of an element
+        :param identity: The identity value for the accumulating function
+        :param accumulator: Function adding an element to an aggregate
+        :return: Dictionary from key to the aggregated value
+        """
+        aggregated: Dict[_H, _RT] = {}
+        for element in self.__iterable:
+            key = key_getter(element)
+            aggregated[key] = accumulator(aggregated.get(key, identity), element)
+        return aggregated
+
     def for_each(self, action: Callable[[_AT], Any]) -> None:
         """
         Performs an action for each element of this stream.
@@ -177,6 +337,179 @@ class SequentialStream(Generic[_AT], Iterable[_AT]):
         """
         return SequentialStream(islice(self.__iterable, max_size))
 
+    def distinct(
+        self,
+        key: Optional[Callable[[_AT], Any]] = None,
+        mode: "core_distinct.DistinctMode" = "exact",
+        max_keys_in_memory: int = 1_000_000,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.01,
+    ) -> "SequentialStream[_AT]":
+        """
+        Returns a stream consisting of the first element of every distinct key of this stream.
+        In exact mode keys are kept in a hash set. Beyond max_keys_in_memory keys, the set and the remaining elements
+        are spilled to temporary files by key hash and deduplicated partition by partition,
+        so the order is preserved only up to the first spill.
+        In bloom mode keys are tracked by a Bloom filter of fixed size and the order is preserved,
+        but while at most capacity keys are distinct, up to error_rate of the first elements of keys are dropped.
+        This is an intermediate operation.
+
+        :param key: Function extracting the key of an element. The elements are compared when None.
+        :param mode: One of "exact", "bloom". Keys must have a stable hash in bloom mode, see core.utils.stable_hash.
+        :param max_keys_in_memory: Number of keys held in memory in exact mode
+        :param capacity: Number of distinct keys the Bloom filter is sized for
+        :param error_rate: False positive rate of the Bloom filter at capacity
+        :return: The new stream
+        """
+        core_distinct.check_mode(mode)
+        if mode == "bloom":
+            return SequentialStream(core_distinct.bloom_distinct(self.__iterable, key, capacity, error_rate))
+        return SequentialStream(core_distinct.exact_distinct(self.__iterable, key, max_keys_in_memory))
+
+    def window(
+        self, size: int, combiner: Optional[Callable[[_AT, _AT], _AT]] = None
+    ) -> "SequentialStream[Any]":
+        """
+        Returns a stream of consecutive non-overlapping windows of size elements, the last window may be shorter.
+        This is an intermediate operation.
+
+        :param size: Number of elements of a window
+        :param combiner: Associative function aggregating the elements of a window. Windows are lists when None.
+        :return: Stream of windows or of their aggregates
+        """
+        return SequentialStream(core_windows.tumbling_count_windows(self.__iterable, size, combiner))
+
+    def sliding(
+        self, size: int, step: int = 1, combiner: Optional[Callable[[_AT, _AT], _AT]] = None
+    ) -> "SequentialStream[Any]":
+        """
+        Returns a stream of windows of size elements, each starting step elements after the previous one.
+        Only full windows are emitted. Elements are kept in a bounded deque, aggregates are maintained incrementally
+        in amortized O(1) per element regardless of the window size, without recomputing the window.
+        This is an intermediate operation.
+
+        :param size: Number of elements of a window
+        :param step: Number of elements between the starts of consecutive windows
+        :param combiner: Associative function aggregating the elements of a window, it does not need to be invertible.
+            Windows are lists when None.
+        :return: Stream of windows or of their aggregates
+        """
+        return SequentialStream(core_windows.sliding_count_windows(self.__iterable, size, step, combiner))
+
+    def tumbling_window(
+        self,
+        duration: float,
+        time_fn: Callable[[_AT], float],
+        allowed_lateness: float = 0.0,
+        combiner: Optional[Callable[[_AT, _AT], _AT]] = None,
+        on_late: Optional[Callable[[_AT], Any]] = None,
+    ) -> "SequentialStream[core_windows.Window]":
+        """
+        Returns a stream of event-time windows [k * duration, (k + 1) * duration) of the elements.
+        The watermark trails the greatest event time seen by allowed_lateness, a window is emitted once the watermark
+        passes its end, so out-of-order elements up to allowed_lateness late are assigned to their windows.
+        Elements of windows already emitted are late and passed to on_late, or dropped.
+        Open windows are emitted in order of their start when the stream ends.
+        This is an intermediate operation.
+
+        :param duration: Length of a window in units of the event time
+        :param time_fn: Function extracting the event time of an element
+        :param allowed_lateness: How far behind the greatest event time seen elements are still accepted
+        :param combiner: Function aggregating the elements of a window incrementally, must be associative
+            and, for out-of-order elements, commutative. Window values are lists when None.
+        :param on_late: Function receiving late elements
+        :return: Stream of windows
+        """
+        return SequentialStream(core_windows.tumbling_time_windows(
+            self.__iterable, duration, time_fn, allowed_lateness, combiner, on_late
+        ))
+
+    def session_window(
+        self,
+        gap: float,
+        time_fn: Callable[[_AT], float],
+        allowed_lateness: float = 0.0,
+        combiner: Optional[Callable[[_AT, _AT], _AT]] = None,
+        on_late: Optional[Callable[[_AT], Any]] = None,
+    ) -> "SequentialStream[core_windows.Window]":
+        """
+        Returns a stream of event-time session windows. Elements less than gap apart belong to one session,
+        a session ends gap after its last element. Sessions bridged by out-of-order elements are merged.
+        Sessions are emitted once the watermark passes their end, see tumbling_window.
+        This is an intermediate operation.
+
+        :param gap: Inactivity which ends a session, in units of the event time
+        :param time_fn: Function extracting the event time of an element
+        :param allowed_lateness: How far behind the greatest event time seen elements are still accepted
+        :param combiner: Function aggregating the elements of a session incrementally, must be associative
+            and, for out-of-order elements, commutative. Window values are lists when None.
+        :param on_late: Function receiving late elements
+        :return: Stream of windows
+        """
+        return SequentialStream(core_windows.session_windows(
+            self.__iterable, gap, time_fn, allowed_lateness, combiner, on_late
+        ))
+
+    def sorted(self, key: Optional[Callable[[_AT], Any]] = None) -> "SequentialStream[_AT]":
+        """
+        Returns a stream consisting of the elements of this stream sorted by key. The sort is stable.
+        This is a stateful intermediate operation, elements are sorted when the first of them is requested.
+
+        :param key: Function extracting a comparison key from each element. The elements are compared when None.
+        :return: The new stream
+        """
+
+        def sorted_generator() -> Generator[_AT, None, None]:
+            yield from sorted(self.__iterable, key=cast(Any, key))
+
+        return SequentialStream(sorted_generator())
+
+    def join(
+        self,
+        other: Iterable[_RT],
+        left_key: Callable[[_AT], Any],
+        right_key: Callable[[_RT], Any],
+        how: "core_join.JoinHow" = "inner",
+        max_build_size: Optional[int] = None,
+    ) -> "SequentialStream[Tuple[Optional[_AT], Optional[_RT]]]":
+        """
+        Returns a stream of pairs of elements of this stream and the other iterable with equal keys.
+        Hash join built on the smaller side, the order of pairs is not preserved.
+        Missing side of a pair is None for elements kept unmatched by left, right and outer joins.
+        This is an intermediate operation.
+
+        :param other: Right side of the join
+        :param left_key: Function extracting the join key from elements of this stream
+        :param right_key: Function extracting the join key from elements of other
+        :param how: One of "inner", "left", "right", "outer"
+        :param max_build_size: When both sides have more elements, they are spilled to temporary files by key hash
+        :return: The new stream
+        """
+        pairs = core_join.hash_join(self.__iterable, other, left_key, right_key, how, max_build_size)
+        return SequentialStream(pairs)
+
+    def merge_join(
+        self,
+        other: Iterable[_RT],
+        left_key: Callable[[_AT], Any],
+        right_key: Callable[[_RT], Any],
+        how: "core_join.JoinHow" = "inner",
+    ) -> "SequentialStream[Tuple[Optional[_AT], Optional[_RT]]]":
+        """
+        Returns a stream of pairs of elements of this stream and the other iterable with equal keys.
+        Both inputs must be sorted ascending by their keys, only elements of other sharing one key are held in memory.
+        Missing side of a pair is None for elements kept unmatched by left, right and outer joins.
+        This is an intermediate operation.
+
+        :param other: Right side of the join, sorted by right_key
+        :param left_key: Function extracting the join key from elements of this stream
+        :param right_key: Function extracting the join key from elements of other
+        :param how: One of "inner", "left", "right", "outer"
+        :return: The new stream
+        """
+        pairs = core_join.merge_join(self.__iterable, other, left_key, right_key, how)
+        return SequentialStream(pairs)
+
     def find_first(self) -> nullable.Nullable[_AT]:
         """
         Returns an Nullable describing the first element of this stream, or an empty Nullable if the stream is empty.
@@ -212,15 +545,18 @@ class SequentialStream(Generic[_AT], Iterable[_AT]):
         return collector.collect(self)
 
     def parallel(
-        self, n_processes: int = len(os.sched_getaffinity(0)), chunk_size: int = 1
+        self, n_processes: Optional[int] = None, chunk_size: int = 1
     ) -> "parallel_stream.ParallelStream[_AT]":
         """
         Creates parallel (multiprocessing) stream from current stream. All following operations will be performed in parallel.
 
-        :param n_processes: Number of processes to use.
+        :param n_processes: Number of processes to use. Defaults to the PYSTREAM_N_PROCESSES environment variable,
+            or the CPUs available to the process, see core.resources.default_n_processes
         :param chunk_size: The size of chunk.
         :return: New parallel stream
         """
+        import pystream.parallel_stream as parallel_stream
+
         return parallel_stream.ParallelStream(
             self.__iterable, n_processes=n_processes, chunk_size=chunk_size
         )
@@ -251,16 +587,25 @@ class NumericLikeStream(SequentialStream[_NAT]):
         """
         :return: The sum of elements in this stream
         """
-        return cast(_NAT, sum(self.__iterable))
+        return cast(_NAT, sum(self.iterator()))
 
     def min(self) -> nullable.Nullable[_NAT]:
         """
         :return: Returns a Nullable describing the minimum element of this stream, or an empty Nullable if this stream is empty.
         """
-        return nullable.Nullable(min(self.__iterable, default=None))
+        return nullable.Nullable(min(self.iterator(), default=None))
 
     def max(self) -> nullable.Nullable[_NAT]:
         """
         :return: Returns a Nullable describing the maximum element of this stream, or an empty Nullable if this stream is empty.
         """
-        return nullable.Nullable(max(self.__iterable, default=None))
\ No newline at end of file
+        return nullable.Nullable(max(self.iterator(), default=None))
+
+    def summary_statistics(self) -> "collectors.SummaryStatistics":
+        """
+        Computes count, sum, mean, variance, min and max of elements in one pass.
+        This is terminal operation.
+
+        :return: Summary statistics of elements in this stream
+        """
+        return self.collect(collectors.summary_statistics())
@@ -0,0 +1,139 @@
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import tempfile
+from typing import Any, BinaryIO, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from typing_extensions import Literal
+
+Compression = Literal["gzip", "bz2", "xz"]
+
+_EXTENSIONS: Dict[str, str] = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}
+# Rows encoded and written at once, so that large shards are not held in memory as one string
+_BLOCK_ROWS = 4096
+_BUFFER_SIZE = 1 << 20
+
+
+class Shard(NamedTuple):
+    """
+    Manifest of a file written by a sink.
+    """
+
+    path: str
+    rows: int
+    bytes: int
+
+
+def check_pattern(pattern: str, sharded: bool, compression: Optional[Compression]) -> None:
+    """
+    :raises ValueError: The pattern lacks the {part} field, or the {shard} field of a sharded sink,
+        has other fields, or the compression is unknown
+    """
+    if compression is not None and compression not in _EXTENSIONS:
+        raise ValueError(f"Unknown compression: {compression!r}")
+    if "{part}" not in pattern:
+        raise ValueError(f"Pattern must contain {{part}} so that partitions write distinct files, got {pattern!r}")
+    if sharded != ("{shard}" in pattern):
+        raise ValueError(f"Pattern must contain {{shard}} exactly when shard_by is given, got {pattern!r}")
+    try:
+        pattern.format(part="0", shard="0")
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"Pattern may only contain the fields {{part}} and {{shard}}, got {pattern!r}") from e
+
+
+def jsonl_block(rows: Sequence[Any]) -> str:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def csv_block(rows: Sequence[Any], /, header: Optional[Sequence[str]], dialect: str) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, dialect=dialect)
+    if header is None:
+        writer.writerows(rows)
+    else:
+        writer.writerows([row.get(name) for name in header] if isinstance(row, Mapping) else row for row in rows)
+    return buffer.getvalue()
+
+
+def lines_block(rows: Sequence[Any], /, formatter: Callable[[Any], str]) -> str:
+    return "".join(formatter(row) + "\n" for row in rows)
+
+
+def _open(path: str, compression: Optional[Compression]) -> Union[io.BufferedIOBase, BinaryIO]:
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "bz2":
+        return bz2.open(path, "wb")
+    if compression == "xz":
+        return lzma.open(path, "wb")
+    return open(path, "wb", buffering=_BUFFER_SIZE)
+
+
+def write_shard(
+        path: str,
+        rows: List[Any],
+        encode: Callable[[Sequence[Any]], str],
+        header: str = "",
+        compression: Optional[Compression] = None,
+        encoding: str = "utf-8"
+) -> Shard:
+    """
+    Writes the encoded rows to a temporary file next to path in large blocks, then renames it to path,
+    so that a shard written again by a retried task replaces the previous one and readers never see partial files.
+    """
+    directory = os.path.dirname(path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    file, temporary_path = tempfile.mkstemp(dir=directory or None, prefix=".tmp-")
+    os.close(file)
+    try:
+        with _open(temporary_path, compression) as writer:
+            if header != "":
+                writer.write(header.encode(encoding))
+            for start in range(0, len(rows), _BLOCK_ROWS):
+                writer.write(encode(rows[start:start + _BLOCK_ROWS]).encode(encoding))
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+    return Shard(path, len(rows), os.path.getsize(path))
+
+
+def write_partition(
+        indexed_partition: Tuple[int, List[Any]],
+        /,
+        partition_operation: Callable[[List[Any]], List[Any]],
+        pattern: str,
+        encode: Callable[[Sequence[Any]], str],
+        header: str = "",
+        shard_by: Optional[Callable[[Any], Any]] = None,
+        compression: Optional[Compression] = None,
+        encoding: str = "utf-8"
+) -> List[Shard]:
+    """
+    Applies the pipeline to a partition and writes its results to one file per shard key.
+    Files are named by pattern, formatted with the index of the partition as {part} and the shard key as {shard}.
+
+    :return: Manifests of the written files
+    """
+    index, partition = indexed_partition
+    groups: Dict[Any, List[Any]] = {}
+    for row in partition_operation(partition):
+        groups.setdefault(None if shard_by is None else shard_by(row), []).append(row)
+    extension = "" if compression is None else _EXTENSIONS[compression]
+    return [
+        write_shard(
+            pattern.format(part=f"{index:05d}", shard=shard) + extension, rows, encode, header, compression, encoding
+        )
+        for shard, rows in groups.items()
+    ]
+
+
+def csv_header(header: Optional[Sequence[str]], dialect: str) -> str:
+    return "" if header is None else csv_block([header], header=None, dialect=dialect)
+
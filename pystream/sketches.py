@@ -0,0 +1,329 @@
+import heapq
+import math
+import operator
+import random
+from operator import itemgetter
+from typing import Any, Dict, Generic, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+from pystream.core.utils import stable_hash
+
+_T = TypeVar("_T")
+_H = TypeVar("_H", bound=Hashable)
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(z: int) -> int:
+    z = (z + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+def hash64(x: object) -> int:
+    """
+    Well mixed 64-bit hash which agrees for equal elements in all processes (splitmix64 finalizer over stable_hash).
+    """
+    return _mix64(stable_hash(x))
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct count sketch. Uses 2 ** precision one-byte registers,
+    the relative standard error of the estimate is 1.04 / sqrt(2 ** precision).
+
+    :param precision: Number of index bits, between 4 and 18
+    """
+
+    precision: int
+    _registers: bytearray
+
+    def __init__(self, precision: int = 14):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"Precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    @staticmethod
+    def precision_for(relative_error: float) -> int:
+        """
+        :return: The smallest precision with relative standard error not above relative_error
+        """
+        return min(max(math.ceil(math.log2((1.04 / relative_error) ** 2)), 4), 18)
+
+    def add(self, x: object) -> "HyperLogLog":
+        h = hash64(x)
+        index = h >> (64 - self.precision)
+        w = (h << self.precision) & _MASK64
+        rank = 64 - w.bit_length() + 1 if w != 0 else 64 - self.precision + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+    def estimate(self) -> int:
+        m = len(self._registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        raw = alpha * m * m / math.fsum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if raw <= 2.5 * m and zeros > 0:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+class BloomFilter:
+    """
+    Bloom filter membership sketch of fixed size. Never misses an added element, the rate of false positives
+    stays below error_rate while at most capacity distinct elements are added.
+    Uses about 1.44 * log2(1 / error_rate) bits per element of capacity, e.g. 1.2 MB for a million elements at 1%.
+
+    :param capacity: Number of distinct elements the filter is sized for
+    :param error_rate: False positive rate at capacity
+    """
+
+    capacity: int
+    error_rate: float
+    _n_bits: int
+    _n_hashes: int
+    _bits: bytearray
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be positive, got {capacity}")
+        if not 0 < error_rate < 1:
+            raise ValueError(f"Error rate must be between 0 and 1, got {error_rate}")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._n_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._n_hashes = max(1, round(self._n_bits / capacity * math.log(2)))
+        self._bits = bytearray((self._n_bits + 7) // 8)
+
+    def _positions(self, x: object) -> List[int]:
+        # Double hashing (Kirsch and Mitzenmacher), the second hash is odd so that it cycles through all bits
+        h1 = hash64(x)
+        h2 = _mix64(h1) | 1
+        return [(h1 + i * h2) % self._n_bits for i in range(self._n_hashes)]
+
+    def add(self, x: object) -> bool:
+        """
+        :return: Whether x was not contained before, i.e. at least one of its bits was not set yet
+        """
+        added = False
+        for position in self._positions(x):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self._bits[byte] & bit:
+                self._bits[byte] |= bit
+                added = True
+        return added
+
+    def __contains__(self, x: object) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(x))
+
+    def merge(self, other: "BloomFilter") -> "BloomFilter":
+        if (other._n_bits, other._n_hashes) != (self._n_bits, self._n_hashes):
+            raise ValueError("Cannot merge Bloom filters of different sizes")
+        self._bits = bytearray(map(operator.or_, self._bits, other._bits))
+        return self
+
+    @property
+    def size(self) -> int:
+        """Size of the bit array in bytes."""
+        return len(self._bits)
+
+
+class KLLSketch(Generic[_T]):
+    """
+    KLL quantile sketch over comparable elements. Keeps O(k) elements in a hierarchy of compactors,
+    the rank error of a quantile query is roughly 1.7 / k.
+
+    :param k: Capacity of the top compactor
+    :param seed: Seed of the random compaction offsets
+    """
+
+    k: int
+    _compactors: List[List[_T]]
+    _random: random.Random
+    _count: int
+    _size: int
+    _capacities: List[int]
+    _max_size: int
+
+    _C = 2 / 3
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError(f"k must be at least 8, got {k}")
+        self.k = k
+        self._compactors = []
+        self._random = random.Random(seed)
+        self._count = 0
+        self._size = 0
+        self._grow()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._compactors) - level - 1
+        return max(2, math.ceil(self.k * self._C ** depth))
+
+    def _grow(self) -> None:
+        self._compactors.append([])
+        self._capacities = [self._capacity(level) for level in range(len(self._compactors))]
+        self._max_size = sum(self._capacities)
+
+    def _compress(self) -> None:
+        while self._size >= self._max_size:
+            for level, compactor in enumerate(self._compactors):
+                if len(compactor) >= self._capacities[level]:
+                    if level + 1 == len(self._compactors):
+                        self._grow()
+                    compactor.sort()
+                    kept = [compactor.pop()] if len(compactor) % 2 == 1 else []
+                    promoted = compactor[self._random.randint(0, 1)::2]
+                    self._compactors[level + 1].extend(promoted)
+                    self._size -= len(compactor) - len(promoted)
+                    self._compactors[level] = kept
+                    break
+
+    def add(self, x: _T) -> "KLLSketch[_T]":
+        self._compactors[0].append(x)
+        self._count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch[_T]") -> "KLLSketch[_T]":
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for compactor, other_compactor in zip(self._compactors, other._compactors):
+            compactor.extend(other_compactor)
+        self._count += other._count
+        self._size += other._size
+        self._compress()
+        return self
+
+    def quantiles(self, fractions: Sequence[float]) -> List[Optional[_T]]:
+        """
+        :param fractions: Quantile fractions between 0 and 1
+        :return: Approximate quantiles, None for each fraction if the sketch is empty
+        """
+        weighted = sorted(
+            ((x, 1 << level) for level, compactor in enumerate(self._compactors) for x in compactor),
+            key=itemgetter(0),
+        )
+        total = sum(weight for _, weight in weighted)
+        result: List[Optional[_T]] = []
+        for fraction in fractions:
+            if not 0 <= fraction <= 1:
+                raise ValueError(f"Quantile fraction must be between 0 and 1, got {fraction}")
+            if total == 0:
+                result.append(None)
+                continue
+            target, cumulative = fraction * total, 0
+            for x, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    result.append(x)
+                    break
+        return result
+
+
+class SpaceSaving(Generic[_H]):
+    """
+    Space-Saving heavy hitters sketch. Tracks at most capacity elements, the count of every
+    element is overestimated by at most n / capacity for a stream of n elements.
+
+    :param capacity: Number of tracked counters
+    """
+
+    capacity: int
+    _counts: Dict[_H, int]
+    _errors: Dict[_H, int]
+    _heap: List[Tuple[int, int, _H]]
+    _sequence: int
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._counts = {}
+        self._errors = {}
+        self._heap = []
+        self._sequence = 0
+
+    def _push(self, x: _H) -> None:
+        self._sequence += 1
+        heapq.heappush(self._heap, (self._counts[x], self._sequence, x))
+
+    def _pop_min(self) -> _H:
+        # Heap entries go stale when counts grow, re-push them with the current count
+        while True:
+            count, _, x = heapq.heappop(self._heap)
+            if self._counts.get(x) == count:
+                return x
+            if x in self._counts:
+                self._push(x)
+
+    def _rebuild_heap(self) -> None:
+        self._heap = []
+        for x in self._counts:
+            self._push(x)
+
+    def add(self, x: _H) -> "SpaceSaving[_H]":
+        if x in self._counts:
+            self._counts[x] += 1
+            return self
+        if len(self._counts) < self.capacity:
+            self._counts[x], self._errors[x] = 1, 0
+        else:
+            evicted = self._pop_min()
+            floor = self._counts.pop(evicted)
+            del self._errors[evicted]
+            self._counts[x], self._errors[x] = floor + 1, floor
+        self._push(x)
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+        return self
+
+    def _floor(self) -> int:
+        return min(self._counts.values()) if len(self._counts) >= self.capacity else 0
+
+    def merge(self, other: "SpaceSaving[_H]") -> "SpaceSaving[_H]":
+        floor, other_floor = self._floor(), other._floor()
+        counts: Dict[_H, int] = {}
+        errors: Dict[_H, int] = {}
+        for x in self._counts.keys() | other._counts.keys():
+            if x in self._counts and x in other._counts:
+                counts[x] = self._counts[x] + other._counts[x]
+                errors[x] = self._errors[x] + other._errors[x]
+            elif x in self._counts:
+                counts[x] = self._counts[x] + other_floor
+                errors[x] = self._errors[x] + other_floor
+            else:
+                counts[x] = other._counts[x] + floor
+                errors[x] = other._errors[x] + floor
+        kept = heapq.nlargest(self.capacity, counts, key=counts.__getitem__)
+        self._counts = {x: counts[x] for x in kept}
+        self._errors = {x: errors[x] for x in kept}
+        self._rebuild_heap()
+        return self
+
+    def top(self, k: int) -> List[Tuple[_H, int]]:
+        """
+        :param k: Number of elements
+        :return: Up to k most frequent elements with their estimated counts, most frequent first
+        """
+        return heapq.nlargest(k, self._counts.items(), key=lambda item: item[1])
+
+    def error(self, x: _H) -> int:
+        """
+        :return: Upper bound of the overestimation of the count of x, or 0 for untracked elements
+        """
+        return self._errors.get(x, 0)
@@ -0,0 +1,327 @@
+import math
+import os
+import queue
+import selectors
+import signal
+import socket
+import threading
+from collections import deque
+from time import monotonic, sleep
+from typing import Any, Deque, Dict, Generator, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union, cast
+
+_T = TypeVar("_T")
+
+_NO_SENTINEL: Any = object()
+
+# Seconds between checks whether a blocked source was stopped
+_POLL_INTERVAL = 0.1
+_READ_SIZE = 1 << 16
+
+
+def from_queue(
+        source: Any,
+        stop: Optional[threading.Event] = None,
+        sentinel: Any = _NO_SENTINEL,
+        poll_interval: float = _POLL_INTERVAL
+) -> Generator[Any, None, None]:
+    """
+    Unbounded source reading a queue.Queue or multiprocessing.Queue.
+    Ends when sentinel is received, or when stop is set, after the elements already in the queue are drained.
+
+    :param source: Queue with a get(timeout=...) method raising queue.Empty
+    :param stop: Event ending the source
+    :param sentinel: Element ending the source, never yielded
+    :param poll_interval: Seconds between checks of stop while the queue is empty
+    """
+    while True:
+        stopping = stop is not None and stop.is_set()
+        try:
+            element = source.get(timeout=0 if stopping else poll_interval)
+        except queue.Empty:
+            if stopping:
+                return
+            continue
+        if element is sentinel:
+            return
+        yield element
+
+
+def tail(
+        path: Union[str, "os.PathLike[str]"],
+        stop: Optional[threading.Event] = None,
+        from_start: bool = True,
+        poll_interval: float = _POLL_INTERVAL,
+        encoding: str = "utf-8"
+) -> Generator[str, None, None]:
+    """
+    Unbounded source of lines appended to a text file, like tail -F. Only complete lines are yielded,
+    without the line terminator. Waits for the file to be created, and starts over when it is truncated or replaced.
+    Ends when stop is set, after the lines already written are read.
+
+    :param path: Path of the file
+    :param stop: Event ending the source
+    :param from_start: Whether lines present when the source starts are yielded
+    :param poll_interval: Seconds between checks for new lines
+    :param encoding: Encoding of the file
+    """
+    file = None
+    inode = None
+    partial_line = b""
+    skip_existing = not from_start
+    try:
+        while True:
+            stopping = stop is not None and stop.is_set()
+            if file is None:
+                try:
+                    file = open(path, "rb")
+                except FileNotFoundError:
+                    if stopping:
+                        return
+                    sleep(poll_interval)
+                    continue
+                inode = os.fstat(file.fileno()).st_ino
+                if skip_existing:
+                    file.seek(0, os.SEEK_END)
+                    skip_existing = False
+            chunk = file.read(_READ_SIZE)
+            if len(chunk) > 0:
+                lines = (partial_line + chunk).split(b"\n")
+                partial_line = lines.pop()
+                for line in lines:
+                    yield line.rstrip(b"\r").decode(encoding)
+                continue
+            if stopping:
+                return
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                status = None
+            if status is None or status.st_ino != inode or status.st_size < file.tell():
+                # Rotated or truncated, the rest of the old file was read above
+                file.close()
+                file, partial_line = None, b""
+                continue
+            sleep(poll_interval)
+    finally:
+        if file is not None:
+            file.close()
+
+
+def from_socket(
+        address: Union[str, Tuple[str, int]],
+        stop: Optional[threading.Event] = None,
+        poll_interval: float = _POLL_INTERVAL,
+        ready: Optional[threading.Event] = None
+) -> Generator[bytes, None, None]:
+    """
+    Unbounded source of newline-terminated records sent by clients of a listening socket.
+    Listens on a Unix socket when address is a path, on a TCP socket when it is a (host, port) pair.
+    Any number of clients may connect, records are yielded without the newline in the order they arrive.
+    Ends when stop is set, after the records already received are yielded.
+
+    :param address: Path of the Unix socket to create, or TCP host and port
+    :param stop: Event ending the source
+    :param poll_interval: Seconds between checks of stop while no data arrives
+    :param ready: Event set once the socket is listening
+    """
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    server = socket.socket(family, socket.SOCK_STREAM)
+    selector = selectors.DefaultSelector()
+    buffers: Dict[socket.socket, bytes] = {}
+    try:
+        if family == socket.AF_INET:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(address)
+        server.listen()
+        server.setblocking(False)
+        selector.register(server, selectors.EVENT_READ)
+        if ready is not None:
+            ready.set()
+        while True:
+            stopping = stop is not None and stop.is_set()
+            events = selector.select(timeout=0 if stopping else poll_interval)
+            if stopping and len(events) == 0:
+                return
+            for key, _ in events:
+                connection = key.fileobj
+                if connection is server:
+                    client, _ = server.accept()
+                    client.setblocking(False)
+                    selector.register(client, selectors.EVENT_READ)
+                    buffers[client] = b""
+                    continue
+                client = cast(socket.socket, connection)
+                data: Optional[bytes]
+                try:
+                    data = client.recv(_READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    # Reset by the client, its unterminated last record is incomplete and dropped
+                    data = None
+                if data is not None:
+                    records = (buffers[client] + data).split(b"\n")
+                    buffers[client] = records.pop()
+                    yield from records
+                    if len(data) > 0:
+                        continue
+                    # Closed by the client, an unterminated last record is complete too
+                    if len(buffers[client]) > 0:
+                        yield buffers[client]
+                selector.unregister(client)
+                client.close()
+                del buffers[client]
+    finally:
+        for connection in buffers:
+            connection.close()
+        selector.close()
+        server.close()
+        if family == socket.AF_UNIX and isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+
+
+def stop_on_signals(
+        stop: threading.Event,
+        signals: Sequence[signal.Signals] = (signal.SIGINT, signal.SIGTERM)
+) -> None:
+    """
+    Sets stop when the process receives one of the signals, so that sources end and the pipeline drains gracefully.
+    Must be called from the main thread.
+
+    :param stop: Event passed to the sources of the pipeline
+    :param signals: Signals to handle
+    """
+
+    def handler(signum: int, frame: Any) -> None:
+        stop.set()
+
+    for signum in signals:
+        signal.signal(signum, handler)
+
+
+class StreamMetrics:
+    """
+    Throughput and latency of a streaming pipeline. Latency of an element is the time from its arrival
+    from the source until its micro-batch was emitted. Percentiles are computed over the latest window elements.
+    Safe to read from other threads while the pipeline runs.
+
+    :param window: Number of latest element latencies kept for percentiles
+    """
+
+    __lock: threading.Lock
+    __started: Optional[float]
+    __last: Optional[float]
+    __elements: int
+    __results: int
+    __batches: int
+    __latency_sum: float
+    __latency_max: float
+    __latencies: Deque[float]
+
+    def __init__(self, window: int = 10000):
+        self.__lock = threading.Lock()
+        self.__started = None
+        self.__last = None
+        self.__elements = 0
+        self.__results = 0
+        self.__batches = 0
+        self.__latency_sum = 0.0
+        self.__latency_max = 0.0
+        self.__latencies = deque(maxlen=window)
+
+    def record(self, arrivals: Sequence[float], n_results: int, emitted: Optional[float] = None) -> None:
+        """
+        Records an emitted micro-batch.
+
+        :param arrivals: Arrival times of the elements of the batch, from time.monotonic
+        :param n_results: Number of results the batch produced
+        :param emitted: Time of emission, from time.monotonic, defaults to now
+        """
+        emitted = monotonic() if emitted is None else emitted
+        latencies = [emitted - arrival for arrival in arrivals]
+        with self.__lock:
+            if self.__started is None and len(arrivals) > 0:
+                self.__started = min(arrivals)
+            self.__last = emitted
+            self.__elements += len(arrivals)
+            self.__results += n_results
+            self.__batches += 1
+            self.__latency_sum += math.fsum(latencies)
+            self.__latency_max = max([self.__latency_max] + latencies)
+            self.__latencies.extend(latencies)
+
+    @property
+    def elements(self) -> int:
+        """Number of source elements processed."""
+        return self.__elements
+
+    @property
+    def results(self) -> int:
+        """Number of results emitted."""
+        return self.__results
+
+    @property
+    def batches(self) -> int:
+        """Number of micro-batches emitted."""
+        return self.__batches
+
+    @property
+    def throughput(self) -> float:
+        """Source elements processed per second, from the first arrival until the latest emission."""
+        with self.__lock:
+            if self.__started is None or self.__last is None or self.__last <= self.__started:
+                return 0.0
+            return self.__elements / (self.__last - self.__started)
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean latency of all processed elements in seconds."""
+        with self.__lock:
+            return self.__latency_sum / self.__elements if self.__elements > 0 else 0.0
+
+    @property
+    def max_latency(self) -> float:
+        """Maximal latency of all processed elements in seconds."""
+        return self.__latency_max
+
+    def latency_percentile(self, fraction: float) -> float:
+        """
+        :param fraction: Percentile between 0 and 1, e.g. 0.99
+        :return: Latency percentile of the latest window elements in seconds
+        """
+        if not 0 <= fraction <= 1:
+            raise ValueError(f"Percentile must be between 0 and 1, got {fraction}")
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+        if len(latencies) == 0:
+            return 0.0
+        return latencies[min(len(latencies) - 1, max(0, math.ceil(fraction * len(latencies)) - 1))]
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        :return: Current values of all metrics, e.g. for logging
+        """
+        return {
+            "elements": self.elements,
+            "results": self.results,
+            "batches": self.batches,
+            "throughput": self.throughput,
+            "mean_latency": self.mean_latency,
+            "p50_latency": self.latency_percentile(0.5),
+            "p99_latency": self.latency_percentile(0.99),
+            "max_latency": self.max_latency,
+        }
+
+    def __repr__(self) -> str:
+        return "StreamMetrics({})".format(", ".join(f"{name}={value}" for name, value in self.snapshot().items()))
+
+
+def stamped(iterable: Iterable[_T]) -> Generator[Tuple[float, _T], None, None]:
+    """Pairs every element with the time.monotonic time of its arrival."""
+    for element in iterable:
+        yield monotonic(), element
+
+
+def split_stamps(batch: List[Tuple[float, _T]]) -> Tuple[List[float], List[_T]]:
+    arrivals = [arrival for arrival, _ in batch]
+    return arrivals, [element for _, element in batch]
@@ -1,4 +1,6 @@
 import math
+import subprocess
+import sys
 from statistics import stdev
 from time import time
 
@@ -11,7 +13,24 @@ def _filter(x) -> bool:
     return x % 3 == 0
 
 
+def _import_time(statement: str, repeats: int = 20) -> float:
+    """
+    Average wall time of starting a fresh interpreter which executes statement, minus an empty interpreter.
+    """
+    def run(code: str) -> float:
+        t_s = time()
+        for _ in range(repeats):
+            subprocess.run([sys.executable, "-c", code], check=True)
+        return (time() - t_s) / repeats
+
+    return run(statement) - run("pass")
+
+
 if __name__ == '__main__':
+    print("Import:")
+    for statement in ("import pystream", "from pystream import SequentialStream", "from pystream import ParallelStream"):
+        print(f"{statement}: {_import_time(statement) * 1000:.1f} ms")
+
     collection = tuple(range(10_000, 10_100))
     times = []
 
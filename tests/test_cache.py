@@ -0,0 +1,174 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import unittest
+from functools import partial
+from operator import itemgetter
+
+from pystream.cache import DiskCache
+from pystream.collectors import to_collection
+from pystream.parallel_stream import ParallelStream
+from pystream.sequential_stream import SequentialStream
+
+
+def squared(x):
+    return x ** 2
+
+
+def cubed(x):
+    return x ** 3
+
+
+def make_adder(n):
+    def add(x):
+        return x + n
+
+    return add
+
+
+def scaled(x, factor=2):
+    return x * factor
+
+
+def locked_scaled(x, lock):
+    with lock:
+        return 2 * x
+
+
+class Multiplier:
+    def __init__(self, factor):
+        self.factor = factor
+
+    def __call__(self, x):
+        return self.factor * x
+
+
+class DiskCacheTest(unittest.TestCase):
+    COLLECTION = [1, 2, 3, 2, 1]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(os.path.join(self.directory.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_whenMappingWithCache_thenRepeatedElementsAreHits(self):
+        result = SequentialStream(self.COLLECTION).map(squared, cache=self.cache).collect(to_collection(list))
+
+        self.assertEqual([1, 4, 9, 4, 1], result)
+        self.assertEqual(3, self.cache.misses)
+        self.assertEqual(2, self.cache.hits)
+
+    def test_whenRerunning_thenResultsAreReadFromDisk(self):
+        SequentialStream(self.COLLECTION).map(squared, cache=self.cache).for_each(lambda x: None)
+        reopened = DiskCache(os.path.join(self.directory.name, "cache.sqlite"))
+
+        result = SequentialStream(self.COLLECTION).map(squared, cache=reopened).collect(to_collection(list))
+
+        self.assertEqual([1, 4, 9, 4, 1], result)
+        self.assertEqual(3, reopened.misses)
+        self.assertEqual(7, reopened.hits)
+        reopened.close()
+
+    def test_givenDifferentFunctionsOrVersions_whenMemoizing_thenKeysDiffer(self):
+        self.assertNotEqual(self.cache.memoize(squared).key(2), self.cache.memoize(cubed).key(2))
+        self.assertNotEqual(self.cache.memoize(squared).key(2), self.cache.memoize(squared, version="2").key(2))
+        self.assertEqual(self.cache.memoize(squared).key(2), self.cache.memoize(squared).key(2))
+
+    def test_givenFunctionsOfSameShape_whenMemoizing_thenConstantsDefaultsAndClosuresAreKeyed(self):
+        def key(function):
+            return self.cache.memoize(function).key(2)
+
+        self.assertNotEqual(key(lambda x: x + 1), key(lambda x: x + 2))
+        self.assertNotEqual(key(lambda x: [y + 1 for y in x]), key(lambda x: [y + 2 for y in x]))
+        self.assertNotEqual(key(make_adder(1)), key(make_adder(2)))
+        self.assertEqual(key(make_adder(1)), key(make_adder(1)))
+        self.assertNotEqual(key(scaled), key(partial(scaled, factor=3)))
+        scaled.__defaults__ = (3,)
+        try:
+            self.assertNotEqual(key(partial(scaled, factor=2)), key(scaled))
+        finally:
+            scaled.__defaults__ = (2,)
+
+    def test_givenUndigestableClosure_whenMemoizingWithoutVersion_thenThrowTypeError(self):
+        lock = threading.Lock()
+
+        def locked_squared(x):
+            with lock:
+                return x ** 2
+
+        self.assertRaises(TypeError, self.cache.memoize, locked_squared)
+        self.assertEqual(4, self.cache.memoize(locked_squared, version="1")(2))
+
+    def test_givenCallablesWithoutCode_whenMapping_thenKeyOnTheirState(self):
+        def mapped(function, x):
+            return SequentialStream([x]).map(function, cache=self.cache).collect(to_collection(list))
+
+        self.assertEqual([1], mapped(itemgetter(0), (1, 2)))
+        self.assertEqual([2], mapped(itemgetter(1), (1, 2)))
+        self.assertEqual([10], mapped(Multiplier(2), 5))
+        self.assertEqual([15], mapped(Multiplier(3), 5))
+        self.assertRaises(TypeError, self.cache.memoize, Multiplier(threading.Lock()))
+
+    def test_givenUndigestablePartialAndVersion_whenMemoizing_thenKeyOnVersion(self):
+        memoized = self.cache.memoize(partial(locked_scaled, lock=threading.Lock()), version="1")
+
+        self.assertEqual(6, memoized(3))
+        self.assertEqual(6, memoized(3))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_givenPrefetchingWorkers_whenMappingWithCache_thenEachThreadUsesItsOwnConnection(self):
+        collection = list(range(50)) * 2
+
+        result = SequentialStream(collection).map(squared, cache=self.cache).prefetch(4, workers=3) \
+            .collect(to_collection(list))
+
+        self.assertEqual([x ** 2 for x in collection], result)
+        self.assertEqual(50, len(self.cache))
+
+    def test_givenConcurrentWriter_whenLookingUp_thenDoNotWaitForIt(self):
+        path = os.path.join(self.directory.name, "cache.sqlite")
+        cache = DiskCache(path, timeout=0.5)
+        cache.put("key", 42)
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            self.assertEqual((True, 42), cache.get("key"))
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+        self.assertEqual(1, cache.hits)
+        cache.close()
+
+    def test_givenSmallMaxSize_whenStoring_thenLeastRecentlyUsedAreEvicted(self):
+        cache = DiskCache(os.path.join(self.directory.name, "small.sqlite"), max_size=100)
+        for i in range(10):
+            cache.put(str(i), bytes(30))
+
+        self.assertLessEqual(cache.volume, 100)
+        self.assertEqual((False, None), cache.get("0"))
+        self.assertTrue(cache.get("9")[0])
+        cache.close()
+
+    def test_whenPickled_thenCacheReconnects(self):
+        self.cache.put("key", 42)
+
+        restored = pickle.loads(pickle.dumps(self.cache))
+
+        self.assertEqual((True, 42), restored.get("key"))
+        restored.close()
+
+    def test_whenMappingInParallel_thenWorkersShareCache(self):
+        collection = list(range(20)) * 2
+
+        result = ParallelStream(collection, n_processes=4, chunk_size=4) \
+            .map(squared, cache=self.cache) \
+            .collect(to_collection(list))
+
+        self.assertEqual([x ** 2 for x in collection], result)
+        self.assertEqual(len(collection), self.cache.hits + self.cache.misses)
+        self.assertEqual(20, len(self.cache))
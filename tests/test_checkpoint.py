@@ -0,0 +1,81 @@
+import operator
+import os
+import tempfile
+import unittest
+from functools import partial
+
+from pystream.collectors import summary_statistics
+from pystream.parallel_stream import ParallelStream
+
+
+def recorded(x, calls, fail):
+    if os.path.exists(fail) and x == 1500:
+        raise RuntimeError("worker died")
+    open(os.path.join(calls, str(x)), "w").close()
+    return x
+
+
+def parity(x):
+    return x % 2
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, "checkpoint")
+        self.calls = os.path.join(self.directory.name, "calls")
+        self.fail = os.path.join(self.directory.name, "fail")
+        os.mkdir(self.calls)
+        open(self.fail, "w").close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stream(self, **kwargs):
+        return ParallelStream(range(2000), n_processes=2, chunk_size=100) \
+            .checkpoint(self.checkpoint, **kwargs) \
+            .map(partial(recorded, calls=self.calls, fail=self.fail))
+
+    def restart(self):
+        os.unlink(self.fail)
+        for name in os.listdir(self.calls):
+            os.unlink(os.path.join(self.calls, name))
+
+    def test_givenFailedReduction_whenRestarting_thenComputeOnlyRemainingPartitions(self):
+        self.assertRaises(RuntimeError, self.stream().reduce, operator.add)
+        self.restart()
+
+        result = self.stream().reduce(operator.add)
+
+        self.assertEqual(sum(range(2000)), result)
+        # Partitions of 256 elements before the one of the failing element were recorded
+        self.assertEqual(set(map(str, range(1280, 2000))), set(os.listdir(self.calls)))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_givenFailedCollection_whenRestarting_thenMergeRecordedContainers(self):
+        self.assertRaises(RuntimeError, self.stream().collect, summary_statistics())
+        self.restart()
+
+        statistics = self.stream(keep=True).collect(summary_statistics())
+
+        self.assertEqual(2000, statistics.count)
+        self.assertEqual(sum(range(2000)), statistics.sum)
+        self.assertEqual(720, len(os.listdir(self.calls)))
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+    def test_givenFailedAggregation_whenRestarting_thenResume(self):
+        self.assertRaises(RuntimeError, self.stream().reduce_by_key, parity, operator.add)
+        self.restart()
+
+        result = self.stream().reduce_by_key(parity, operator.add)
+
+        self.assertEqual({0: sum(range(0, 2000, 2)), 1: sum(range(1, 2000, 2))}, result)
+        self.assertEqual(720, len(os.listdir(self.calls)))
+
+    def test_givenCheckpointOfDifferentPartitioning_whenResuming_thenRaise(self):
+        self.assertRaises(RuntimeError, self.stream().reduce, operator.add)
+
+        stream = ParallelStream(range(2000), chunk_size=1000).checkpoint(self.checkpoint)
+
+        self.assertRaisesRegex(ValueError, "different job", stream.reduce, operator.add)
@@ -0,0 +1,121 @@
+import multiprocessing
+import operator
+import os
+import socket
+import tempfile
+import unittest
+from functools import partial
+
+from pystream.cluster import ClusterPool, file_splits, read_split, serve
+from pystream.collectors import to_collection
+from pystream.parallel_stream import ParallelStream
+
+
+def squared(x):
+    return x ** 2
+
+
+def exit_once(x, marker):
+    if x == 50 and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return x
+
+
+def fail_on_seven(x):
+    if x == 7:
+        raise ValueError("seven")
+    return x
+
+
+def split_worker(split):
+    return split.hosts, os.getpid()
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class ClusterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workers = []
+        self.addresses = []
+        for locality in ("a", "b", "c"):
+            address = ("127.0.0.1", free_port())
+            ready = multiprocessing.Event()
+            worker = multiprocessing.Process(target=serve, args=(address, locality, ready), daemon=True)
+            worker.start()
+            self.assertTrue(ready.wait(10))
+            self.workers.append(worker)
+            self.addresses.append(address)
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+
+    def test_whenMappingOnCluster_thenReturnResultsInOrderFromAllWorkers(self):
+        stream = ParallelStream(range(1000), chunk_size=10).on_cluster(self.addresses)
+
+        result = stream.map(squared).collect(to_collection(list))
+
+        self.assertEqual([x ** 2 for x in range(1000)], result)
+        self.assertEqual({worker.pid for worker in self.workers}, set(stream.worker_busy_time))
+
+    def test_whenJoiningAndReducingOnCluster_thenAllStagesRunRemotely(self):
+        result = ParallelStream(range(100)).on_cluster(self.addresses) \
+            .join(range(0, 100, 2), squared, squared) \
+            .map(len) \
+            .reduce(operator.add)
+
+        self.assertEqual(100, result)
+
+    def test_givenLostWorker_whenMappingOnCluster_thenRetryItsTaskOnOtherWorkers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            marker = os.path.join(directory, "exited")
+            result = ParallelStream(range(200), chunk_size=10).on_cluster(self.addresses) \
+                .map(partial(exit_once, marker=marker)).collect(to_collection(list))
+
+            self.assertTrue(os.path.exists(marker))
+        self.assertEqual(list(range(200)), result)
+
+    def test_givenFailingTask_whenMappingOnCluster_thenRaiseItsException(self):
+        stream = ParallelStream(range(20)).on_cluster(self.addresses).map(fail_on_seven)
+
+        self.assertRaisesRegex(ValueError, "seven", stream.collect, to_collection(list))
+
+    def test_givenUnreachableWorker_whenCreatingPool_thenUseTheOthers(self):
+        with ClusterPool(self.addresses + [("127.0.0.1", free_port())]) as pool:
+            self.assertEqual({"a", "b", "c"}, set(pool.localities.values()))
+            self.assertEqual([0, 1, 4], pool.map(squared, range(3)))
+        self.assertRaises(ConnectionError, ClusterPool, [("127.0.0.1", free_port())])
+
+    def test_givenFileSplitsWithHosts_whenMappingOnCluster_thenRunSplitsOnTheirHosts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"{name}.txt") for name in ("a", "b", "c")]
+            for path in paths:
+                with open(path, "w") as file:
+                    file.writelines(f"line {x}\n" for x in range(1000))
+            hosts = {path: [os.path.basename(path)[0]] for path in paths}
+            splits = file_splits(paths, split_size=1000, hosts=hosts)
+            stream = ParallelStream(splits).on_cluster(self.addresses, locality_wait=10.0)
+
+            placements = stream.map(split_worker).collect(to_collection(list))
+            lines = ParallelStream(splits).on_cluster(self.addresses).map(read_split).collect(to_collection(list))
+
+        pids = {locality: worker.pid for locality, worker in zip("abc", self.workers)}
+        self.assertTrue(all(pid == pids[split_hosts[0]] for split_hosts, pid in placements))
+        self.assertEqual([f"line {x}" for x in range(1000)] * 3, [line for split in lines for line in split])
+
+    def test_whenReadingSplits_thenEveryLineIsReadOnce(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+            file.write("a\nbb\n\nccc\ndddd\ne")
+        try:
+            for split_size in range(1, 20):
+                lines = [line for split in file_splits([file.name], split_size) for line in read_split(split)]
+                self.assertEqual(["a", "bb", "", "ccc", "dddd", "e"], lines)
+        finally:
+            os.unlink(file.name)
@@ -0,0 +1,69 @@
+import os
+import random
+import tempfile
+import unittest
+
+from pystream.collectors import to_collection
+from pystream.parallel_stream import ParallelStream
+from pystream.sequential_stream import SequentialStream
+
+
+def modulo_ten(x):
+    return x % 10
+
+
+class DistinctTest(unittest.TestCase):
+
+    def test_whenDistinct_thenKeepFirstElementOfEveryKeyInOrder(self):
+        self.assertEqual([3, 1, 2], SequentialStream([3, 1, 3, 2, 1]).distinct().collect(to_collection(list)))
+        self.assertEqual(
+            [11, 2, 3],
+            SequentialStream([11, 2, 21, 3, 12]).distinct(key=modulo_ten).collect(to_collection(list)),
+        )
+
+    def test_givenSmallMemoryBudget_whenDistinct_thenSpillAndDropAllDuplicates(self):
+        collection = [random.randint(0, 5000) for _ in range(30000)]
+
+        result = SequentialStream(collection).distinct(max_keys_in_memory=100).collect(to_collection(list))
+
+        self.assertEqual(len(set(collection)), len(result))
+        self.assertEqual(set(collection), set(result))
+        self.assertEqual(list(dict.fromkeys(collection))[:100], result[:100])
+
+    def test_givenBloomMode_whenDistinct_thenNeverEmitDuplicatesAndMissFew(self):
+        collection = [x % 10000 for x in range(30000)]
+
+        result = SequentialStream(collection).distinct(mode="bloom", capacity=10000, error_rate=0.01) \
+            .collect(to_collection(list))
+
+        self.assertEqual(len(set(result)), len(result))
+        self.assertGreater(len(result), 10000 * 0.97)
+        self.assertEqual(sorted(result), result)
+
+    def test_givenUnknownMode_whenDistinct_thenRaise(self):
+        self.assertRaises(ValueError, SequentialStream([1]).distinct, mode="fuzzy")
+
+    def test_whenDistinctInParallel_thenKeepOneElementOfEveryKey(self):
+        collection = [random.randint(0, 5000) for _ in range(30000)]
+
+        result = ParallelStream(collection, n_processes=4).distinct(max_keys_in_memory=400) \
+            .collect(to_collection(list))
+
+        self.assertEqual(sorted(set(collection)), sorted(result))
+
+    def test_givenSpillDirectory_whenDistinctInParallel_thenExchangeKeyPartitionsThroughIt(self):
+        collection = [random.randint(0, 5000) for _ in range(30000)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            result = ParallelStream(collection, n_processes=3, chunk_size=1000) \
+                .distinct(max_keys_in_memory=400, spill_directory=directory) \
+                .collect(to_collection(list))
+
+            self.assertEqual([], os.listdir(directory))
+        self.assertEqual(sorted(set(collection)), sorted(result))
+
+    def test_givenKeyAndBloomMode_whenDistinctInParallel_thenKeepOneElementOfMostKeys(self):
+        result = ParallelStream(range(20000), n_processes=4).distinct(key=modulo_ten, mode="bloom") \
+            .map(modulo_ten).collect(to_collection(list))
+
+        self.assertEqual(list(range(10)), sorted(result))
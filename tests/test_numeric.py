@@ -0,0 +1,75 @@
+import pickle
+import sys
+import unittest
+from array import array
+
+from pystream.numeric import FloatStream, IntStream, decode_block, encode_block
+from pystream.sequential_stream import SequentialStream
+
+
+def is_even(x):
+    return x % 2 == 0
+
+
+def tripled(x):
+    return 3 * x
+
+
+def halved(x):
+    return x / 2
+
+
+class NumericTest(unittest.TestCase):
+
+    def test_whenMappingAndFilteringBlocks_thenMatchBoxedStream(self):
+        stream = IntStream(range(200000), block_size=1000).filter(is_even).map(tripled)
+
+        result = stream.to_array()
+
+        self.assertEqual("q", result.typecode)
+        self.assertEqual([3 * x for x in range(0, 200000, 2)], result.tolist())
+
+    def test_whenReducing_thenComputeSumMinMaxAndCount(self):
+        self.assertEqual(sum(range(-500, 100000)), IntStream(range(-500, 100000), block_size=777).sum())
+        self.assertEqual(-500, IntStream(range(-500, 100000), block_size=777).min().get())
+        self.assertEqual(99999, IntStream(range(-500, 100000), block_size=777).max().get())
+        self.assertEqual(100500, IntStream(range(-500, 100000), block_size=777).count())
+        self.assertFalse(IntStream([]).max().is_present())
+
+    def test_givenFloats_whenSumming_thenRoundExactly(self):
+        self.assertEqual(1.0, FloatStream([0.1] * 10).sum())
+        self.assertEqual(4.5, IntStream(range(10)).as_float().map(halved).max().get())
+
+    def test_whenLimiting_thenTruncateBlocks(self):
+        self.assertEqual(list(range(25)), list(IntStream(range(100), block_size=10).limit(25)))
+
+    def test_whenConvertingFromSequentialStream_thenStoreValuesCompactly(self):
+        collection = list(range(1_000_000))
+
+        values = SequentialStream(collection).map_to_int().to_array()
+
+        boxed_size = sys.getsizeof(collection) + sum(map(sys.getsizeof, collection))
+        self.assertEqual(collection, values.tolist())
+        self.assertLess(sys.getsizeof(values) * 4, boxed_size)
+
+    def test_whenEncodingBlock_thenDecodeSameValuesFromRawBytes(self):
+        block = array("d", [0.5, -1.25, 1e300])
+
+        data = encode_block(block)
+
+        self.assertEqual(2 + 3 * 8, len(data))
+        self.assertEqual(block, decode_block(data))
+        self.assertLess(len(pickle.dumps(data)), len(pickle.dumps(block.tolist())))
+
+    def test_whenComputingInParallel_thenMatchSequentialResults(self):
+        self.assertEqual(
+            sum(3 * x for x in range(0, 300000, 2)),
+            IntStream(range(300000), block_size=10000).parallel(n_processes=2).filter(is_even).map(tripled).sum(),
+        )
+        self.assertEqual(
+            [x / 2 for x in range(100000)],
+            IntStream(range(100000)).as_float().parallel(n_processes=2).map(halved).to_array().tolist(),
+        )
+        self.assertEqual(99999, IntStream(range(100000)).parallel(n_processes=2).max().get())
+        self.assertEqual(50000, IntStream(range(100000)).parallel(n_processes=2).filter(is_even).count())
+        self.assertFalse(IntStream([]).parallel(n_processes=2).min().is_present())
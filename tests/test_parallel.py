@@ -1,9 +1,19 @@
+import dataclasses
+import datetime
+import enum
+import multiprocessing
+import os
+import statistics
+import tempfile
 import unittest
+from functools import partial
 from itertools import repeat
 from time import sleep, time
 
-from pystream.collectors import to_collection
-from pystream.parallel_stream import ParallelStream
+from pystream.collectors import to_collection, MergeableCollector
+from pystream.parallel_stream import ParallelStream, ParallelNumberLikeStream
+from pystream.core import planner
+from pystream.core.utils import stable_hash
 from pystream.sequential_stream import SequentialStream
 
 
@@ -23,6 +33,90 @@ def sum_reducer(acc, el):
     return acc + el
 
 
+def remainder_of_three(x):
+    return x % 3
+
+
+def word_key(x):
+    return "word-%d" % (x % 4)
+
+
+def count_accumulator(acc, el):
+    return acc + 1
+
+
+def first_item(x):
+    return x[0]
+
+
+def remainder_of_hundred(x):
+    return x % 100
+
+
+def slow_squared(x):
+    sleep(0.005)
+    return x ** 2
+
+
+def squared_batch(batch):
+    return [len(batch)] * len(batch)
+
+
+def incremented_batch(batch):
+    return [x + 1 for x in batch]
+
+
+def open_log(path):
+    log = open(path, "a")
+    log.write("init %d\n" % os.getpid())
+    log.flush()
+    return log
+
+
+def close_log(log):
+    log.write("teardown %d\n" % os.getpid())
+    log.close()
+
+
+def logged_squared(log, x):
+    return x ** 2
+
+
+def new_list():
+    return []
+
+
+def appended(container, x):
+    container.append(x)
+    return container
+
+
+def concatenated(left, right):
+    return left + right
+
+
+class Color(enum.Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+@dataclasses.dataclass(frozen=True)
+class Point:
+    name: str
+    x: int
+
+
+def color_of(x):
+    return Color.RED if x % 2 == 0 else Color.GREEN
+
+
+KEYS = (
+    "word", b"bytes", 42, 1.5, None, ("a", 1), frozenset({"a", "b"}), Color.RED,
+    datetime.date(2020, 1, 2), datetime.datetime(2020, 1, 2, 3, 4, 5), datetime.timedelta(days=1),
+    Point("p", 1),
+)
+
+
 class ParallelStreamTest(unittest.TestCase):
     COLLECTION = tuple(range(20))
 
@@ -81,6 +175,202 @@ class ParallelStreamTest(unittest.TestCase):
         s = self.stream.map(squared).peek(print).collect(to_collection(tuple))
         self.assertTupleEqual(s, tuple(map(squared, self.COLLECTION)))
 
+    def test_whenReducingByKey_thenReturnReductionPerKey(self):
+        result = ParallelStream(range(1000), n_processes=3).map(squared).reduce_by_key(remainder_of_three, sum_reducer)
+
+        expected = {}
+        for x in map(squared, range(1000)):
+            expected[x % 3] = expected.get(x % 3, 0) + x
+        self.assertDictEqual(expected, result)
+
+    def test_givenEnumKeys_whenReducingByKey_thenEveryKeyOccursOnce(self):
+        result = ParallelStream(range(1000), n_processes=3).reduce_by_key(color_of, sum_reducer)
+
+        self.assertDictEqual({Color.RED: sum(range(0, 1000, 2)), Color.GREEN: sum(range(1, 1000, 2))}, result)
+
+    def test_givenSpawnedProcess_whenHashingKeys_thenHashesAgree(self):
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            self.assertEqual([stable_hash(key) for key in KEYS], pool.map(stable_hash, KEYS))
+
+    def test_givenKeyWithoutStableHash_whenReducingByKey_thenThrowTypeError(self):
+        with self.assertRaises(TypeError):
+            ParallelStream(range(10), n_processes=2).reduce_by_key(AClassWithAMethod, sum_reducer)
+
+    def test_whenAggregatingByKey_thenReturnAggregatePerKey(self):
+        result = ParallelStream(range(1000), n_processes=3) \
+            .filter(DIVIDES_BY_TWO) \
+            .aggregate_by_key(word_key, 0, count_accumulator, sum_reducer)
+
+        self.assertDictEqual({"word-0": 250, "word-2": 250}, result)
+
+    def test_whenSorting_thenReturnElementsInOrder(self):
+        collection = [(x * 7919) % 1009 for x in range(3000)]
+
+        result = ParallelStream(collection, n_processes=4).map(squared).sorted().collect(to_collection(list))
+
+        self.assertEqual(sorted(map(squared, collection)), result)
+
+    def test_whenSortingByKey_thenSortIsStable(self):
+        collection = [(x % 5, x) for x in range(2000)]
+
+        result = ParallelStream(collection, n_processes=3).sorted(key=first_item).collect(to_collection(list))
+
+        self.assertEqual(sorted(collection, key=first_item), result)
+
+    def test_givenEmptyStream_whenSorting_thenReturnEmpty(self):
+        self.assertEqual([], ParallelStream([], n_processes=2).sorted().collect(to_collection(list)))
+        self.assertEqual(
+            [], ParallelStream(range(1, 20, 6), n_processes=2).filter(DIVIDES_BY_TWO).sorted().collect(to_collection(list))
+        )
+
+    def test_whenJoining_thenPairElementsWithEqualKeys(self):
+        dimension = [(x, "name-%d" % x) for x in range(0, 100, 3)]
+
+        result = ParallelStream(range(300), n_processes=3) \
+            .join(dimension, remainder_of_hundred, first_item, how="left") \
+            .collect(to_collection(list))
+
+        self.assertEqual(300, len(result))
+        self.assertEqual(
+            sorted((x, (x % 100, "name-%d" % (x % 100)) if x % 100 % 3 == 0 else None) for x in range(300)),
+            sorted(result, key=first_item),
+        )
+
+    def test_whenSummarizing_thenMergeStatisticsOfPartitions(self):
+        collection = [float((x * 37) % 101) for x in range(5000)]
+
+        result = ParallelNumberLikeStream(collection, n_processes=4).summary_statistics()
+
+        self.assertEqual(len(collection), result.count)
+        self.assertAlmostEqual(sum(collection), result.sum)
+        self.assertAlmostEqual(statistics.mean(collection), result.mean)
+        self.assertAlmostEqual(statistics.pvariance(collection), result.variance)
+        self.assertEqual((0.0, 100.0), (result.min, result.max))
+
+    def test_whenCollectingWithMergeableCollector_thenPreserveOrder(self):
+        collector = MergeableCollector(new_list, appended, concatenated, tuple)
+
+        result = ParallelStream(range(1000), n_processes=3).filter(DIVIDES_BY_THREE).collect(collector)
+
+        self.assertEqual(tuple(filter(DIVIDES_BY_THREE, range(1000))), result)
+
+    def test_givenStages_whenCollecting_thenApplyAllStagesInOrder(self):
+        result = ParallelStream(range(200), n_processes=2) \
+            .map(squared) \
+            .stage(n_processes=2) \
+            .filter(DIVIDES_BY_THREE) \
+            .stage(n_processes=3, buffer_size=4) \
+            .map(remainder_of_hundred) \
+            .collect(to_collection(list))
+
+        self.assertEqual([x ** 2 % 100 for x in range(200) if x ** 2 % 3 == 0], result)
+
+    def test_givenStages_whenStoppingEarly_thenPoolsAreReleased(self):
+        iterator = ParallelStream(range(10 ** 6), n_processes=2).map(squared).stage(buffer_size=8).iterator()
+
+        self.assertEqual([0, 1, 4], [next(iterator) for _ in range(3)])
+        iterator.close()
+
+    def test_givenCheapPipeline_whenAutoParallel_thenRunSequentially(self):
+        planner.clear_cache()
+        seen = []
+        stream = ParallelStream(range(1000), n_processes=4).map(squared).peek(seen.append).auto_parallel()
+
+        result = stream.collect(to_collection(list))
+
+        self.assertEqual([x ** 2 for x in range(1000)], result)
+        self.assertEqual(result, seen)
+        self.assertFalse(stream.execution_plan.parallel)
+
+    def test_givenExpensivePipeline_whenAutoParallel_thenRunInParallel(self):
+        planner.clear_cache()
+        stream = ParallelStream(range(200), n_processes=4).map(slow_squared).auto_parallel(sample_size=8)
+
+        result = stream.filter(DIVIDES_BY_THREE).collect(to_collection(list))
+
+        self.assertEqual([x ** 2 for x in range(200) if x ** 2 % 3 == 0], result)
+        self.assertTrue(stream.execution_plan.parallel)
+        self.assertEqual(4, stream.execution_plan.n_processes)
+
+    def test_givenSamePipeline_whenAutoParallel_thenReuseCachedPlan(self):
+        planner.clear_cache()
+        first = ParallelStream(range(100), n_processes=2).map(squared).auto_parallel()
+        first.reduce(sum_reducer)
+        second = ParallelStream(range(100), n_processes=2).map(squared).auto_parallel()
+
+        self.assertEqual(sum(x ** 2 for x in range(100)), second.reduce(sum_reducer))
+        self.assertIs(first.execution_plan, second.execution_plan)
+
+    def test_whenMappingBatches_thenBatchesAreFormedInWorkers(self):
+        result = ParallelStream(range(100), n_processes=2) \
+            .map_batches(squared_batch, 8) \
+            .collect(to_collection(list))
+
+        self.assertEqual([8] * 96 + [4] * 4, result)
+
+    def test_givenOperationsAroundBatches_whenCollecting_thenApplyThemInOrder(self):
+        result = ParallelStream(range(300), n_processes=3) \
+            .filter(DIVIDES_BY_THREE) \
+            .map_batches(incremented_batch, 10) \
+            .map(squared) \
+            .reduce_by_key(remainder_of_three, sum_reducer)
+
+        self.assertEqual({1: sum((x + 1) ** 2 for x in range(0, 300, 3))}, result)
+
+    def test_whenMappingWithContext_thenInitializeOncePerWorkerAndTearDownOnShutdown(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.txt")
+
+            result = ParallelStream(range(100), n_processes=2, chunk_size=5) \
+                .map_with_context(partial(open_log, path), logged_squared, close_log) \
+                .collect(to_collection(list))
+
+            with open(path) as log:
+                events = [line.split() for line in log]
+        self.assertEqual([x ** 2 for x in range(100)], result)
+        initialized = [pid for event, pid in events if event == "init"]
+        torn_down = [pid for event, pid in events if event == "teardown"]
+        self.assertLessEqual(len(initialized), 2)
+        self.assertEqual(len(set(initialized)), len(initialized))
+        self.assertCountEqual(initialized, torn_down)
+
+    def test_givenSchedulePolicies_whenReducing_thenResultsAgree(self):
+        for policy in ("static", "dynamic", "guided"):
+            with self.subTest(policy=policy):
+                result = ParallelStream(range(1000), n_processes=3, chunk_size=10) \
+                    .schedule(policy) \
+                    .map(squared) \
+                    .reduce(sum_reducer)
+
+                self.assertEqual(sum(x ** 2 for x in range(1000)), result)
+
+    def test_givenSchedulePolicies_whenCollecting_thenPreserveOrder(self):
+        for policy in ("static", "dynamic", "guided"):
+            with self.subTest(policy=policy):
+                result = ParallelStream(range(1000), n_processes=3, chunk_size=10) \
+                    .schedule(policy) \
+                    .filter(DIVIDES_BY_TWO) \
+                    .collect(to_collection(list))
+
+                self.assertEqual(list(range(0, 1000, 2)), result)
+
+    def test_givenUnsizedSource_whenSchedulingStatically_thenThrowValueError(self):
+        stream = ParallelStream(iter(range(10)), n_processes=2).schedule("static").map(squared)
+
+        self.assertRaises(ValueError, stream.collect, to_collection(list))
+
+    def test_givenUnknownPolicy_whenScheduling_thenThrowValueError(self):
+        self.assertRaises(ValueError, ParallelStream(range(10)).schedule, "stealing")
+
+    def test_whenMapping_thenReportWorkerBusyTime(self):
+        stream = ParallelStream(range(40), n_processes=2, chunk_size=4).schedule("dynamic").map(slow_squared)
+
+        stream.collect(to_collection(list))
+
+        busy_time = stream.worker_busy_time
+        self.assertLessEqual(len(busy_time), 2)
+        self.assertGreaterEqual(sum(busy_time.values()), 40 * 0.005)
+
     def test_objects_type_is_empty(self):
         tup = tuple(repeat(_Empty, 10))
         self.assertEqual(ParallelStream(tup).collect(to_collection(tuple)), tup)
@@ -0,0 +1,66 @@
+import operator
+import os
+import tempfile
+import time
+import unittest
+
+from pystream.parallel_stream import ParallelStream
+
+
+def square(x):
+    return x * x
+
+
+def is_odd(x):
+    return x % 2 == 1
+
+
+def waiting(x):
+    time.sleep(0.005)
+    return x
+
+
+def calls_of(stats, name):
+    return sum(value[1] for key, value in stats.stats.items() if key[2] == name)
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def test_whenProfiling_thenMergeStatisticsOfAllWorkers(self):
+        stream = ParallelStream(range(1000), n_processes=2, chunk_size=100).profile()
+
+        result = stream.filter(is_odd).map(square).reduce(operator.add)
+
+        self.assertEqual(sum(x * x for x in range(1, 1000, 2)), result)
+        self.assertEqual(1000, calls_of(stream.profile_stats, "is_odd"))
+        self.assertEqual(500, calls_of(stream.profile_stats, "square"))
+
+    def test_givenBarrier_whenProfiling_thenIncludeTasksOfFollowingStage(self):
+        stream = ParallelStream(range(1000), n_processes=2).profile()
+
+        result = list(stream.map(square).sorted(key=operator.neg).iterator())
+
+        self.assertEqual([x * x for x in reversed(range(1000))], result)
+        self.assertEqual(1000, calls_of(stream.profile_stats, "square"))
+        self.assertGreater(calls_of(stream.profile_stats, "_merge_runs"), 0)
+
+    def test_givenCollapsedStacksFile_whenProfiling_thenAttributeSamplesToStages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stacks.txt")
+
+            ParallelStream(range(40), n_processes=2, chunk_size=10) \
+                .profile(path, interval=0.001).map(waiting).filter(is_odd).for_each(square)
+
+            with open(path) as file:
+                lines = file.read().splitlines()
+        samples = {stack: int(count) for stack, count in (line.rsplit(" ", 1) for line in lines)}
+        stage_samples = sum(count for stack, count in samples.items() if "map(waiting);test_profiling.waiting" in stack)
+        self.assertGreater(stage_samples, 0.5 * sum(samples.values()))
+
+    def test_givenNoProfile_whenExecuting_thenHaveNoStatistics(self):
+        stream = ParallelStream(range(10), n_processes=2)
+
+        stream.map(square).for_each(square)
+
+        self.assertIsNone(stream.profile_stats)
+        self.assertRaises(ValueError, stream.profile, interval=0)
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from pystream.core.resources import N_PROCESSES_VARIABLE, available_cpus, cgroup_cpu_limit, default_n_processes
+
+
+class ResourcesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.directory.name, "cgroup")
+        self.proc_cgroup = os.path.join(self.directory.name, "proc-cgroup")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content)
+
+    def test_givenCgroupV2Quota_whenReadingLimit_thenRoundUpLowestQuotaOfAncestors(self):
+        self.write(self.proc_cgroup, "0::/kubepods/pod/container\n")
+        self.write(os.path.join(self.root, "kubepods", "pod", "container", "cpu.max"), "max 100000\n")
+        self.write(os.path.join(self.root, "kubepods", "pod", "cpu.max"), "150000 100000\n")
+        self.write(os.path.join(self.root, "kubepods", "cpu.max"), "4000000 100000\n")
+
+        self.assertEqual(2, cgroup_cpu_limit(self.proc_cgroup, self.root))
+
+    def test_givenCgroupV1HostPath_whenReadingLimit_thenUseQuotaOfMountPoint(self):
+        self.write(self.proc_cgroup, "5:memory:/docker/abc\n4:cpu,cpuacct:/docker/abc\n")
+        self.write(os.path.join(self.root, "cpu,cpuacct", "cpu.cfs_quota_us"), "300000\n")
+        self.write(os.path.join(self.root, "cpu,cpuacct", "cpu.cfs_period_us"), "100000\n")
+
+        self.assertEqual(3, cgroup_cpu_limit(self.proc_cgroup, self.root))
+
+    def test_givenNoQuota_whenReadingLimit_thenReturnNone(self):
+        self.write(self.proc_cgroup, "1:cpu:/\n0::/\n")
+        self.write(os.path.join(self.root, "cpu", "cpu.cfs_quota_us"), "-1\n")
+        self.write(os.path.join(self.root, "cpu", "cpu.cfs_period_us"), "100000\n")
+        self.write(os.path.join(self.root, "cpu.max"), "max 100000\n")
+
+        self.assertIsNone(cgroup_cpu_limit(self.proc_cgroup, self.root))
+        self.assertIsNone(cgroup_cpu_limit(os.path.join(self.directory.name, "missing"), self.root))
+
+    def test_givenEnvironmentVariable_whenResolvingProcesses_thenOverrideCpus(self):
+        with mock.patch.dict(os.environ, {N_PROCESSES_VARIABLE: "3"}):
+            self.assertEqual(3, default_n_processes())
+        with mock.patch.dict(os.environ, {N_PROCESSES_VARIABLE: "0"}):
+            self.assertRaises(ValueError, default_n_processes)
+        with mock.patch.dict(os.environ, {N_PROCESSES_VARIABLE: ""}):
+            self.assertEqual(available_cpus(), default_n_processes())
+
+    def test_whenImportingSequentialStream_thenDoNotImportMultiprocessing(self):
+        code = (
+            "import sys\n"
+            "from pystream import SequentialStream\n"
+            "assert 'multiprocessing' not in sys.modules, 'multiprocessing imported'\n"
+            "assert SequentialStream([1, -2]).parallel(n_processes=2).map(abs).reduce(max) == 2\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True, timeout=60)
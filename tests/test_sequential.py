@@ -1,8 +1,12 @@
 import unittest
 
-from pystream.collectors import to_collection
+import statistics
+import threading
+import time
+
+from pystream.collectors import to_collection, summary_statistics
 from pystream.parallel_stream import ParallelStream
-from pystream.sequential_stream import SequentialStream
+from pystream.sequential_stream import SequentialStream, NumericLikeStream
 
 
 class SequentialStreamTest(unittest.TestCase):
@@ -174,6 +178,202 @@ class SequentialStreamTest(unittest.TestCase):
 
         self.assertFalse(first.is_present())
 
+    def test_whenReducingByKey_thenReturnReductionPerKey(self):
+        result = self.stream.reduce_by_key(lambda x: x % 2, lambda a, b: a + b)
+
+        self.assertDictEqual({1: 5 + 3 + 1 + 51 + 7, 0: 10 + 42}, result)
+
+    def test_whenAggregatingByKey_thenReturnAggregatePerKey(self):
+        result = self.stream.aggregate_by_key(lambda x: x % 2, 0, lambda acc, x: acc + 1)
+
+        self.assertDictEqual({1: 5, 0: 2}, result)
+
+    def test_whenSorting_thenReturnElementsInOrder(self):
+        result = self.stream.sorted(key=lambda x: -x).collect(to_collection(list))
+
+        self.assertEqual(sorted(self.COLLECTION, reverse=True), result)
+
+    def test_whenJoining_thenPairElementsWithEqualKeys(self):
+        users = [(1, "ann"), (2, "bob"), (3, "eve")]
+        events = [(1, "login"), (3, "logout"), (1, "logout"), (4, "login")]
+
+        inner = SequentialStream(events).join(users, lambda e: e[0], lambda u: u[0]).collect(to_collection(sorted))
+        left = SequentialStream(events).join(users, lambda e: e[0], lambda u: u[0], how="left") \
+            .collect(to_collection(list))
+        outer = SequentialStream(events).join(users, lambda e: e[0], lambda u: u[0], how="outer") \
+            .collect(to_collection(list))
+
+        self.assertEqual(
+            [((1, "login"), (1, "ann")), ((1, "logout"), (1, "ann")), ((3, "logout"), (3, "eve"))], inner
+        )
+        self.assertEqual(4, len(left))
+        self.assertIn(((4, "login"), None), left)
+        self.assertEqual(5, len(outer))
+        self.assertIn((None, (2, "bob")), outer)
+
+    def test_givenSmallBuildLimit_whenJoining_thenSpillAndReturnSameResult(self):
+        left = [(x % 50, x) for x in range(500)]
+        right = [(x, str(x)) for x in range(0, 100, 2)]
+
+        expected = sorted(SequentialStream(left).join(right, lambda l: l[0], lambda r: r[0], how="outer"), key=repr)
+        spilled = sorted(
+            SequentialStream(left).join(right, lambda l: l[0], lambda r: r[0], how="outer", max_build_size=10),
+            key=repr,
+        )
+
+        self.assertEqual(expected, spilled)
+        self.assertEqual(500 + 25, len(spilled))
+
+    def test_givenSortedInputs_whenMergeJoining_thenPairElementsWithEqualKeys(self):
+        left = [1, 2, 2, 4, 6]
+        right = [2, 2, 3, 4, 7]
+
+        inner = SequentialStream(left).merge_join(right, lambda x: x, lambda x: x).collect(to_collection(list))
+        outer = SequentialStream(left).merge_join(right, lambda x: x, lambda x: x, how="outer") \
+            .collect(to_collection(list))
+
+        self.assertEqual([(2, 2), (2, 2), (2, 2), (2, 2), (4, 4)], inner)
+        self.assertEqual(
+            [(1, None), (2, 2), (2, 2), (2, 2), (2, 2), (None, 3), (4, 4), (6, None), (None, 7)], outer
+        )
+
+    def test_givenUnknownJoinType_whenJoining_thenRaiseValueError(self):
+        with self.assertRaises(ValueError):
+            self.stream.join([], lambda x: x, lambda x: x, how="cross").collect(to_collection(list))
+
+    def test_whenSummarizing_thenReturnStatisticsOfAllElements(self):
+        result = NumericLikeStream(self.COLLECTION).summary_statistics()
+
+        self.assertEqual(len(self.COLLECTION), result.count)
+        self.assertEqual(sum(self.COLLECTION), result.sum)
+        self.assertAlmostEqual(statistics.mean(self.COLLECTION), result.mean)
+        self.assertAlmostEqual(statistics.pvariance(self.COLLECTION), result.variance)
+        self.assertAlmostEqual(statistics.variance(self.COLLECTION), result.sample_variance)
+        self.assertEqual((1, 51), (result.min, result.max))
+
+    def test_givenEmptyStream_whenSummarizing_thenReturnEmptyStatistics(self):
+        result = SequentialStream([]).collect(summary_statistics())
+
+        self.assertEqual(0, result.count)
+        self.assertIsNone(result.min)
+        self.assertEqual(0.0, result.variance)
+
+    def test_whenComputingNumericAggregates_thenReturnThem(self):
+        self.assertEqual(sum(self.COLLECTION), NumericLikeStream(self.COLLECTION).sum())
+        self.assertEqual(1, NumericLikeStream(self.COLLECTION).min().get())
+        self.assertEqual(51, NumericLikeStream(self.COLLECTION).max().get())
+
+    def test_whenMappingBatches_thenMapperReceivesBatchesAndResultsAreFlattened(self):
+        batches = []
+
+        def double_all(batch):
+            batches.append(len(batch))
+            return [x * 2 for x in batch]
+
+        result = self.stream.map_batches(double_all, 3).collect(to_collection(list))
+
+        self.assertEqual([x * 2 for x in self.COLLECTION], result)
+        self.assertEqual([3, 3, 1], batches)
+
+    def test_givenSlowSource_whenMappingBatchesWithMaxWait_thenFlushPartialBatches(self):
+        def slow_source():
+            yield 1
+            yield 2
+            time.sleep(0.3)
+            yield 3
+
+        result = SequentialStream(slow_source()).map_batches(lambda batch: [batch], 10, max_wait=0.05) \
+            .collect(to_collection(list))
+
+        self.assertEqual([[1, 2], [3]], result)
+
+    def test_givenFailingSource_whenMappingBatchesWithMaxWait_thenPropagateException(self):
+        def failing_source():
+            yield 1
+            raise KeyError("source failed")
+
+        with self.assertRaises(KeyError):
+            SequentialStream(failing_source()).map_batches(lambda batch: batch, 10, max_wait=0.05) \
+                .collect(to_collection(list))
+
+    def test_whenPrefetching_thenPreserveElementsAndOrder(self):
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                result = SequentialStream(self.COLLECTION).map(lambda x: x * 2).prefetch(2, workers=workers) \
+                    .collect(to_collection(list))
+
+                self.assertEqual([x * 2 for x in self.COLLECTION], result)
+
+    def test_givenSlowMapper_whenPrefetchingWithWorkers_thenApplyItConcurrently(self):
+        lock = threading.Lock()
+        overlapping = threading.Event()
+        running = [0]
+        peak = [0]
+
+        def tracked_double(x):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                if running[0] > 1:
+                    overlapping.set()
+            # Waits for another mapper to start. A sequential implementation times out once and then stops waiting
+            if not overlapping.wait(timeout=5):
+                overlapping.set()
+            with lock:
+                running[0] -= 1
+            return x * 2
+
+        result = SequentialStream(range(20)).map(tracked_double).prefetch(8, workers=4).collect(to_collection(list))
+
+        self.assertEqual([x * 2 for x in range(20)], result)
+        self.assertGreater(peak[0], 1)
+
+    def test_givenFailingMapper_whenPrefetching_thenPropagateException(self):
+        def failing(x):
+            if x == 3:
+                raise KeyError("mapper failed")
+            return x
+
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                with self.assertRaises(KeyError):
+                    SequentialStream(range(10)).map(failing).prefetch(4, workers=workers).collect(to_collection(list))
+
+    def test_givenUnboundedSource_whenStoppingPrefetchEarly_thenStopReading(self):
+        read = []
+        released = threading.Event()
+
+        def unbounded_source():
+            i = 0
+            try:
+                while True:
+                    read.append(i)
+                    yield i
+                    i += 1
+            finally:
+                # Runs once the stopped reader thread dropped the source
+                released.set()
+
+        iterator = SequentialStream(unbounded_source()).prefetch(4).iterator()
+        self.assertEqual([0, 1, 2], [next(iterator) for _ in range(3)])
+        del iterator
+
+        self.assertTrue(released.wait(timeout=5))
+        self.assertLessEqual(len(read), 3 + 4 + 2)
+
+    def test_whenMappingWithContext_thenInitializeOnceAndTearDownAtTheEnd(self):
+        events = []
+
+        def initializer():
+            events.append("init")
+            return 100
+
+        result = self.stream.map_with_context(initializer, lambda offset, x: x + offset, events.append) \
+            .collect(to_collection(list))
+
+        self.assertEqual([x + 100 for x in self.COLLECTION], result)
+        self.assertEqual(["init", 100], events)
+
     def test_transition_to_parallel_returns_parallel(self):
         self.assertIsInstance(self.stream.parallel(), ParallelStream)
 
@@ -0,0 +1,85 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from pystream.parallel_stream import ParallelStream
+
+
+def as_record(x):
+    return {"id": x, "name": f"name-{x}"}
+
+
+def as_row(x):
+    return x, x * x
+
+
+def last_digit(x):
+    return x % 10
+
+
+def read_lines(shards, opener=open):
+    lines = []
+    for shard in shards:
+        with opener(shard.path, "rt", encoding="utf-8") as file:
+            lines.extend(file.read().splitlines())
+    return lines
+
+
+class SinksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_whenWritingJsonLines_thenWorkersWriteShardsAndReturnManifests(self):
+        shards = ParallelStream(range(25000), n_processes=2).map(as_record).to_jsonl(self.directory.name)
+
+        self.assertEqual(3, len(shards))
+        self.assertEqual(25000, sum(shard.rows for shard in shards))
+        self.assertTrue(all(os.path.getsize(shard.path) == shard.bytes for shard in shards))
+        self.assertEqual([as_record(x) for x in range(25000)], [json.loads(line) for line in read_lines(shards)])
+
+    def test_givenCompression_whenWritingCsv_thenEveryShardIsCompressedWithHeader(self):
+        shards = ParallelStream(range(15000), n_processes=2).map(as_row) \
+            .to_csv(self.directory.name, header=["x", "square"], compression="gzip")
+
+        self.assertTrue(all(shard.path.endswith(".csv.gz") for shard in shards))
+        rows = []
+        for shard in shards:
+            with gzip.open(shard.path, "rt", newline="") as file:
+                reader = csv.reader(file)
+                self.assertEqual(["x", "square"], next(reader))
+                rows.extend(reader)
+        self.assertEqual([[str(x), str(x * x)] for x in range(15000)], rows)
+
+    def test_givenMappings_whenWritingCsv_thenOrderFieldsByHeader(self):
+        shards = ParallelStream(range(3), n_processes=2).map(as_record) \
+            .to_csv(self.directory.name, header=["name", "id"])
+
+        self.assertEqual(["name,id", "name-0,0", "name-1,1", "name-2,2"], read_lines(shards))
+
+    def test_givenShardKey_whenWritingFiles_thenWriteEachShardToItsOwnFiles(self):
+        pattern = os.path.join(self.directory.name, "digit={shard}", "part-{part}.txt")
+
+        shards = ParallelStream(range(1000), n_processes=2).filter(bool).to_files(pattern, shard_by=last_digit)
+
+        self.assertEqual(10, len(shards))
+        for digit in range(10):
+            path = os.path.join(self.directory.name, f"digit={digit}", "part-00000.txt")
+            expected = [str(x) for x in range(1, 1000) if x % 10 == digit]
+            self.assertEqual(expected, read_lines([shard for shard in shards if shard.path == path]))
+        self.assertEqual([], [name for name in os.listdir(self.directory.name) if name.startswith(".tmp")])
+
+    def test_givenInvalidPattern_whenWritingFiles_thenRaise(self):
+        stream = ParallelStream(range(10), n_processes=2)
+        pattern = os.path.join(self.directory.name, "out.txt")
+
+        self.assertRaises(ValueError, stream.to_files, pattern)
+        self.assertRaises(ValueError, stream.to_files, pattern + "-{part}", shard_by=last_digit)
+        self.assertRaises(ValueError, stream.to_files, pattern + "-{part}-{other}")
+        self.assertRaises(ValueError, stream.to_files, pattern + "-{part}", compression="zip")
@@ -0,0 +1,100 @@
+import random
+import unittest
+
+from pystream.collectors import approx_count_distinct, approx_quantiles, heavy_hitters
+from pystream.parallel_stream import ParallelStream
+from pystream.sequential_stream import SequentialStream
+from pystream.sketches import BloomFilter, HyperLogLog, KLLSketch, SpaceSaving
+
+
+def as_word(x):
+    return "word-%d" % x
+
+
+class SketchesTest(unittest.TestCase):
+
+    def test_whenCountingDistinct_thenEstimateIsWithinError(self):
+        collection = [x % 20000 for x in range(60000)]
+
+        result = SequentialStream(collection).map(as_word).collect(approx_count_distinct(0.01))
+
+        self.assertAlmostEqual(20000, result, delta=20000 * 0.04)
+
+    def test_givenSmallCardinality_whenCountingDistinct_thenEstimateIsExact(self):
+        self.assertEqual(3, SequentialStream(["a", "b", "a", "c"]).collect(approx_count_distinct()))
+
+    def test_whenCountingDistinctInParallel_thenMergeSketches(self):
+        result = ParallelStream(range(50000), n_processes=4).map(as_word).collect(approx_count_distinct(0.01))
+
+        self.assertAlmostEqual(50000, result, delta=50000 * 0.04)
+
+    def test_whenMergingHyperLogLog_thenEqualToSketchOfUnion(self):
+        left, right, union = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+        for x in range(1000):
+            (left if x % 2 else right).add(x)
+            union.add(x)
+
+        self.assertEqual(union.estimate(), left.merge(right).estimate())
+
+    def test_whenEstimatingQuantiles_thenRankErrorIsSmall(self):
+        collection = list(range(100000))
+        random.Random(1).shuffle(collection)
+
+        median, p99 = SequentialStream(collection).collect(approx_quantiles((0.5, 0.99)))
+
+        self.assertAlmostEqual(50000, median, delta=100000 * 0.03)
+        self.assertAlmostEqual(99000, p99, delta=100000 * 0.03)
+
+    def test_whenEstimatingQuantilesInParallel_thenMergeSketches(self):
+        median, = ParallelStream(range(20000), n_processes=4).collect(approx_quantiles((0.5,)))
+
+        self.assertAlmostEqual(10000, median, delta=20000 * 0.03)
+
+    def test_givenEmptyStream_whenEstimatingQuantiles_thenReturnNone(self):
+        self.assertEqual([None], SequentialStream([]).collect(approx_quantiles((0.5,))))
+
+    def test_whenCompressing_thenSketchSizeIsBounded(self):
+        sketch = KLLSketch(k=64)
+        for x in range(100000):
+            sketch.add(x)
+
+        self.assertEqual(100000, len(sketch))
+        self.assertLess(sum(map(len, sketch._compactors)), 64 * 4)
+
+    def test_whenFindingHeavyHitters_thenReturnMostFrequentElements(self):
+        rng = random.Random(2)
+        collection = [rng.randrange(1000) for _ in range(20000)] + [7] * 3000 + [42] * 2000
+
+        result = SequentialStream(collection).collect(heavy_hitters(2))
+
+        self.assertEqual([7, 42], [x for x, _ in result])
+        self.assertGreaterEqual(result[0][1], 3000)
+
+    def test_whenFindingHeavyHittersInParallel_thenMergeSketches(self):
+        collection = [x % 500 for x in range(20000)] + [3] * 5000
+
+        result = ParallelStream(collection, n_processes=4).collect(heavy_hitters(1, error=0.01))
+
+        self.assertEqual(3, result[0][0])
+
+    def test_whenMergingSpaceSaving_thenCountsAreUpperBounds(self):
+        left, right = SpaceSaving(10), SpaceSaving(10)
+        for x in range(100):
+            left.add(x % 5)
+            right.add(x % 7)
+
+        merged = left.merge(right)
+
+        for x, count in merged.top(5):
+            self.assertGreaterEqual(count, sum(1 for y in range(100) if y % 5 == x) + sum(1 for y in range(100) if y % 7 == x))
+
+    def test_whenFillingBloomFilterToCapacity_thenFalsePositiveRateIsBounded(self):
+        bloom = BloomFilter(capacity=20000, error_rate=0.01)
+        for x in range(20000):
+            bloom.add(as_word(x))
+
+        false_positives = sum(as_word(x) in bloom for x in range(20000, 40000))
+
+        self.assertTrue(all(as_word(x) in bloom for x in range(20000)))
+        self.assertLess(false_positives / 20000, 0.02)
+        self.assertFalse(bloom.add(as_word(0)))
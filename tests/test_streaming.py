@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+
+from pystream.parallel_stream import ParallelStream
+from pystream.sequential_stream import SequentialStream
+from pystream.collectors import to_collection
+from pystream.streaming import StreamMetrics, from_queue, from_socket, tail
+
+
+def squared(x):
+    return x ** 2
+
+
+class StreamingTest(unittest.TestCase):
+
+    def test_givenSentinel_whenReadingQueue_thenEndBeforeIt(self):
+        source = queue.Queue()
+        for x in [1, 2, None, 3]:
+            source.put(x)
+
+        self.assertEqual([1, 2], list(from_queue(source, sentinel=None)))
+
+    def test_givenStop_whenReadingQueue_thenDrainQueuedElements(self):
+        source = multiprocessing.Queue()
+        stop = threading.Event()
+        for x in range(5):
+            source.put(x)
+        time.sleep(0.1)
+        stop.set()
+
+        self.assertEqual(list(range(5)), list(from_queue(source, stop=stop)))
+
+    def test_whenStreamingMicroBatches_thenProcessElementsInOrderAndRecordMetrics(self):
+        source = queue.Queue()
+        stop = threading.Event()
+        metrics = StreamMetrics()
+
+        def produce():
+            for x in range(100):
+                source.put(x)
+            stop.set()
+
+        threading.Thread(target=produce).start()
+        batches = list(
+            ParallelStream(from_queue(source, stop=stop), n_processes=2)
+            .map(squared)
+            .micro_batches(batch_size=16, max_wait=0.05, metrics=metrics)
+        )
+
+        self.assertEqual([x ** 2 for x in range(100)], [x for batch in batches for x in batch])
+        self.assertTrue(all(len(batch) <= 16 for batch in batches))
+        self.assertEqual(100, metrics.elements)
+        self.assertEqual(len(batches), metrics.batches)
+        self.assertGreater(metrics.throughput, 0)
+        self.assertLessEqual(metrics.latency_percentile(0.5), metrics.max_latency)
+
+    def test_givenSlowSource_whenStreamingMicroBatches_thenEmitPartialBatchAfterMaxWait(self):
+        source = queue.Queue()
+        stop = threading.Event()
+        for x in range(3):
+            source.put(x)
+        batches = ParallelStream(from_queue(source, stop=stop), n_processes=2) \
+            .micro_batches(batch_size=100, max_wait=0.05)
+
+        start = time.monotonic()
+        first = next(batches)
+        waited = time.monotonic() - start
+        stop.set()
+        rest = list(batches)
+
+        self.assertEqual([0, 1, 2], first)
+        self.assertLess(waited, 2.0)
+        self.assertEqual([], rest)
+
+    def test_givenUnboundedSource_whenClosingMicroBatchesEarly_thenShutDownWithoutStop(self):
+        source = queue.Queue()
+        source.put(1)
+        batches = ParallelStream(from_queue(source), n_processes=2).map(squared) \
+            .micro_batches(batch_size=10, max_wait=0.05)
+
+        self.assertEqual([1], next(batches))
+        start = time.monotonic()
+        batches.close()
+
+        self.assertLess(time.monotonic() - start, 5.0)
+
+    def test_whenTailingFile_thenYieldCompleteAppendedLines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.txt")
+            stop = threading.Event()
+
+            def write():
+                with open(path, "w") as log:
+                    log.write("first\nsec")
+                    log.flush()
+                    time.sleep(0.15)
+                    log.write("ond\nthird\npartial")
+                    log.flush()
+                time.sleep(0.15)
+                stop.set()
+
+            writer = threading.Thread(target=write)
+            writer.start()
+            lines = SequentialStream(tail(path, stop=stop, poll_interval=0.02)).collect(to_collection(list))
+            writer.join()
+
+        self.assertEqual(["first", "second", "third"], lines)
+
+    def test_whenReadingUnixSocket_thenYieldRecordsOfAllClients(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "source.sock")
+            stop, ready = threading.Event(), threading.Event()
+
+            def send():
+                ready.wait()
+                for records in (b"a\nb\n", b"c\nd"):
+                    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                        client.connect(path)
+                        client.sendall(records)
+                time.sleep(0.2)
+                stop.set()
+
+            sender = threading.Thread(target=send)
+            sender.start()
+            records = list(from_socket(path, stop=stop, poll_interval=0.02, ready=ready))
+            sender.join()
+
+            self.assertEqual([b"a", b"b", b"c", b"d"], records)
+            self.assertFalse(os.path.exists(path))
+
+    def test_givenResetConnection_whenReadingTcpSocket_thenKeepReadingOtherClients(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            address = probe.getsockname()
+        stop, ready = threading.Event(), threading.Event()
+
+        def send():
+            ready.wait()
+            with socket.create_connection(address) as resetting:
+                resetting.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                resetting.sendall(b"partial")
+                time.sleep(0.1)
+            with socket.create_connection(address) as client:
+                client.sendall(b"x\ny\n")
+            time.sleep(0.2)
+            stop.set()
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        records = list(from_socket(address, stop=stop, poll_interval=0.02, ready=ready))
+        sender.join()
+
+        self.assertEqual([b"x", b"y"], records)
+
+    def test_whenRecordingLatencies_thenComputePercentiles(self):
+        metrics = StreamMetrics()
+
+        metrics.record([0.0, 1.0, 2.0, 3.0], 4, emitted=4.0)
+
+        self.assertEqual(4, metrics.elements)
+        self.assertAlmostEqual(2.5, metrics.mean_latency)
+        self.assertAlmostEqual(4.0, metrics.max_latency)
+        self.assertAlmostEqual(2.0, metrics.latency_percentile(0.5))
+        self.assertAlmostEqual(1.0, metrics.throughput)
@@ -0,0 +1,102 @@
+import operator
+import random
+import unittest
+
+from pystream.collectors import to_collection
+from pystream.core.windows import TwoStackAggregator, Window
+from pystream.sequential_stream import SequentialStream
+
+
+def event_time(event):
+    return event[0]
+
+
+def concatenated(left, right):
+    return left + right
+
+
+class WindowsTest(unittest.TestCase):
+
+    def test_whenWindowing_thenEmitConsecutiveWindows(self):
+        self.assertEqual(
+            [[0, 1, 2], [3, 4, 5], [6]],
+            SequentialStream(range(7)).window(3).collect(to_collection(list)),
+        )
+        self.assertEqual([3, 12, 6], SequentialStream(range(7)).window(3, operator.add).collect(to_collection(list)))
+
+    def test_whenSliding_thenEmitFullWindowsEveryStep(self):
+        self.assertEqual(
+            [[0, 1, 2], [2, 3, 4], [4, 5, 6]],
+            SequentialStream(range(7)).sliding(3, step=2).collect(to_collection(list)),
+        )
+        self.assertEqual([], SequentialStream(range(2)).sliding(3).collect(to_collection(list)))
+
+    def test_givenNonCommutativeCombiner_whenSliding_thenAggregateInOrder(self):
+        words = [str(x) for x in range(10)]
+
+        result = SequentialStream(words).sliding(4, step=3, combiner=concatenated).collect(to_collection(list))
+
+        self.assertEqual(["0123", "3456", "6789"], result)
+
+    def test_givenLargeWindow_whenSlidingSum_thenMatchRecomputedSums(self):
+        collection = [random.randint(0, 100) for _ in range(200000)]
+        size = 100000
+
+        result = SequentialStream(collection).sliding(size, combiner=operator.add).collect(to_collection(list))
+
+        self.assertEqual(len(collection) - size + 1, len(result))
+        self.assertEqual(sum(collection[:size]), result[0])
+        self.assertEqual(sum(collection[-size:]), result[-1])
+        self.assertEqual(sum(collection[1234:1234 + size]), result[1234])
+
+    def test_whenPoppingAndPushing_thenAggregateEqualsFold(self):
+        aggregator = TwoStackAggregator(max)
+        window = []
+        for x in [5, 1, 4, 9, 2, 2, 7, 3, 1, 1, 1]:
+            aggregator.push(x)
+            window.append(x)
+            if len(window) > 3:
+                self.assertEqual(window.pop(0), aggregator.pop())
+            self.assertEqual(max(window), aggregator.query())
+        self.assertRaises(IndexError, TwoStackAggregator(max).query)
+
+    def test_givenOutOfOrderEvents_whenTumblingWindow_thenAssignEventsByTimeAndDropLateOnes(self):
+        events = [(1, "a"), (4, "b"), (11, "c"), (9, "d"), (12, "g"), (25, "e"), (8, "f")]
+        late = []
+
+        result = SequentialStream(events) \
+            .tumbling_window(10, event_time, allowed_lateness=5, on_late=late.append) \
+            .collect(to_collection(list))
+
+        self.assertEqual(
+            [
+                Window(0, 10, [(1, "a"), (4, "b"), (9, "d")]),
+                Window(10, 20, [(11, "c"), (12, "g")]),
+                Window(20, 30, [(25, "e")]),
+            ],
+            result,
+        )
+        self.assertEqual([(8, "f")], late)
+
+    def test_givenCombiner_whenTumblingWindow_thenAggregateIncrementally(self):
+        result = SequentialStream(range(0, 30, 3)).tumbling_window(10, float, combiner=operator.add) \
+            .collect(to_collection(list))
+
+        self.assertEqual([Window(0, 10, 18), Window(10, 20, 45), Window(20, 30, 72)], result)
+
+    def test_givenGaps_whenSessionWindow_thenSplitAtInactivityAndMergeBridgedSessions(self):
+        events = [(0, "a"), (2, "b"), (10, "c"), (6, "d"), (30, "e"), (1, "f")]
+        late = []
+
+        result = SequentialStream(events) \
+            .session_window(5, event_time, allowed_lateness=10, on_late=late.append) \
+            .collect(to_collection(list))
+
+        self.assertEqual(
+            [
+                Window(0, 15, [(0, "a"), (2, "b"), (6, "d"), (10, "c")]),
+                Window(30, 35, [(30, "e")]),
+            ],
+            result,
+        )
+        self.assertEqual([(1, "f")], late)